@@ -0,0 +1,423 @@
+"""
+Benchmarks of the simulator hot paths.
+
+    python benchmarks/bench.py [--quick] [--only NAME] [--output results.json]
+                               [--baseline baseline.json] [--threshold 0.2]
+
+Every benchmark reports the best time per operation over a few repeats,
+each repeat calling it until MIN_REPEAT_TIME seconds were timed, so that
+short benchmarks are not single noisy shots.
+Results are written as JSON; with --baseline, each result is compared with
+the stored one and the script exits with status 1 when any of them got
+slower by more than the threshold (0.2 = 20%).
+
+Spectrum sizes run from 180 to 4000 slots and 1 to 19 cores, on the
+topology of xml/ccl.xml and on n x n grids for the topology sizes. The
+scaling benchmark loads synthetic topologies of 100 to 5000 nodes from
+every TopologyGenerator model and times their k shortest paths and
+arrivals, which gives the scaling curves of each model. The failures
+benchmark times the switchover of single link failures and the sweep over
+all of them, in one process and in one per CPU, on networks loaded by FIPP.
+"""
+import argparse
+import contextlib
+import gc
+import io
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+import xml.etree.ElementTree as ET
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from src.PhysicalTopology import PhysicalTopology
+from src.VirtualTopology import VirtualTopology
+from src.TrafficGenerator import TrafficGenerator
+from src.EventScheduler import EventScheduler
+from src.MyStatistics import MyStatistics
+from src.OutputManager import OutputManager
+from src.Tracer import Tracer
+from src.ControlPlane import ControlPlane
+from src.SimulationRunner import SimulationRunner
+from src.FlowArrivalEvent import FlowArrivalEvent
+from src.FlowDepartureEvent import FlowDepartureEvent
+from src.Flow import Flow
+from src.Slot import Slot
+from src.PathCache import PathCache
+from src.SwitchoverEngine import SwitchoverEngine
+from src.TopologyGenerator import TopologyGenerator
+from src.util.ConnectedComponent import ConnectedComponent
+
+CCL = os.path.join(ROOT, "xml", "ccl.xml")
+
+SPECTRUM_SIZES = [(1, 180), (7, 180), (19, 180), (7, 640), (1, 4000), (7, 4000), (19, 4000)]
+QUICK_SPECTRUM_SIZES = [(1, 180), (7, 180), (7, 640)]
+GRID_SIZES = [4, 6, 8]
+QUICK_GRID_SIZES = [4]
+SCALING_NODES = [100, 500, 1000, 5000]
+QUICK_SCALING_NODES = [100, 500]
+# Timed seconds a repeat of best_of() lasts at least
+MIN_REPEAT_TIME = 0.2
+
+
+def best_of(function, repeats: int) -> float:
+    """
+    Smallest mean wall time of a call of `function`, which does its own setup
+    outside the timed part and returns the time it took, over `repeats`
+    repeats of at least MIN_REPEAT_TIME seconds each
+    """
+    best = float("inf")
+    for _ in range(repeats):
+        # Garbage left by the previous calls is not collected in the timed part of the next ones
+        gc.collect()
+        total = 0.0
+        calls = 0
+        while calls == 0 or total < MIN_REPEAT_TIME:
+            total += function()
+            calls += 1
+        best = min(best, total / calls)
+    return best
+
+
+def load_config(cores: int = None, slots: int = None) -> ET.Element:
+    root = ET.parse(CCL).getroot()
+    pt = root.find("physical-topology")
+    if cores is not None:
+        pt.attrib["cores"] = str(cores)
+    if slots is not None:
+        pt.attrib["slots"] = str(slots)
+    return root
+
+
+def with_topology(physical_topology: ET.Element) -> ET.Element:
+    """The configuration of xml/ccl.xml on another physical topology"""
+    root = load_config()
+    root.remove(root.find("physical-topology"))
+    root.append(physical_topology)
+    return root
+
+
+def build(root: ET.Element, module: str, load: float, calls: int = None):
+    """PhysicalTopology, EventScheduler and ControlPlane of a seed 1 run of `root`, traffic already generated"""
+    parts = {child.tag: child for child in root}
+    parts["rsa"].attrib["module"] = module
+    if calls is not None:
+        parts["traffic"].attrib["calls"] = str(calls)
+    with contextlib.redirect_stdout(io.StringIO()):
+        MyStatistics.singleton_object = None
+        pt = PhysicalTopology(parts["physical-topology"], False)
+        vt = VirtualTopology(parts["virtual-topology"], pt, False)
+        events = EventScheduler()
+        traffic = TrafficGenerator(parts["traffic"], load, False)
+        traffic.generate_traffic(pt, events, 1)
+        st = MyStatistics.get_my_statistics()
+        st.statistics_setup(OutputManager(ET.Element("graphs")), pt, traffic, pt.get_num_nodes(), 3, 0, load, False)
+        events.add_chunk_listener(st.add_arrivals)
+        Tracer.get_tracer_object().toogle_trace_writing(False)
+        cp = ControlPlane(parts["rsa"], events, module, pt, vt, traffic)
+    return pt, events, cp
+
+
+def random_slot_lists(pt: PhysicalTopology, count: int, size: int, rng: random.Random):
+    lists = []
+    for _ in range(count):
+        core = rng.randrange(pt.get_cores())
+        start = rng.randrange(pt.get_num_slots() - size + 1)
+        lists.append([Slot(core, slot) for slot in range(start, start + size)])
+    return lists
+
+
+def bench_scheduler(results: dict, args) -> None:
+    rng = random.Random(1)
+    n = 20000 if args.quick else 100000
+    flow = Flow(0, 0, 1, 0.0, 1000, 1.0, 0, 0.0)
+    times = [rng.random() * 1000 for _ in range(n)]
+
+    def run():
+        events = EventScheduler()
+        begin = time.perf_counter()
+        for i, t in enumerate(times):
+            if i & 1:
+                events.add_event(FlowDepartureEvent(t, i, flow))
+            else:
+                events.add_event(FlowArrivalEvent(t, flow))
+        while events.pop_event() is not None:
+            pass
+        return time.perf_counter() - begin
+
+    results["scheduler.push-pop"] = {"seconds": best_of(run, args.repeats) / n, "ops": n}
+
+
+def bench_pt_ops(results: dict, args) -> None:
+    for cores, slots in args.spectrum_sizes:
+        rng = random.Random(1)
+        with contextlib.redirect_stdout(io.StringIO()):
+            pt = PhysicalTopology(load_config(cores, slots).find("physical-topology"), False)
+        links = [(pt.get_src_link(i), pt.get_dst_link(i)) for i in range(pt.get_num_links())]
+        slot_lists = random_slot_lists(pt, 200, 10, rng)
+        # Half full links, so get_spectrum works on realistic images
+        for src, dst in links:
+            for slot_list in random_slot_lists(pt, slots * cores // 20, 10, rng):
+                pt.reserve_slots(src, dst, slot_list)
+
+        def spectrum():
+            begin = time.perf_counter()
+            for src, dst in links:
+                pt.get_spectrum(src, dst)
+            return time.perf_counter() - begin
+
+        def reserve_release():
+            src, dst = links[0]
+            pt.release_slots(src, dst, [Slot(core, slot) for core in range(cores) for slot in range(slots)])
+            begin = time.perf_counter()
+            for slot_list in slot_lists:
+                pt.reserve_slots(src, dst, slot_list)
+            for slot_list in slot_lists:
+                pt.release_slots(src, dst, slot_list)
+            return time.perf_counter() - begin
+
+        key = f"[cores={cores},slots={slots}]"
+        results["pt.get_spectrum" + key] = {"seconds": best_of(spectrum, args.repeats) / len(links), "ops": len(links)}
+        results["pt.reserve-release" + key] = {"seconds": best_of(reserve_release, args.repeats) / len(slot_lists),
+                                               "ops": len(slot_lists)}
+
+
+def bench_connected_component(results: dict, args) -> None:
+    for cores, slots in args.spectrum_sizes:
+        rng = random.Random(1)
+        # Alternating free and occupied runs of 1 to 20 slots
+        images = []
+        for _ in range(5):
+            image = []
+            for _ in range(cores):
+                row = []
+                free = True
+                while len(row) < slots:
+                    row.extend([free] * rng.randint(1, 20))
+                    free = not free
+                image.append(row[:slots])
+            images.append(image)
+
+        def run():
+            begin = time.perf_counter()
+            for image in images:
+                ConnectedComponent().list_of_regions(image)
+            return time.perf_counter() - begin
+
+        results[f"connected-component[cores={cores},slots={slots}]"] = {
+            "seconds": best_of(run, args.repeats) / len(images), "ops": len(images)}
+
+
+def time_arrivals(root: ET.Element, module: str, load: float, warmup: int, arrivals: int) -> float:
+    """Mean time of `arrivals` flow arrivals, once `warmup` arrivals loaded the network"""
+    pt, events, cp = build(root, module, load, warmup + arrivals)
+    seen = 0
+    elapsed = 0.0
+    with contextlib.redirect_stdout(io.StringIO()):
+        event = events.pop_event()
+        while event is not None:
+            if isinstance(event, FlowArrivalEvent):
+                seen += 1
+                if seen > warmup:
+                    begin = time.perf_counter()
+                    cp.new_event(event)
+                    elapsed += time.perf_counter() - begin
+                else:
+                    cp.new_event(event)
+            else:
+                cp.new_event(event)
+            event = events.pop_event()
+    return elapsed / max(1, seen - warmup)
+
+
+def bench_rsa(results: dict, args) -> None:
+    for module in ("FIPP", "ImageRCSA"):
+        for cores, slots in args.spectrum_sizes:
+            # Fewer arrivals on larger spectra, each of them costs about cores * slots
+            arrivals = max(10, args.arrivals * 1260 // (cores * slots))
+            seconds = time_arrivals(load_config(cores, slots), module, args.load, arrivals, arrivals)
+            results[f"rsa.{module}.arrival[cores={cores},slots={slots}]"] = {"seconds": seconds, "ops": arrivals}
+        for n in args.grid_sizes:
+            grid = TopologyGenerator(1).generate("grid", n * n, columns=n)
+            root = with_topology(TopologyGenerator.to_xml(grid, f"grid-{n}", 7, 180))
+            seconds = time_arrivals(root, module, args.load, args.arrivals, args.arrivals)
+            results[f"rsa.{module}.arrival[grid={n}x{n}]"] = {"seconds": seconds, "ops": args.arrivals}
+
+
+def bench_full_run(results: dict, args) -> None:
+    for module in ("FIPP", "ImageRCSA"):
+        def run():
+            pt, events, cp = build(load_config(), module, args.load, args.calls)
+            begin = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                SimulationRunner(cp, events)
+            return time.perf_counter() - begin
+
+        results[f"full-run.{module}[ccl]"] = {"seconds": best_of(run, 1), "ops": 1}
+
+
+def bench_scaling(results: dict, args) -> None:
+    for model in TopologyGenerator.MODELS:
+        for nodes in args.scaling_nodes:
+            graph = TopologyGenerator(1).generate(model, nodes)
+            xml = TopologyGenerator.to_xml(graph, f"{model}-{nodes}", 7, 180)
+            key = f"[{model},nodes={nodes}]"
+
+            def load():
+                begin = time.perf_counter()
+                PhysicalTopology(xml, False)
+                return time.perf_counter() - begin
+
+            results["scaling.load" + key] = {"seconds": best_of(load, args.repeats), "ops": 1}
+
+            with tempfile.TemporaryDirectory() as directory:
+                arrays = os.path.join(directory, "topology.npz")
+                TopologyGenerator.save_npz(graph, arrays, 7, 180)
+
+                def load_npz():
+                    begin = time.perf_counter()
+                    PhysicalTopology(ET.Element("physical-topology", {"name": model, "file": arrays}), False)
+                    return time.perf_counter() - begin
+
+                results["scaling.load-npz" + key] = {"seconds": best_of(load_npz, args.repeats), "ops": 1}
+
+            pt = PhysicalTopology(xml, False)
+            rng = random.Random(1)
+            pairs = [tuple(rng.sample(range(nodes), 2)) for _ in range(20)]
+
+            def paths():
+                cache = PathCache(pt, pt.get_weighted_graph(), 5, "weight")
+                begin = time.perf_counter()
+                for src, dst in pairs:
+                    cache.get_links(src, dst)
+                return time.perf_counter() - begin
+
+            results["scaling.k-shortest-paths" + key] = {"seconds": best_of(paths, args.repeats) / len(pairs),
+                                                         "ops": len(pairs)}
+
+            # MyStatistics keeps tables of nodes x nodes counters per class, too large past a thousand nodes
+            if nodes > 1000:
+                continue
+            arrivals = max(10, args.arrivals // 4)
+            seconds = time_arrivals(with_topology(xml), "ImageRCSA", args.load, arrivals, arrivals)
+            results["scaling.ImageRCSA.arrival" + key] = {"seconds": seconds, "ops": arrivals}
+
+
+def load_network(root: ET.Element, module: str, load: float, arrivals: int):
+    """PhysicalTopology and ControlPlane of a run stopped after `arrivals` arrivals"""
+    pt, events, cp = build(root, module, load, arrivals + 1)
+    seen = 0
+    with contextlib.redirect_stdout(io.StringIO()):
+        event = events.pop_event()
+        while event is not None and seen < arrivals:
+            if isinstance(event, FlowArrivalEvent):
+                seen += 1
+            cp.new_event(event)
+            event = events.pop_event()
+    return pt, cp
+
+
+def bench_failures(results: dict, args) -> None:
+    grid = args.grid_sizes[-1]
+    topologies = {"ccl": load_config(),
+                  f"grid={grid}x{grid}": with_topology(TopologyGenerator.to_xml(
+                      TopologyGenerator(1).generate("grid", grid * grid, columns=grid), f"grid-{grid}", 7, 180))}
+    for name, root in topologies.items():
+        pt, cp = load_network(root, "FIPP", args.load, args.arrivals)
+        with contextlib.redirect_stdout(io.StringIO()):
+            engine = SwitchoverEngine(pt, cp.vt, 1)
+        links = pt.get_link_ids()
+
+        def link_failures():
+            begin = time.perf_counter()
+            for link in links:
+                engine.evaluate(engine.get_fiber_links(link))
+            return time.perf_counter() - begin
+
+        results[f"failures.link-failure[{name}]"] = {"seconds": best_of(link_failures, args.repeats) / len(links),
+                                                     "ops": len(links)}
+        for workers in sorted({1, os.cpu_count() or 1}):
+            with contextlib.redirect_stdout(io.StringIO()):
+                engine = SwitchoverEngine(pt, cp.vt, workers)
+
+            def sweep():
+                begin = time.perf_counter()
+                engine.sweep()
+                return time.perf_counter() - begin
+
+            results[f"failures.sweep[{name},workers={workers}]"] = {"seconds": best_of(sweep, args.repeats), "ops": 1}
+
+
+BENCHMARKS = {
+    "scheduler": bench_scheduler,
+    "pt": bench_pt_ops,
+    "connected-component": bench_connected_component,
+    "rsa": bench_rsa,
+    "full-run": bench_full_run,
+    "scaling": bench_scaling,
+    "failures": bench_failures,
+}
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> bool:
+    """Prints the change of every result against the baseline, False if any regressed beyond the threshold"""
+    ok = True
+    for name, result in sorted(results.items()):
+        if name not in baseline:
+            print(f"{name}: {result['seconds']:.3e} s (new)")
+            continue
+        ratio = result["seconds"] / baseline[name]["seconds"] if baseline[name]["seconds"] else 1.0
+        status = ""
+        if ratio > 1 + threshold:
+            status = "  REGRESSION"
+            ok = False
+        print(f"{name}: {result['seconds']:.3e} s, {(ratio - 1) * 100:+.1f}%{status}")
+    return ok
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmarks of the simulator hot paths")
+    parser.add_argument("--quick", action="store_true", help="smaller spectra, topologies and runs")
+    parser.add_argument("--only", action="append", choices=sorted(BENCHMARKS), help="benchmarks to run, all by default")
+    parser.add_argument("--output", default="bench-results.json")
+    parser.add_argument("--baseline", help="results of an earlier run to compare with")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed slowdown against the baseline")
+    parser.add_argument("--repeats", type=int, default=5, help="repeats of each benchmark, the best one counts")
+    parser.add_argument("--load", type=float, default=215)
+    parser.add_argument("--arrivals", type=int, default=200, help="timed arrivals per RSA benchmark")
+    parser.add_argument("--calls", type=int, help="calls of the full runs, those of xml/ccl.xml by default")
+    args = parser.parse_args()
+
+    args.spectrum_sizes = QUICK_SPECTRUM_SIZES if args.quick else SPECTRUM_SIZES
+    args.grid_sizes = QUICK_GRID_SIZES if args.quick else GRID_SIZES
+    args.scaling_nodes = QUICK_SCALING_NODES if args.quick else SCALING_NODES
+    if args.quick:
+        args.arrivals = min(args.arrivals, 50)
+        args.calls = args.calls or 1000
+
+    results = {}
+    for name in args.only or BENCHMARKS:
+        begin = time.time()
+        BENCHMARKS[name](results, args)
+        print(f"{name}: done ({round(time.time() - begin, 1)} sec)", file=sys.stderr)
+
+    with open(args.output, "w") as f:
+        json.dump({"python": platform.python_version(), "platform": platform.platform(), "quick": args.quick,
+                   "results": results}, f, indent=2)
+
+    if args.baseline is None:
+        for name, result in sorted(results.items()):
+            print(f"{name}: {result['seconds']:.3e} s")
+        return 0
+    with open(args.baseline) as f:
+        baseline = json.load(f)["results"]
+    return 0 if compare(results, baseline, args.threshold) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,48 @@
+"""
+Writes a synthetic topology.
+
+    python benchmarks/generate_topology.py MODEL NODES OUTPUT [--seed 1]
+                                           [--cores 7] [--slots 320]
+
+MODEL is one of waxman, grid, ring-of-rings and barabasi-albert. An
+OUTPUT ending in .npz gets the NumPy arrays of TopologyGenerator.save_npz;
+anything else gets a simulation file, xml/ccl.xml with its physical
+topology replaced by the generated one.
+"""
+import argparse
+import os
+import sys
+import xml.etree.ElementTree as ET
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from src.TopologyGenerator import TopologyGenerator
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Writes a synthetic topology")
+    parser.add_argument("model", choices=TopologyGenerator.MODELS)
+    parser.add_argument("nodes", type=int)
+    parser.add_argument("output")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--cores", type=int, default=7)
+    parser.add_argument("--slots", type=int, default=320)
+    args = parser.parse_args()
+
+    graph = TopologyGenerator(args.seed).generate(args.model, args.nodes)
+    if args.output.endswith(".npz"):
+        TopologyGenerator.save_npz(graph, args.output, args.cores, args.slots)
+    else:
+        tree = ET.parse(os.path.join(ROOT, "xml", "ccl.xml"))
+        root = tree.getroot()
+        root.remove(root.find("physical-topology"))
+        root.append(TopologyGenerator.to_xml(graph, f"{args.model}-{args.nodes}", args.cores, args.slots))
+        ET.indent(tree)
+        tree.write(args.output, encoding="UTF-8", xml_declaration=True)
+    print(f"{args.model}: {graph.number_of_nodes()} nodes, {graph.number_of_edges()} links -> {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
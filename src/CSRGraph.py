@@ -0,0 +1,283 @@
+from heapq import heappush, heappop
+from typing import Dict, List, Optional, Set, Tuple
+
+import networkx as nx
+
+
+class CSRGraph:
+    """
+    Compressed sparse row copy of a directed graph for the routing hot paths.
+
+    The out-edges of node index i are positions offsets[i] to offsets[i + 1]
+    of targets, weights and link_ids; the in-edges are positions in_offsets[i]
+    to in_offsets[i + 1] of sources and in_edges (the position of the edge
+    in the out arrays). Nodes are indices in the order of the networkx
+    graph, paths are given and returned as node labels.
+
+    The searches are ports of the ones behind nx.shortest_simple_paths
+    (bidirectional BFS without weight, bidirectional Dijkstra with one, and
+    Yen's algorithm on top) that visit neighbours in the order of a copy of
+    the networkx graph, so they find the same paths, ties included. Nodes
+    and edges can be excluded from a search instead of copying the graph.
+    """
+
+    def __init__(self, graph: nx.DiGraph, weight: str = None):
+        self.weight = weight
+        self.nodes = list(graph.nodes)
+        self.index: Dict[int, int] = {node: i for i, node in enumerate(self.nodes)}
+
+        self.offsets = [0]
+        self.targets: List[int] = []
+        self.weights: List[float] = []
+        self.link_ids: List[int] = []
+        for node in self.nodes:
+            for neighbour, data in graph.succ[node].items():
+                self.targets.append(self.index[neighbour])
+                self.weights.append(data.get(weight, 1) if weight is not None else 1)
+                self.link_ids.append(data.get("id", len(self.link_ids)))
+            self.offsets.append(len(self.targets))
+        self.edges: Dict[Tuple[int, int], int] = {}
+        for i in range(len(self.nodes)):
+            for e in range(self.offsets[i], self.offsets[i + 1]):
+                self.edges[(i, self.targets[e])] = e
+
+        # In-edges in the order a copy of the networkx graph lists predecessors: by source, then out-edge
+        incoming: List[List[int]] = [[] for _ in self.nodes]
+        for e in range(len(self.targets)):
+            incoming[self.targets[e]].append(e)
+        self.sources = [0] * len(self.targets)
+        for i in range(len(self.nodes)):
+            for e in range(self.offsets[i], self.offsets[i + 1]):
+                self.sources[e] = i
+        self.in_offsets = [0]
+        self.in_edges: List[int] = []
+        for i in range(len(self.nodes)):
+            self.in_edges.extend(incoming[i])
+            self.in_offsets.append(len(self.in_edges))
+
+    def get_num_nodes(self) -> int:
+        return len(self.nodes)
+
+    def get_num_edges(self) -> int:
+        return len(self.targets)
+
+    def get_edge(self, src: int, dst: int) -> Optional[int]:
+        """Position of the edge src -> dst (node labels), None if there is none"""
+        return self.edges.get((self.index[src], self.index[dst]))
+
+    def get_path_links(self, path: List[int]) -> List[int]:
+        index = self.index
+        return [self.link_ids[self.edges[(index[path[i]], index[path[i + 1]])]] for i in range(len(path) - 1)]
+
+    def node_indices(self, nodes) -> Set[int]:
+        return {self.index[node] for node in nodes}
+
+    def edge_positions(self, edges) -> Set[int]:
+        """Positions of the (src, dst) edges that exist"""
+        positions = set()
+        for src, dst in edges:
+            e = self.edges.get((self.index[src], self.index[dst]))
+            if e is not None:
+                positions.add(e)
+        return positions
+
+    def has_path(self, src: int, dst: int, excluded_nodes: Set[int] = (), excluded_edges: Set[int] = ()) -> bool:
+        source, target = self.index[src], self.index[dst]
+        if source == target:
+            return True
+        offsets, targets = self.offsets, self.targets
+        seen = {source}
+        fringe = [source]
+        while fringe:
+            v = fringe.pop()
+            for e in range(offsets[v], offsets[v + 1]):
+                w = targets[e]
+                if w in seen or w in excluded_nodes or e in excluded_edges:
+                    continue
+                if w == target:
+                    return True
+                seen.add(w)
+                fringe.append(w)
+        return False
+
+    def shortest_path(self, src: int, dst: int, excluded_nodes: Set[int] = (),
+                      excluded_edges: Set[int] = ()) -> Optional[Tuple[float, List[int]]]:
+        """(length, path) of a shortest path from src to dst, None if there is none"""
+        result = self.search(self.index[src], self.index[dst], excluded_nodes, excluded_edges)
+        if result is None:
+            return None
+        length, path = result
+        return length, [self.nodes[i] for i in path]
+
+    def search(self, source: int, target: int, excluded_nodes, excluded_edges):
+        if self.weight is None:
+            return self.bidirectional_bfs(source, target, excluded_nodes, excluded_edges)
+        return self.bidirectional_dijkstra(source, target, excluded_nodes, excluded_edges)
+
+    def bidirectional_bfs(self, source: int, target: int, excluded_nodes, excluded_edges):
+        """Shortest path in hops, as (number of nodes, path of indices)"""
+        if excluded_nodes and (source in excluded_nodes or target in excluded_nodes):
+            return None
+        if source == target:
+            return 1, [source]
+        offsets, targets = self.offsets, self.targets
+        in_offsets, in_edges, sources = self.in_offsets, self.in_edges, self.sources
+
+        pred = {source: None}
+        succ = {target: None}
+        forward_fringe = [source]
+        reverse_fringe = [target]
+        meet = None
+        while forward_fringe and reverse_fringe and meet is None:
+            if len(forward_fringe) <= len(reverse_fringe):
+                this_level = forward_fringe
+                forward_fringe = []
+                for v in this_level:
+                    for e in range(offsets[v], offsets[v + 1]):
+                        w = targets[e]
+                        if w in excluded_nodes or e in excluded_edges:
+                            continue
+                        if w not in pred:
+                            forward_fringe.append(w)
+                            pred[w] = v
+                        if w in succ:
+                            meet = w
+                            break
+                    if meet is not None:
+                        break
+            else:
+                this_level = reverse_fringe
+                reverse_fringe = []
+                for v in this_level:
+                    for position in range(in_offsets[v], in_offsets[v + 1]):
+                        e = in_edges[position]
+                        w = sources[e]
+                        if w in excluded_nodes or e in excluded_edges:
+                            continue
+                        if w not in succ:
+                            succ[w] = v
+                            reverse_fringe.append(w)
+                        if w in pred:
+                            meet = w
+                            break
+                    if meet is not None:
+                        break
+        if meet is None:
+            return None
+
+        path = []
+        w = meet
+        while w is not None:
+            path.append(w)
+            w = succ[w]
+        w = pred[path[0]]
+        while w is not None:
+            path.insert(0, w)
+            w = pred[w]
+        return len(path), path
+
+    def bidirectional_dijkstra(self, source: int, target: int, excluded_nodes, excluded_edges):
+        """Shortest weighted path, as (length, path of indices)"""
+        if excluded_nodes and (source in excluded_nodes or target in excluded_nodes):
+            return None
+        if source == target:
+            return 0, [source]
+        offsets, targets, weights = self.offsets, self.targets, self.weights
+        in_offsets, in_edges, sources = self.in_offsets, self.in_edges, self.sources
+
+        dists = [{}, {}]
+        paths = [{source: [source]}, {target: [target]}]
+        fringe = [[], []]
+        seen = [{source: 0}, {target: 0}]
+        c = 0
+        heappush(fringe[0], (0, c, source))
+        c += 1
+        heappush(fringe[1], (0, c, target))
+        c += 1
+        final_dist = None
+        final_path = []
+        dir = 1
+        while fringe[0] and fringe[1]:
+            dir = 1 - dir
+            dist, _, v = heappop(fringe[dir])
+            if v in dists[dir]:
+                continue
+            dists[dir][v] = dist
+            if v in dists[1 - dir]:
+                return final_dist, final_path
+
+            if dir == 0:
+                neighbours = ((targets[e], e) for e in range(offsets[v], offsets[v + 1]))
+            else:
+                neighbours = ((sources[e], e) for e in in_edges[in_offsets[v]:in_offsets[v + 1]])
+            seen_dir = seen[dir]
+            for w, e in neighbours:
+                if w in excluded_nodes or e in excluded_edges:
+                    continue
+                length = dist + weights[e]
+                if w in dists[dir]:
+                    if length < dists[dir][w]:
+                        raise ValueError("Contradictory paths found: negative weights?")
+                elif w not in seen_dir or length < seen_dir[w]:
+                    seen_dir[w] = length
+                    heappush(fringe[dir], (length, c, w))
+                    c += 1
+                    paths[dir][w] = paths[dir][v] + [w]
+                    if w in seen[0] and w in seen[1]:
+                        total = seen[0][w] + seen[1][w]
+                        if final_path == [] or final_dist > total:
+                            final_dist = total
+                            reverse_path = paths[1][w][:]
+                            reverse_path.reverse()
+                            final_path = paths[0][w] + reverse_path[1:]
+        return None
+
+    def path_length(self, path: List[int]) -> float:
+        """Length of a path of indices, as the searches count it"""
+        if self.weight is None:
+            return len(path)
+        return sum(self.weights[self.edges[(u, v)]] for u, v in zip(path, path[1:]))
+
+    def k_shortest_paths(self, src: int, dst: int, k: int, excluded_nodes: Set[int] = (),
+                         excluded_edges: Set[int] = ()) -> List[List[int]]:
+        """The k shortest simple paths from src to dst (Yen), in the order of nx.shortest_simple_paths"""
+        source, target = self.index[src], self.index[dst]
+        excluded_nodes = set(excluded_nodes)
+        excluded_edges = set(excluded_edges)
+        found: List[List[int]] = []
+        candidates = []
+        candidate_paths = set()
+        counter = 0
+
+        def push(cost, path):
+            nonlocal counter
+            hashable = tuple(path)
+            if hashable not in candidate_paths:
+                heappush(candidates, (cost, counter, path))
+                counter += 1
+                candidate_paths.add(hashable)
+
+        first = self.search(source, target, excluded_nodes, excluded_edges)
+        if first is None:
+            return []
+        push(first[0], first[1])
+        while candidates and len(found) < k:
+            _, _, path = heappop(candidates)
+            candidate_paths.remove(tuple(path))
+            found.append(path)
+            if len(found) == k:
+                break
+
+            ignore_nodes = set(excluded_nodes)
+            ignore_edges = set(excluded_edges)
+            for i in range(1, len(path)):
+                root = path[:i]
+                root_length = self.path_length(root)
+                for other in found:
+                    if other[:i] == root:
+                        ignore_edges.add(self.edges[(other[i - 1], other[i])])
+                spur = self.search(root[-1], target, ignore_nodes, ignore_edges)
+                if spur is not None:
+                    push(root_length + spur[0], root[:-1] + spur[1])
+                ignore_nodes.add(root[-1])
+        return [[self.nodes[i] for i in path] for path in found]
@@ -1,9 +1,11 @@
+import time
 import xml.etree.ElementTree as ET
 from typing import Dict
 
 from src.LightPath import LightPath
 from src.ControlPlaneForRSA import ControlPlaneForRSA
 from src.EventScheduler import EventScheduler
+from src.EventDispatcher import EventDispatcher
 from src.PhysicalTopology import PhysicalTopology
 from src.VirtualTopology import VirtualTopology
 from src.TrafficGenerator import TrafficGenerator
@@ -24,28 +26,55 @@ class ControlPlane(ControlPlaneForRSA):
         self.rsa = None
         self.pt = pt
         self.vt = vt
+        self.event_scheduler = event_scheduler
         self.mapped_flows = {}
         self.active_flows = {}
         self.tr = Tracer.get_tracer_object()
         self.st = MyStatistics.get_my_statistics()
+        # Cancel the departure of blocked flows instead of handling it
+        self.cancel_departures = False
 
         try:
-            # RSAClass  = globals()[rsa_module]
-            # self.rsa = RSAClass()
-            # self.rsa.simulation_interface(xml, pt, vt, self, traffic)
-            # self.rsa = ImageRCSA()
-            self.rsa = FIPP()
+            RSAClass = globals()[rsa_module]
+            self.rsa = RSAClass()
             self.rsa.simulation_interface(xml, pt, vt, self, traffic)
         except Exception as e:
             print("Error in ControlPlane: ", e)
 
     def new_event(self, event: Event):
-        if isinstance(event, FlowArrivalEvent):
-            self.new_flow(event.get_flow())
-            self.rsa.flow_arrival(event.get_flow())
-        elif isinstance(event, FlowDepartureEvent):
-            removed_flow = self.remove_flow(event.get_id())
-            self.rsa.flow_departure(removed_flow)
+        if event.kind == Event.ARRIVAL:
+            self.flow_arrived(event)
+        elif event.kind == Event.DEPARTURE:
+            self.flow_departed(event)
+
+    def subscribe(self, dispatcher: EventDispatcher, latency: bool = True) -> None:
+        """Handles the events of `dispatcher`, recording the decision latency of the arrivals with `latency`"""
+        dispatcher.subscribe(Event.ARRIVAL, self.timed_flow_arrived if latency else self.flow_arrived)
+        dispatcher.subscribe(Event.DEPARTURE, self.flow_departed)
+
+    def toogle_departure_cancelling(self, cancel: bool) -> None:
+        self.cancel_departures = cancel
+
+    def flow_arrived(self, event: FlowArrivalEvent) -> None:
+        flow = event.get_flow()
+        self.new_flow(flow)
+        self.rsa.flow_arrival(flow)
+        if self.cancel_departures and event.departure is not None and flow.get_id() not in self.active_flows:
+            # Blocked: there is nothing to release when it departs
+            self.event_scheduler.cancel_event(event.departure)
+
+    def timed_flow_arrived(self, event: FlowArrivalEvent) -> None:
+        """Handles an arrival and records the decision latency of the RSA, by outcome"""
+        start = time.perf_counter_ns()
+        self.flow_arrived(event)
+        self.st.add_latency(self.rsa.get_last_outcome(), time.perf_counter_ns() - start, self.rsa.fell_back)
+
+    def flow_departed(self, event: FlowDepartureEvent) -> None:
+        removed_flow = self.remove_flow(event.get_id())
+        self.rsa.flow_departure(removed_flow)
+
+    def get_rsa(self):
+        return self.rsa
 
     def get_flow(self, id: int) -> Flow:
         return self.active_flows.get(id)
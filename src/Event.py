@@ -2,6 +2,17 @@ from abc import ABC, abstractmethod
 
 
 class Event(ABC):
+    # Kinds of event, subclasses tag themselves with theirs
+    ARRIVAL = 0
+    DEPARTURE = 1
+    LINK_FAILURE = 2
+    NODE_FAILURE = 3
+    FAILURE_SWEEP = 4
+    KINDS = [ARRIVAL, DEPARTURE, LINK_FAILURE, NODE_FAILURE, FAILURE_SWEEP]
+
+    kind = None
+    # Set on events cancelled after they were scheduled, which the scheduler then skips
+    cancelled = False
 
     def __init__(self, time: float):
         self.time = time
@@ -12,6 +23,9 @@ class Event(ABC):
     def get_time(self) -> float:
         return self.time
 
+    def get_kind(self) -> int:
+        return self.kind
+
     def __eq__(self, other):
         return self.get_time() == other.get_time()
 
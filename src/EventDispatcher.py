@@ -0,0 +1,28 @@
+from typing import Callable, Dict, List
+
+from src.Event import Event
+
+
+class EventDispatcher:
+    """
+    Handlers of each kind of event, called in the order they subscribed.
+
+    Components subscribe a handler per kind of event they take part in, and
+    only while they are enabled, so a disabled tracer or statistics object
+    is never called. Loops over many events take the handler list of every
+    kind once with get_handlers() and index it with event.kind.
+    """
+
+    def __init__(self):
+        self.handlers: Dict[int, List[Callable[[Event], None]]] = {kind: [] for kind in Event.KINDS}
+
+    def subscribe(self, kind: int, handler: Callable[[Event], None]) -> None:
+        assert kind in self.handlers, "Unknown event kind!"
+        self.handlers[kind].append(handler)
+
+    def get_handlers(self, kind: int) -> List[Callable[[Event], None]]:
+        return self.handlers[kind]
+
+    def dispatch(self, event: Event) -> None:
+        for handler in self.handlers[event.kind]:
+            handler(event)
@@ -0,0 +1,108 @@
+import numpy as np
+
+from src.Event import Event
+from src.Flow import Flow
+from src.LightPath import LightPath
+from src.FlowArrivalEvent import FlowArrivalEvent
+from src.FlowDepartureEvent import FlowDepartureEvent
+
+
+class EventLog:
+    """
+    Columnar record of every arrival, accept, block and departure of a run.
+
+    Records are appended to preallocated NumPy columns, so the per-event cost
+    is a handful of array stores. MyStatistics computes its metrics from the
+    columns afterwards, and the columns can be saved as .npy files to analyse
+    a run again without rerunning it.
+    """
+
+    ARRIVAL = 0
+    ACCEPT = 1
+    BLOCK = 2
+    DEPARTURE = 3
+
+    COLUMNS = {
+        "time": np.float64,
+        "id": np.int64,
+        "src": np.int32,
+        "dst": np.int32,
+        "rate": np.int64,
+        "cos": np.int32,
+        "outcome": np.int8,
+        "hops": np.int32,
+        "path_id": np.int64,
+        "modulation": np.int8,
+    }
+
+    def __init__(self, capacity: int = 1024):
+        self.size = 0
+        self.time = 0.0
+        self.columns = {name: np.empty(max(capacity, 1), dtype=dtype) for name, dtype in EventLog.COLUMNS.items()}
+
+    def get_size(self) -> int:
+        return self.size
+
+    def get_column(self, name: str) -> np.ndarray:
+        """View of the records appended so far in column `name`"""
+        return self.columns[name][:self.size]
+
+    def grow(self) -> None:
+        capacity = 2 * len(self.columns["time"])
+        for name, column in self.columns.items():
+            grown = np.empty(capacity, dtype=column.dtype)
+            grown[:self.size] = column[:self.size]
+            self.columns[name] = grown
+
+    def append(self, outcome: int, flow: Flow, hops: int = -1, path_id: int = -1) -> None:
+        if self.size == len(self.columns["time"]):
+            self.grow()
+        i = self.size
+        columns = self.columns
+        columns["time"][i] = self.time
+        columns["id"][i] = flow.id
+        columns["src"][i] = flow.src
+        columns["dst"][i] = flow.dst
+        columns["rate"][i] = flow.bw
+        columns["cos"][i] = flow.cos
+        columns["outcome"][i] = outcome
+        columns["hops"][i] = hops
+        columns["path_id"][i] = path_id
+        columns["modulation"][i] = flow.modulation_level
+        self.size = i + 1
+
+    def add_event(self, event: Event) -> None:
+        if event.kind == Event.ARRIVAL:
+            self.flow_arrived(event)
+        elif event.kind == Event.DEPARTURE:
+            self.flow_departed(event)
+
+    def flow_arrived(self, event: FlowArrivalEvent) -> None:
+        self.time = event.get_time()
+        self.append(EventLog.ARRIVAL, event.get_flow())
+
+    def flow_departed(self, event: FlowDepartureEvent) -> None:
+        self.time = event.get_time()
+        self.append(EventLog.DEPARTURE, event.get_flow())
+
+    def accept_flow(self, flow: Flow, light_paths: LightPath) -> None:
+        self.append(EventLog.ACCEPT, flow, len(flow.get_links()), light_paths.get_id())
+
+    def block_flow(self, flow: Flow) -> None:
+        self.append(EventLog.BLOCK, flow)
+
+    def save(self, prefix: str) -> None:
+        """Writes every column to `<prefix>_<column>.npy`"""
+        for name in EventLog.COLUMNS:
+            np.save(f"{prefix}_{name}.npy", self.get_column(name))
+
+    @staticmethod
+    def load(prefix: str) -> "EventLog":
+        columns = {name: np.load(f"{prefix}_{name}.npy") for name in EventLog.COLUMNS}
+        log = EventLog(len(columns["time"]))
+        log.size = len(columns["time"])
+        for name, column in columns.items():
+            log.columns[name][:log.size] = column
+        if log.size > 0:
+            log.time = float(columns["time"][-1])
+        return log
@@ -1,35 +1,107 @@
-from queue import PriorityQueue, Empty
+import heapq
+from typing import Callable, Iterator, List
 
 from src.Event import Event
+from src.Flow import Flow
+from src.FlowArrivalEvent import FlowArrivalEvent
+from src.FlowDepartureEvent import FlowDepartureEvent
+from src.TrafficArrays import TrafficArrays
 
 
-# class EventSort(Event):
-#     def __eq__(self, other):
-#         return self.get_time() == other.get_time()
-#
-#     def __lt__(self, other):
-#         return self.get_time() < other.get_time()
-#
-#     def __gt__(self, other):
-#         return self.get_time() > other.get_time()
-#
-#     def __le__(self, other):
-#         return self.get_time() <= other.get_time()
-#
-#     def __ge__(self, other):
-#         return self.get_time() >= other.get_time()
+class EventScheduler:
+    """
+    Time-ordered event queue.
 
+    Individual events are kept in a binary heap. Calls handed over as
+    columnar TrafficArrays chunks are not turned into objects up front:
+    the next arrival is read from the current chunk and only materialized
+    (Flow, arrival event and its departure event) when it is popped.
+
+    Cancelled events are left in the heap as tombstones and skipped when
+    they come up, after being handed to the cancel listeners.
+    """
 
-class EventScheduler:
     def __init__(self):
-        # self.event_sort = EventSort
-        self.event_queue = PriorityQueue()
+        # Heap of (time, insertion order, event)
+        self.event_queue = []
+        self.sequence = 0
+
+        self.arrivals = None
+        self.chunk_listeners: List[Callable[[TrafficArrays], None]] = []
+        self.cancel_listeners: List[Callable[[Event], None]] = []
+        self.cancelled = 0
+        self.chunk = None
+        self.chunk_index = 0
+        self.next_arrival_time = float("inf")
 
     def add_event(self, event: Event):
-        self.event_queue.put(event)
+        heapq.heappush(self.event_queue, (event.get_time(), self.sequence, event))
+        self.sequence += 1
+
+    def cancel_event(self, event: Event) -> None:
+        if not event.cancelled:
+            event.cancelled = True
+            self.cancelled += 1
+
+    def get_cancelled(self) -> int:
+        """Number of events cancelled so far"""
+        return self.cancelled
+
+    def add_cancel_listener(self, listener: Callable[[Event], None]) -> None:
+        """`listener` is called with every cancelled event at the time it would have been popped"""
+        self.cancel_listeners.append(listener)
+
+    def add_arrivals(self, chunks: Iterator[TrafficArrays]) -> None:
+        """Schedules the calls of `chunks`, pulling the next chunk only when the previous one is used up"""
+        self.arrivals = iter(chunks)
+
+    def add_chunk_listener(self, listener: Callable[[TrafficArrays], None]) -> None:
+        """`listener` is called with every chunk of arrivals when it is loaded"""
+        self.chunk_listeners.append(listener)
+
+    def load_chunk(self) -> None:
+        chunk = next(self.arrivals, None)
+        while chunk is not None and len(chunk) == 0:
+            chunk = next(self.arrivals, None)
+        if chunk is None:
+            self.arrivals = None
+            self.chunk = None
+            self.next_arrival_time = float("inf")
+            return
+        for listener in self.chunk_listeners:
+            listener(chunk)
+        # Python scalars are much cheaper to hand out one at a time than NumPy ones
+        self.chunk = [getattr(chunk, name).tolist() for name in TrafficArrays.COLUMNS]
+        self.chunk_index = 0
+        self.next_arrival_time = self.chunk[1][0]
+
+    def next_arrival(self) -> Event:
+        i = self.chunk_index
+        id, time, holding_time, departure_time, deadline, src, dst, rate, cos = [column[i] for column in self.chunk]
+        flow = Flow(id, src, dst, time, rate, holding_time, cos, deadline)
+        departure = FlowDepartureEvent(departure_time, id, flow)
+        self.add_event(departure)
+
+        self.chunk_index = i + 1
+        if self.chunk_index == len(self.chunk[0]):
+            self.load_chunk()
+        else:
+            self.next_arrival_time = self.chunk[1][self.chunk_index]
+        return FlowArrivalEvent(time, flow, departure)
+
+    def has_arrivals(self) -> bool:
+        """Whether calls of the arrival chunks are still to be popped"""
+        return self.arrivals is not None or self.chunk is not None
 
     def pop_event(self) -> Event:
-        try:
-            return self.event_queue.get_nowait()
-        except Empty:
+        if self.chunk is None and self.arrivals is not None:
+            self.load_chunk()
+        while self.event_queue and self.event_queue[0][0] <= self.next_arrival_time:
+            event = heapq.heappop(self.event_queue)[2]
+            if not event.cancelled:
+                return event
+            for listener in self.cancel_listeners:
+                listener(event)
+        if self.chunk is None:
             return None
+        return self.next_arrival()
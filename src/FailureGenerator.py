@@ -0,0 +1,75 @@
+import xml.etree.ElementTree as ET
+
+from src.Event import Event
+from src.EventDispatcher import EventDispatcher
+from src.EventScheduler import EventScheduler
+from src.FailureSweepEvent import FailureSweepEvent
+from src.LinkFailureEvent import LinkFailureEvent
+from src.NodeFailureEvent import NodeFailureEvent
+from src.PhysicalTopology import PhysicalTopology
+from src.util.Distribution import Distribution
+
+
+class FailureGenerator:
+    """
+    Failures of the <failures> element of a simulation file:
+    - link-rate: mean number of link failures per unit of time, over the
+      whole network, at a link drawn at random;
+    - node-rate: the same for node failures;
+    - sweep-time: time of a sweep over every single-link failure;
+    - workers: number of processes of a sweep (all the CPUs by default).
+
+    Failures arrive as Poisson processes. The next failure is only
+    scheduled when one happens and calls are still arriving, so failures
+    stop with the traffic.
+    """
+
+    # Random streams, past the ones of the TrafficGenerator
+    LINK_STREAM = 6
+    NODE_STREAM = 7
+
+    def __init__(self, xml: ET.Element, pt: PhysicalTopology, seed: int):
+        self.link_rate = float(xml.attrib.get("link-rate", "0"))
+        self.node_rate = float(xml.attrib.get("node-rate", "0"))
+        self.sweep_time = float(xml.attrib["sweep-time"]) if "sweep-time" in xml.attrib else None
+        self.workers = int(xml.attrib.get("workers", "0"))
+        assert self.link_rate >= 0 and self.node_rate >= 0, "Invalid failure rate!"
+        self.links = pt.get_link_ids()
+        self.nodes = list(pt.get_graph().nodes)
+        self.link_random = Distribution(FailureGenerator.LINK_STREAM, seed)
+        self.node_random = Distribution(FailureGenerator.NODE_STREAM, seed)
+        self.events = None
+
+    def get_workers(self) -> int:
+        return self.workers
+
+    def generate_failures(self, events: EventScheduler) -> None:
+        """Schedules the first failures and the sweep"""
+        self.events = events
+        if self.link_rate > 0 and self.links:
+            self.schedule_link_failure(0.0)
+        if self.node_rate > 0 and self.nodes:
+            self.schedule_node_failure(0.0)
+        if self.sweep_time is not None:
+            events.add_event(FailureSweepEvent(self.sweep_time))
+
+    def subscribe(self, dispatcher: EventDispatcher) -> None:
+        """Schedules the next failure whenever one happens"""
+        dispatcher.subscribe(Event.LINK_FAILURE, self.link_failed)
+        dispatcher.subscribe(Event.NODE_FAILURE, self.node_failed)
+
+    def schedule_link_failure(self, time: float) -> None:
+        time += self.link_random.next_exponential(1.0 / self.link_rate)
+        self.events.add_event(LinkFailureEvent(time, self.links[self.link_random.next_int(len(self.links))]))
+
+    def schedule_node_failure(self, time: float) -> None:
+        time += self.node_random.next_exponential(1.0 / self.node_rate)
+        self.events.add_event(NodeFailureEvent(time, self.nodes[self.node_random.next_int(len(self.nodes))]))
+
+    def link_failed(self, event: LinkFailureEvent) -> None:
+        if self.events.has_arrivals():
+            self.schedule_link_failure(event.get_time())
+
+    def node_failed(self, event: NodeFailureEvent) -> None:
+        if self.events.has_arrivals():
+            self.schedule_node_failure(event.get_time())
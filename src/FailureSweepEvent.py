@@ -0,0 +1,9 @@
+from .Event import Event
+
+
+class FailureSweepEvent(Event):
+    """Time at which every single-link failure is evaluated on the state of the network"""
+    kind = Event.FAILURE_SWEEP
+
+    def __str__(self):
+        return f"Failure sweep: {self.time}"
@@ -1,14 +1,22 @@
 from .Flow import Flow
 from .Event import Event
+from .FlowDepartureEvent import FlowDepartureEvent
 
 
 class FlowArrivalEvent(Event):
-    def __init__(self, time: float, flow: Flow):
+    kind = Event.ARRIVAL
+
+    def __init__(self, time: float, flow: Flow, departure: FlowDepartureEvent = None):
         super().__init__(time)
         self.flow = flow
+        self.departure = departure
 
     def get_flow(self) -> Flow:
         return self.flow
 
+    def get_departure(self) -> FlowDepartureEvent:
+        """Departure event scheduled along with the arrival, if any"""
+        return self.departure
+
     def __str__(self):
         return f"Arrival: {self.flow}"
@@ -3,6 +3,8 @@ from .Flow import Flow
 
 
 class FlowDepartureEvent(Event):
+    kind = Event.DEPARTURE
+
     def __init__(self, time: float, id: int, flow: Flow):
         super().__init__(time)
         self.id = id
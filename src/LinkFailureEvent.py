@@ -0,0 +1,15 @@
+from .Event import Event
+
+
+class LinkFailureEvent(Event):
+    kind = Event.LINK_FAILURE
+
+    def __init__(self, time: float, link: int):
+        super().__init__(time)
+        self.link = link
+
+    def get_link(self) -> int:
+        return self.link
+
+    def __str__(self):
+        return f"Link failure: {self.link}"
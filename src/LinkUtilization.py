@@ -0,0 +1,259 @@
+import xml.etree.ElementTree as ET
+from typing import Dict, List, Optional
+
+from src.Event import Event
+from src.EventDispatcher import EventDispatcher
+from src.OutputManager import OutputManager
+from src.PhysicalTopology import PhysicalTopology
+
+
+class LinkUtilization:
+    """
+    Time-weighted occupancy, fragmentation and crosstalk of the links, from
+    the <utilization> element of a simulation file:
+    - interval: time between the samples added to the interval-utilization,
+      interval-fragmentation and interval-crosstalk graphs (none by default).
+    The fragmentation and xtps graphs get a sample every 100 arrivals, like
+    the periodical statistics, whether or not the events are logged.
+
+    The counters are sums over slots that reserving or releasing a slot only
+    changes around it, so PhysicalTopology updates them in O(changed slots):
+    - busy slots per core;
+    - free runs (blocks of contiguous free slots) per core, from the
+      neighbours of the slot on its core;
+    - adjacent-core pairs: busy slots with the same slot busy on a core next
+      to theirs, counted as get_cross_talk_per_slot does: cores are in a
+      ring, so with two cores each one is the other's neighbour twice.
+    Fragmentation is the share of free runs beyond the first of each core
+    with free slots, crosstalk the adjacent-core pairs per busy slot.
+
+    The counters are constant between events, so their integrals over time
+    are brought up to date when they change: those of a link when it
+    changes, O(cores), and those of the network in O(1). Samples are
+    differences of the network integrals.
+    """
+
+    # Arrivals between the samples of the fragmentation and xtps graphs
+    SAMPLE_ARRIVALS = 100
+
+    def __init__(self, xml: ET.Element, pt: PhysicalTopology, plotter: OutputManager, load: float):
+        self.interval = float(xml.attrib["interval"]) if "interval" in xml.attrib else None
+        assert self.interval is None or self.interval > 0, "Invalid utilization interval!"
+        self.pt = pt
+        self.plotter = plotter
+        self.load = load
+        self.cores = pt.get_cores()
+        self.slots = pt.get_num_slots()
+        # Cores next to each core, in a ring, as get_cross_talk_per_slot takes them
+        self.neighbours = [[(core - 1) % self.cores, (core + 1) % self.cores] if self.cores > 1 else []
+                           for core in range(self.cores)]
+        # Time of the event being handled, and arrivals so far
+        self.time = 0.0
+        self.arrivals = 0
+
+        # Per link: busy slots and free runs of each core, adjacent-core pairs,
+        # and their integrals over time up to `last`
+        self.used: Dict[int, List[int]] = {}
+        self.runs: Dict[int, List[int]] = {}
+        self.pairs: Dict[int, int] = {}
+        self.last: Dict[int, float] = {}
+        self.used_time: Dict[int, List[float]] = {}
+        self.fragmentation_time: Dict[int, float] = {}
+        self.crosstalk_time: Dict[int, float] = {}
+
+        # Network: totals of the links, and integrals up to network_last
+        self.total_used = 0
+        self.total_runs = 0
+        self.total_free_cores = 0
+        self.total_pairs = 0
+        self.network_last = 0.0
+        self.network_used_time = 0.0
+        self.network_fragmentation_time = 0.0
+        self.network_crosstalk_time = 0.0
+
+        # Integrals at the start of the interval being sampled
+        self.next_sample = self.interval
+        self.sample_start = (0.0, 0.0, 0.0)
+
+        for link_id in pt.get_link_ids():
+            self.used[link_id] = [0] * self.cores
+            self.runs[link_id] = [0] * self.cores
+            self.pairs[link_id] = 0
+            self.last[link_id] = 0.0
+            self.used_time[link_id] = [0.0] * self.cores
+            self.fragmentation_time[link_id] = 0.0
+            self.crosstalk_time[link_id] = 0.0
+            self.reset_link(link_id)
+
+    def subscribe(self, dispatcher: EventDispatcher) -> None:
+        """Follows the time of the arrivals and departures, before the control plane handles them"""
+        dispatcher.subscribe(Event.ARRIVAL, self.event_happened)
+        dispatcher.subscribe(Event.DEPARTURE, self.event_happened)
+
+    def event_happened(self, event: Event) -> None:
+        time = event.get_time()
+        if self.interval is not None:
+            while self.next_sample <= time:
+                self.sample()
+        self.time = time
+        if event.kind == Event.ARRIVAL:
+            self.arrivals += 1
+            if self.arrivals % LinkUtilization.SAMPLE_ARRIVALS == 0:
+                self.plotter.add_dot_to_graph("fragmentation", self.load, self.get_fragmentation())
+                if self.total_pairs:
+                    self.plotter.add_dot_to_graph("xtps", self.load, self.get_crosstalk())
+
+    def sample(self) -> None:
+        """Adds the averages over the interval ending at next_sample to the graphs"""
+        self.update_network(self.next_sample)
+        start = self.next_sample - self.interval
+        used_time, fragmentation_time, crosstalk_time = self.sample_start
+        self.plotter.add_dot_to_graph("interval-utilization", start,
+                                      (self.network_used_time - used_time) / (self.get_capacity() * self.interval) * 100)
+        self.plotter.add_dot_to_graph("interval-fragmentation", start,
+                                      (self.network_fragmentation_time - fragmentation_time) / self.interval)
+        self.plotter.add_dot_to_graph("interval-crosstalk", start,
+                                      (self.network_crosstalk_time - crosstalk_time) / self.interval)
+        self.sample_start = (self.network_used_time, self.network_fragmentation_time, self.network_crosstalk_time)
+        self.next_sample += self.interval
+
+    def reset_link(self, link_id: int) -> None:
+        """Recounts a link from its occupancy, after PhysicalTopology rebuilt it"""
+        self.update_link(link_id)
+        self.add_link_totals(link_id, -1)
+        occupancy = self.pt.get_occupancy(link_id)
+        self.used[link_id] = [sum(row) for row in occupancy]
+        self.runs[link_id] = [sum(1 for run in bytes(row).split(b"\x01") if run) for row in occupancy]
+        busy = [int.from_bytes(row, "big") for row in occupancy]
+        self.pairs[link_id] = sum(bin(busy[core] & busy[neighbour]).count("1")
+                                  for core in range(self.cores) for neighbour in self.neighbours[core])
+        self.add_link_totals(link_id, 1)
+
+    def add_link_totals(self, link_id: int, sign: int) -> None:
+        runs = self.runs[link_id]
+        self.total_used += sign * sum(self.used[link_id])
+        self.total_runs += sign * sum(runs)
+        self.total_free_cores += sign * sum(1 for core_runs in runs if core_runs)
+        self.total_pairs += sign * self.pairs[link_id]
+
+    def update_link(self, link_id: int) -> None:
+        """Integrates the counters of a link, and those of the network, up to the current time"""
+        dt = self.time - self.last[link_id]
+        if dt > 0:
+            used = self.used[link_id]
+            used_time = self.used_time[link_id]
+            for core in range(self.cores):
+                used_time[core] += used[core] * dt
+            self.fragmentation_time[link_id] += self.get_link_fragmentation(link_id) * dt
+            self.crosstalk_time[link_id] += self.get_link_crosstalk(link_id) * dt
+            self.last[link_id] = self.time
+        self.update_network(self.time)
+
+    def update_network(self, time: float) -> None:
+        dt = time - self.network_last
+        if dt > 0:
+            self.network_used_time += self.total_used * dt
+            self.network_fragmentation_time += self.get_fragmentation() * dt
+            self.network_crosstalk_time += self.get_crosstalk() * dt
+            self.network_last = time
+
+    def reserve_slot(self, link_id: int, occupancy: List[bytearray], core: int, slot: int) -> None:
+        """Counts a free slot as busy, before it is marked in the occupancy of its link"""
+        row = occupancy[core]
+        left = slot > 0 and not row[slot - 1]
+        right = slot < self.slots - 1 and not row[slot + 1]
+        runs = self.runs[link_id]
+        # The free run of the slot is split in two, shortened or gone
+        if left and right:
+            runs[core] += 1
+            self.total_runs += 1
+        elif not left and not right:
+            runs[core] -= 1
+            self.total_runs -= 1
+            if runs[core] == 0:
+                self.total_free_cores -= 1
+        busy = 0
+        for neighbour in self.neighbours[core]:
+            busy += occupancy[neighbour][slot]
+        self.pairs[link_id] += 2 * busy
+        self.total_pairs += 2 * busy
+        self.used[link_id][core] += 1
+        self.total_used += 1
+
+    def release_slot(self, link_id: int, occupancy: List[bytearray], core: int, slot: int) -> None:
+        """Counts a busy slot as free, before it is cleared in the occupancy of its link"""
+        row = occupancy[core]
+        left = slot > 0 and not row[slot - 1]
+        right = slot < self.slots - 1 and not row[slot + 1]
+        runs = self.runs[link_id]
+        # The slot joins two free runs, extends one or starts a new one
+        if left and right:
+            runs[core] -= 1
+            self.total_runs -= 1
+        elif not left and not right:
+            if runs[core] == 0:
+                self.total_free_cores += 1
+            runs[core] += 1
+            self.total_runs += 1
+        busy = 0
+        for neighbour in self.neighbours[core]:
+            busy += occupancy[neighbour][slot]
+        self.pairs[link_id] -= 2 * busy
+        self.total_pairs -= 2 * busy
+        self.used[link_id][core] -= 1
+        self.total_used -= 1
+
+    def get_capacity(self) -> int:
+        """Slots of all the cores of all the links"""
+        return len(self.used) * self.cores * self.slots
+
+    def get_fragmentation(self) -> float:
+        """Share of the free runs of the network beyond the first of each core"""
+        return 1 - self.total_free_cores / self.total_runs if self.total_runs else 0.0
+
+    def get_crosstalk(self) -> float:
+        """Adjacent-core pairs of the network per busy slot"""
+        return self.total_pairs / self.total_used if self.total_used else 0.0
+
+    def get_link_fragmentation(self, link_id: int) -> float:
+        runs = self.runs[link_id]
+        total = sum(runs)
+        return 1 - sum(1 for core_runs in runs if core_runs) / total if total else 0.0
+
+    def get_link_crosstalk(self, link_id: int) -> float:
+        used = sum(self.used[link_id])
+        return self.pairs[link_id] / used if used else 0.0
+
+    def get_average_utilization(self) -> float:
+        """Time-weighted share of the slots of the network in use"""
+        self.update_network(self.time)
+        return self.network_used_time / (self.get_capacity() * self.time) if self.time > 0 else 0.0
+
+    def get_average_fragmentation(self) -> float:
+        self.update_network(self.time)
+        return self.network_fragmentation_time / self.time if self.time > 0 else 0.0
+
+    def get_average_crosstalk(self) -> float:
+        self.update_network(self.time)
+        return self.network_crosstalk_time / self.time if self.time > 0 else 0.0
+
+    def get_link_occupancy(self, link_id: int) -> List[float]:
+        """Time-weighted share of the slots in use of each core of a link"""
+        self.update_link(link_id)
+        if self.time <= 0:
+            return [0.0] * self.cores
+        return [used_time / (self.slots * self.time) for used_time in self.used_time[link_id]]
+
+    def get_average_link_fragmentation(self, link_id: int) -> float:
+        self.update_link(link_id)
+        return self.fragmentation_time[link_id] / self.time if self.time > 0 else 0.0
+
+    def get_average_link_crosstalk(self, link_id: int) -> float:
+        self.update_link(link_id)
+        return self.crosstalk_time[link_id] / self.time if self.time > 0 else 0.0
+
+    def get_busiest_link(self) -> Optional[int]:
+        """Link with the most slots in use over time"""
+        for link_id in self.used:
+            self.update_link(link_id)
+        return max(self.used_time, key=lambda link_id: sum(self.used_time[link_id]), default=None)
@@ -0,0 +1,100 @@
+import math
+import xml.etree.ElementTree as ET
+
+import numpy as np
+
+
+class LoadProfile:
+    """
+    Time-varying load multiplier applied on top of the traffic load.
+
+    type="piecewise" takes <interval start end multiplier> children (times
+    not covered use the `multiplier` attribute, 1 by default) and repeats
+    them every `period` seconds when given. type="diurnal" follows
+    multiplier * (1 + amplitude * sin(2 pi (t - phase) / period)).
+
+    Statistics are bucketed per interval: the piecewise segments, or slots
+    of `interval` seconds (period / 24 by default) for the diurnal profile.
+    An optional `duration` stops the traffic at that simulated time.
+    """
+
+    def __init__(self, xml: ET.Element):
+        assert "type" in xml.attrib, "type attribute is missing!"
+        self.type = xml.attrib["type"]
+        self.duration = float(xml.attrib.get("duration", "inf"))
+        self.multiplier = float(xml.attrib.get("multiplier", "1"))
+        self.period = float(xml.attrib.get("period", "0"))
+
+        if self.type == "piecewise":
+            intervals = []
+            for child in xml:
+                if child.tag != "interval":
+                    raise Exception("Unknown element " + child.tag + " in the load profile!")
+                assert "start" in child.attrib, "start attribute is missing!"
+                assert "end" in child.attrib, "end attribute is missing!"
+                assert "multiplier" in child.attrib, "multiplier attribute is missing!"
+                intervals.append((float(child.attrib["start"]), float(child.attrib["end"]),
+                                  float(child.attrib["multiplier"])))
+            assert intervals, "piecewise load profile has no interval!"
+            intervals.sort()
+            for (_, end, _), (start, _, _) in zip(intervals, intervals[1:]):
+                assert end <= start, "load profile intervals overlap!"
+            if self.period > 0:
+                assert intervals[-1][1] <= self.period, "load profile intervals must fit in the period!"
+
+            # Segment i covers [edges[i - 1], edges[i]), segment 0 starts at time 0
+            edges = []
+            values = [self.multiplier]
+            for start, end, multiplier in intervals:
+                if not edges or edges[-1] != start:
+                    edges.append(start)
+                    values.append(self.multiplier)
+                values[-1] = multiplier
+                edges.append(end)
+                values.append(self.multiplier)
+            self.edges = np.array(edges, dtype=np.float64)
+            self.values = np.array(values, dtype=np.float64)
+            self.max_multiplier = float(self.values.max())
+        elif self.type == "diurnal":
+            if self.period == 0:
+                self.period = 86400.0
+            self.amplitude = float(xml.attrib.get("amplitude", "0.5"))
+            assert 0 <= self.amplitude <= 1, "amplitude must be between 0 and 1!"
+            self.phase = float(xml.attrib.get("phase", "0"))
+            self.interval = float(xml.attrib.get("interval", str(self.period / 24)))
+            self.max_multiplier = self.multiplier * (1 + self.amplitude)
+        else:
+            raise Exception("Unknown load profile type " + self.type + "!")
+        assert self.max_multiplier > 0, "load profile multipliers must not all be zero!"
+
+    def get_duration(self) -> float:
+        return self.duration
+
+    def get_max_multiplier(self) -> float:
+        return self.max_multiplier
+
+    def get_multipliers(self, times: np.ndarray) -> np.ndarray:
+        if self.type == "diurnal":
+            return self.multiplier * (1 + self.amplitude * np.sin(2 * math.pi * (times - self.phase) / self.period))
+        if self.period > 0:
+            times = np.mod(times, self.period)
+        return self.values[np.searchsorted(self.edges, times, side="right")]
+
+    def get_intervals(self, times: np.ndarray) -> np.ndarray:
+        """Statistics bucket of each of `times`"""
+        if self.type == "diurnal":
+            return (times // self.interval).astype(np.int64)
+        if self.period > 0:
+            cycles = (times // self.period).astype(np.int64)
+            segments = np.searchsorted(self.edges, np.mod(times, self.period), side="right")
+            return cycles * (len(self.edges) + 1) + segments
+        return np.searchsorted(self.edges, times, side="right")
+
+    def get_interval(self, time: float) -> int:
+        return int(self.get_intervals(np.array([time]))[0])
+
+    def get_interval_start(self, interval: int) -> float:
+        if self.type == "diurnal":
+            return interval * self.interval
+        cycle, segment = divmod(interval, len(self.edges) + 1) if self.period > 0 else (0, interval)
+        return float(cycle * self.period + (self.edges[segment - 1] if segment > 0 else 0.0))
@@ -1,4 +1,7 @@
 import threading
+from typing import Dict
+
+import numpy as np
 
 from src.OutputManager import OutputManager
 from src.PhysicalTopology import PhysicalTopology
@@ -10,6 +13,11 @@ from src.Modulations import Modulations
 from src.Event import Event
 from src.FlowArrivalEvent import FlowArrivalEvent
 from src.FlowDepartureEvent import FlowDepartureEvent
+from src.EventLog import EventLog
+from src.EventDispatcher import EventDispatcher
+from src.TrafficArrays import TrafficArrays
+from src.graphs.Summary import Summary
+from src.util.LatencyHistogram import LatencyHistogram
 
 
 class MyStatistics:
@@ -17,6 +25,7 @@ class MyStatistics:
 
     def __init__(self):
         self.verbose = False
+        self.enabled = True
         self.plotter = OutputManager
         self.pt = PhysicalTopology
         self.traffic = TrafficGenerator
@@ -58,6 +67,25 @@ class MyStatistics:
         self.blocked_bandwidth_pairs_diff = [[[int]]]
         self.number_of_used_transponders = [[int]]
 
+        # Columnar mode: records go to the event log and counters are computed at checkpoints
+        self.event_log = None
+        self.log_position = 0
+        # Arrivals counted per chunk of traffic arrays instead of per event: arrivals and the arrival
+        # counters then include arrivals still to come, and only make sense at the end of the run
+        self.bulk_arrivals = False
+
+        # Arrivals and blocks per load profile interval
+        self.profile = None
+        self.interval_arrivals = {}
+        self.interval_blocked = {}
+
+        # RSA decision latency of the arrivals, in nanoseconds, per outcome
+        self.latency = {}
+        self.budget_fallbacks = 0
+
+        # Light paths hit and restored by the failures, per kind of failure
+        self.failures = {}
+
     @staticmethod
     def get_my_statistics():
         print("singleton_object: ", MyStatistics.singleton_object)
@@ -77,6 +105,12 @@ class MyStatistics:
 
         self.num_nodes = num_nodes
         self.load = load
+        self.profile = traffic.get_profile()
+        self.interval_arrivals = {}
+        self.interval_blocked = {}
+        self.latency = {}
+        self.budget_fallbacks = 0
+        self.failures = {}
         self.arrivals_pairs = [[0 for _ in range(num_nodes)] for _ in range(num_nodes)]
         self.blocked_pairs = [[0 for _ in range(num_nodes)] for _ in range(num_nodes)]
         self.required_bandwidth_pairs = [[0 for _ in range(num_nodes)] for _ in range(num_nodes)]
@@ -109,7 +143,156 @@ class MyStatistics:
         # self.sim_time = 0.0
         # self.data_transmitted = 0.0
 
+    def toogle_statistics(self, enabled: bool) -> None:
+        self.enabled = enabled
+
+    def set_event_log(self, event_log: EventLog) -> None:
+        self.event_log = event_log
+        self.log_position = 0
+
+    def get_event_log(self) -> EventLog:
+        return self.event_log
+
+    def checkpoint(self) -> None:
+        """Updates the counters from the event log records appended since the last checkpoint"""
+        log = self.event_log
+        if log is None or self.log_position == log.get_size():
+            return
+        start = self.log_position
+        end = log.get_size()
+        self.log_position = end
+
+        outcome = log.get_column("outcome")[start:end]
+        src = log.get_column("src")[start:end].astype(np.int64)
+        dst = log.get_column("dst")[start:end].astype(np.int64)
+        rate = log.get_column("rate")[start:end]
+        cos = log.get_column("cos")[start:end]
+        pair = src * self.num_nodes + dst
+
+        is_arrival = outcome == EventLog.ARRIVAL
+        number_arrivals = self.number_arrivals + np.cumsum(is_arrival)
+        counted = number_arrivals > self.min_number_arrivals
+        self.number_arrivals = int(number_arrivals[-1])
+        self.sim_time = float(log.get_column("time")[end - 1])
+
+        time = log.get_column("time")[start:end]
+        mask = is_arrival & counted
+        self.count_arrivals(pair[mask], cos[mask], rate[mask], time[mask])
+
+        mask = (outcome == EventLog.ACCEPT) & counted
+        if np.any(mask):
+            self.accepted += int(np.count_nonzero(mask))
+            self.add_summary_to_graph("modulation", log.get_column("modulation")[start:end][mask])
+            self.add_summary_to_graph("hops", log.get_column("hops")[start:end][mask] + 1)
+
+        mask = (outcome == EventLog.BLOCK) & counted
+        self.blocked += int(np.count_nonzero(mask))
+        self.add_interval_counts(self.interval_blocked, time[mask])
+        self.blocked_bandwidth += int(rate[mask].sum())
+        self.add_counts(self.blocked_diff, cos[mask])
+        self.add_counts(self.blocked_bandwidth_diff, cos[mask], rate[mask])
+        self.add_pair_counts(self.blocked_pairs, self.blocked_pairs_diff, pair[mask], cos[mask])
+        self.add_pair_counts(self.blocked_bandwidth_pairs, self.blocked_bandwidth_pairs_diff, pair[mask], cos[mask],
+                             rate[mask])
+
+        is_departure = outcome == EventLog.DEPARTURE
+        self.departures += int(np.count_nonzero(is_departure & counted))
+        all_outcomes = log.get_column("outcome")[:end]
+        accepted_ids = log.get_column("id")[:end][all_outcomes == EventLog.ACCEPT]
+        mask = is_departure & np.isin(log.get_column("id")[start:end], accepted_ids)
+        counts = np.bincount(pair[mask], minlength=self.num_nodes * self.num_nodes)
+        for index in np.flatnonzero(counts):
+            self.number_of_used_transponders[index // self.num_nodes][index % self.num_nodes] -= int(counts[index])
+
+        # Link state over time is not part of the log, so periodical statistics are sampled per checkpoint
+        self.calculate_periodical_statistics()
+
+    def add_arrivals(self, arrivals: TrafficArrays) -> None:
+        """Counts a chunk of generated arrivals at once, add_event then only numbers them"""
+        if not self.enabled or self.event_log is not None:
+            return
+        self.bulk_arrivals = True
+        # Call j is arrival number j + 1
+        mask = arrivals.id >= self.min_number_arrivals
+        pair = arrivals.src[mask] * self.num_nodes + arrivals.dst[mask]
+        self.count_arrivals(pair, arrivals.cos[mask], arrivals.rate[mask], arrivals.time[mask])
+
+    def count_arrivals(self, pair: np.ndarray, cos: np.ndarray, rate: np.ndarray, time: np.ndarray) -> None:
+        self.arrivals += len(pair)
+        self.add_interval_counts(self.interval_arrivals, time)
+        self.required_bandwidth += int(rate.sum())
+        self.add_counts(self.arrivals_diff, cos)
+        self.add_counts(self.required_bandwidth_diff, cos, rate)
+        self.add_pair_counts(self.arrivals_pairs, self.arrivals_pairs_diff, pair, cos)
+        self.add_pair_counts(self.required_bandwidth_pairs, self.required_bandwidth_pairs_diff, pair, cos, rate)
+
+    def add_interval_counts(self, counters: dict, time: np.ndarray) -> None:
+        if self.profile is None or len(time) == 0:
+            return
+        intervals, counts = np.unique(self.profile.get_intervals(time), return_counts=True)
+        for interval, count in zip(intervals.tolist(), counts.tolist()):
+            counters[interval] = counters.get(interval, 0) + count
+
+    def add_interval_count(self, counters: dict, time: float) -> None:
+        if self.profile is not None:
+            interval = self.profile.get_interval(time)
+            counters[interval] = counters.get(interval, 0) + 1
+
+    def add_latency(self, outcome: str, nanoseconds: int, fell_back: bool = False) -> None:
+        if not self.enabled:
+            return
+        if outcome is None:
+            outcome = "unresolved"
+        histogram = self.latency.get(outcome)
+        if histogram is None:
+            histogram = self.latency[outcome] = LatencyHistogram()
+        histogram.record(nanoseconds)
+        if fell_back:
+            self.budget_fallbacks += 1
+
+    def get_latency(self, outcome: str) -> LatencyHistogram:
+        return self.latency.get(outcome)
+
+    def add_failure(self, kind: str, impact: Dict[str, int]) -> None:
+        if not self.enabled:
+            return
+        counters = self.failures.get(kind)
+        if counters is None:
+            counters = self.failures[kind] = {"failures": 0}
+        counters["failures"] += 1
+        for name, value in impact.items():
+            counters[name] = counters.get(name, 0) + value
+
+    def get_failures(self, kind: str) -> Dict[str, int]:
+        return self.failures.get(kind)
+
+    @staticmethod
+    def add_counts(counters: [int], cos: np.ndarray, weights: np.ndarray = None) -> None:
+        counts = np.bincount(cos, weights=weights, minlength=len(counters))
+        for i in range(0, len(counters), 1):
+            counters[i] += int(counts[i])
+
+    def add_pair_counts(self, pairs: [[int]], pairs_diff: [[[int]]], pair: np.ndarray, cos: np.ndarray,
+                        weights: np.ndarray = None) -> None:
+        n = self.num_nodes
+        counts = np.bincount(pair, weights=weights, minlength=n * n)
+        for index in np.flatnonzero(counts):
+            pairs[index // n][index % n] += int(counts[index])
+        for c in np.unique(cos):
+            mask = cos == c
+            counts = np.bincount(pair[mask], weights=None if weights is None else weights[mask], minlength=n * n)
+            for index in np.flatnonzero(counts):
+                pairs_diff[c][index // n][index % n] += int(counts[index])
+
+    def add_summary_to_graph(self, graph_name: str, values: np.ndarray) -> None:
+        """Adds a batch of (load, value) dots to a graph as one summary"""
+        n = len(values)
+        mean = float(values.mean())
+        m2 = float(((values - mean) ** 2).sum())
+        self.plotter.add_summary_to_graph(graph_name, self.load, Summary.from_moments(n, [n, n], [self.load, mean], [0.0, m2]))
+
     def calculate_last_statistics(self) -> None:
+        self.checkpoint()
         self.avg_bits_per_symbol = self.avg_bits_per_symbol / self.avg_bits_per_symbol_count
         self.plotter.add_dot_to_graph("avgbps", self.load, self.avg_bits_per_symbol)
         self.plotter.add_dot_to_graph("mbbr", self.load, self.blocked_bandwidth * 1.0 / self.required_bandwidth)
@@ -151,19 +334,22 @@ class MyStatistics:
                                       self.blocked_bandwidth / self.required_bandwidth / self.total_power_consumed / (
                                                   self.sim_time * 1000))
 
+        for interval in sorted(self.interval_arrivals):
+            start = self.profile.get_interval_start(interval)
+            arrivals = self.interval_arrivals[interval]
+            self.plotter.add_dot_to_graph("interval-arrivals", start, arrivals)
+            self.plotter.add_dot_to_graph("interval-bp", start,
+                                          (self.interval_blocked.get(interval, 0) * 1.0 / arrivals) * 100)
+
     def calculate_periodical_statistics(self) -> None:
         fragmentation_mean = 0.0
         average_crosstalk = 0.0
-
-        # for i in range(0, self.pt.get_num_links(), 1):
-        #     fragmentation_mean += self.pt.get_fragmentation_ratio(self.pt.get_src_link(i), self.pt.get_dst_link(i),
-        #                                                           self.traffic.get_calls_types_info(), 12.5)
-            # average_crosstalk += self.pt.average_crosstalk(self.pt.get_src_link(i), self.pt.get_dst_link(i))
+        # Scanning every link is too slow: with <utilization>, LinkUtilization samples fragmentation and xtps itself
 
         # average_crosstalk /= self.pt.get_num_links()
         self.plotter.add_dot_to_graph("avgcrosstalk", self.load, average_crosstalk)
-        fragmentation_mean /= self.pt.get_num_links()
-        self.plotter.add_dot_to_graph("fragmentation", self.load, fragmentation_mean)
+        if self.pt.get_utilization() is None:
+            self.plotter.add_dot_to_graph("fragmentation", self.load, fragmentation_mean)
         mean_transponders = 0.0
         for i in range(0, len(self.number_of_used_transponders), 1):
             for j in range(0, len(self.number_of_used_transponders[i]), 1):
@@ -173,20 +359,12 @@ class MyStatistics:
         if mean_transponders != float('nan'):
             self.plotter.add_dot_to_graph("transponders", self.load, mean_transponders)
 
-        # xtps = 0.0
-        # links_xtps = 0
-        # for i in range(0, self.pt.get_num_links(), 1):
-        #     try:
-        #         xt = self.pt.get_cross_talk_per_slot(self.pt.get_src_link(i), self.pt.get_dst_link(i))
-        #         if xt > 0:
-        #             xtps += xt
-        #             links_xtps += 1
-        #     except ValueError:
-        #         print("Error: ", ValueError)
-        # if xtps != 0:
-        #     self.plotter.add_dot_to_graph("xtps", self.load, xtps / links_xtps)
-
     def accept_flow(self, flow: Flow, light_paths: LightPath) -> None:
+        if not self.enabled:
+            return
+        if self.event_log is not None:
+            self.event_log.accept_flow(flow, light_paths)
+            return
         if self.number_arrivals > self.min_number_arrivals:
             self.accepted += 1
             links = len(flow.get_links()) + 1
@@ -200,8 +378,14 @@ class MyStatistics:
     #             self.total_power_consumed += flow.get_duration() * len(flow.get_slot_list()) * Modulations.get_power_consumption(flow.get_modulation_level())
 
     def block_flow(self, flow: Flow) -> None:
+        if not self.enabled:
+            return
+        if self.event_log is not None:
+            self.event_log.block_flow(flow)
+            return
         if self.number_arrivals > self.min_number_arrivals:
             self.blocked += 1
+            self.add_interval_count(self.interval_blocked, flow.get_time())
             cos = flow.get_cos()
             self.blocked_diff[cos] += 1
             self.blocked_bandwidth += flow.get_rate()
@@ -212,40 +396,81 @@ class MyStatistics:
             self.blocked_bandwidth_pairs_diff[cos][flow.get_source()][flow.get_destination()] += flow.get_rate()
 
     def add_event(self, event: Event) -> None:
+        if not self.enabled:
+            return
+        if self.event_log is not None:
+            self.event_log.add_event(event)
+        elif event.kind == Event.ARRIVAL:
+            self.flow_arrived(event)
+        elif event.kind == Event.DEPARTURE:
+            self.flow_departed(event)
+
+    def subscribe(self, dispatcher: EventDispatcher) -> None:
+        """Counts the events of `dispatcher`, or records them in the event log in columnar mode, if enabled"""
+        if not self.enabled:
+            return
+        if self.event_log is not None:
+            dispatcher.subscribe(Event.ARRIVAL, self.event_log.flow_arrived)
+            dispatcher.subscribe(Event.DEPARTURE, self.event_log.flow_departed)
+        else:
+            dispatcher.subscribe(Event.ARRIVAL, self.flow_arrived)
+            dispatcher.subscribe(Event.DEPARTURE, self.flow_departed)
+
+    def flow_arrived(self, event: FlowArrivalEvent) -> None:
+        self.sim_time = event.get_time()
+        try:
+            self.number_arrivals += 1
+            if self.number_arrivals > self.min_number_arrivals and not self.bulk_arrivals:
+                cos = event.get_flow().get_cos()
+                self.arrivals += 1
+                self.add_interval_count(self.interval_arrivals, event.get_time())
+                self.arrivals_diff[cos] += 1
+                self.required_bandwidth += event.get_flow().get_rate()
+                self.required_bandwidth_diff[cos] += event.get_flow().get_rate()
+                self.arrivals_pairs[event.get_flow().get_source()][event.get_flow().get_destination()] += 1
+                self.arrivals_pairs_diff[cos][event.get_flow().get_source()][
+                    event.get_flow().get_destination()] += 1
+                self.required_bandwidth_pairs[event.get_flow().get_source()][
+                    event.get_flow().get_destination()] += event.get_flow().get_rate()
+                self.required_bandwidth_pairs_diff[cos][event.get_flow().get_source()][
+                    event.get_flow().get_destination()] += event.get_flow().get_rate()
+            # Progress: arrivals may have been counted ahead by chunk, number_arrivals is one per event
+            if self.verbose and (self.number_arrivals % 10000 == 0):
+                print(self.verbose)
+                print(self.number_arrivals)
+            self.count_event()
+        except Exception as e:
+            print("Error in MyStatistics: ", e)
+
+    def flow_departed(self, event: FlowDepartureEvent) -> None:
         self.sim_time = event.get_time()
         try:
-            if isinstance(event, FlowArrivalEvent):
-                self.number_arrivals += 1
-                if self.number_arrivals > self.min_number_arrivals:
-                    cos = event.get_flow().get_cos()
-                    self.arrivals += 1
-                    self.arrivals_diff[cos] += 1
-                    self.required_bandwidth += event.get_flow().get_rate()
-                    self.required_bandwidth_diff[cos] += event.get_flow().get_rate()
-                    self.arrivals_pairs[event.get_flow().get_source()][event.get_flow().get_destination()] += 1
-                    self.arrivals_pairs_diff[cos][event.get_flow().get_source()][
-                        event.get_flow().get_destination()] += 1
-                    self.required_bandwidth_pairs[event.get_flow().get_source()][
-                        event.get_flow().get_destination()] += event.get_flow().get_rate()
-                    self.required_bandwidth_pairs_diff[cos][event.get_flow().get_source()][
-                        event.get_flow().get_destination()] += event.get_flow().get_rate()
-                if self.verbose and (self.arrivals % 10000 == 0):
-                    print(self.verbose)
-                    print(self.arrivals)
-            elif isinstance(event, FlowDepartureEvent):
-                if self.number_arrivals > self.min_number_arrivals:
-                    self.departures += 1
-                f = event.get_flow()
-                if f.is_accepted():
-                    self.number_of_used_transponders[f.get_source()][f.get_destination()] -= 1
-            if self.number_arrivals % 100 == 0:
-                self.calculate_periodical_statistics()
-            if self.number_arrivals % 5000 == 0:
-                print("MyStatistics: 5000")
+            if self.number_arrivals > self.min_number_arrivals:
+                self.departures += 1
+            f = event.get_flow()
+            if f.is_accepted():
+                self.number_of_used_transponders[f.get_source()][f.get_destination()] -= 1
+            self.count_event()
         except Exception as e:
             print("Error in MyStatistics: ", e)
 
+    def departure_cancelled(self, event: FlowDepartureEvent) -> None:
+        """Counts the cancelled departure of a blocked flow as if it had been handled"""
+        if not self.enabled:
+            return
+        if self.event_log is not None:
+            self.event_log.flow_departed(event)
+        else:
+            self.flow_departed(event)
+
+    def count_event(self) -> None:
+        if self.number_arrivals % 100 == 0:
+            self.calculate_periodical_statistics()
+        if self.number_arrivals % 5000 == 0:
+            print("MyStatistics: 5000")
+
     def fancy_statistics(self) -> str:
+        self.checkpoint()
         accept_prob = 0.0
         block_prob = 0.0
         bbr = 0.0
@@ -282,11 +507,69 @@ class MyStatistics:
                 stats += f"\tBP ({block_prob}%)"
                 stats += f"\tBBR ({bbr}%)\n"
 
+        if self.interval_arrivals:
+            stats += f"\n"
+            stats += f"Blocking probability per load profile interval:\n"
+            for interval in sorted(self.interval_arrivals):
+                arrivals = self.interval_arrivals[interval]
+                block_prob = (self.interval_blocked.get(interval, 0) * 1.0 / arrivals) * 100
+                stats += f"Interval ({self.profile.get_interval_start(interval)}) "
+                stats += f"Calls ({arrivals})\tBP ({block_prob}%)\n"
+
         # with open("/Users/nhungtrinh/Documents/ISIMA/networkx-flexgrid/stats.txt", "a") as f:
         #     f.write(stats)
         #     f.write("\n")
 
         return stats
 
+    def latency_statistics(self) -> str:
+        if not self.latency:
+            return ""
+        total = LatencyHistogram()
+        for histogram in self.latency.values():
+            total.merge(histogram)
+        stats = f"Decision latency per outcome (us):\n"
+        for outcome in sorted(self.latency) + ["all"]:
+            histogram = total if outcome == "all" else self.latency[outcome]
+            stats += f"{outcome} ({histogram.get_count()})"
+            stats += f"\tmean ({histogram.get_mean() / 1000:.1f})"
+            stats += f"\tp50 ({histogram.get_percentile(50) / 1000:.1f})"
+            stats += f"\tp99 ({histogram.get_percentile(99) / 1000:.1f})"
+            stats += f"\tp99.9 ({histogram.get_percentile(99.9) / 1000:.1f})"
+            stats += f"\tmax ({histogram.get_max() / 1000:.1f})\n"
+        if self.budget_fallbacks:
+            stats += f"Arrivals over budget: {self.budget_fallbacks}\n"
+        return stats
+
+    def failure_statistics(self) -> str:
+        if not self.failures:
+            return ""
+        stats = f"Failures (light paths hit and restored by p-cycle switchover):\n"
+        for kind in sorted(self.failures):
+            counters = self.failures[kind]
+            restorability = counters["restored"] / counters["affected"] * 100 if counters["affected"] else 100.0
+            stats += f"{kind} ({counters['failures']})"
+            stats += f"\taffected ({counters['affected']})"
+            stats += f"\trestored ({counters['restored']})\t({restorability:.1f}%)"
+            stats += f"\tlost ({counters['lost']})\n"
+        return stats
+
+    def utilization_statistics(self) -> str:
+        utilization = self.pt.get_utilization()
+        if utilization is None:
+            return ""
+        stats = f"Link utilization (time-weighted):\n"
+        stats += f"slots used ({utilization.get_average_utilization() * 100:.2f}%)"
+        stats += f"\tfragmentation ({utilization.get_average_fragmentation():.4f})"
+        stats += f"\tcrosstalk per busy slot ({utilization.get_average_crosstalk():.4f})\n"
+        busiest = utilization.get_busiest_link()
+        if busiest is not None:
+            occupancy = utilization.get_link_occupancy(busiest)
+            stats += f"busiest link {busiest} ({sum(occupancy) / len(occupancy) * 100:.2f}%)"
+            stats += "\tcores (" + ", ".join(f"{core * 100:.1f}%" for core in occupancy) + ")"
+            stats += f"\tfragmentation ({utilization.get_average_link_fragmentation(busiest):.4f})"
+            stats += f"\tcrosstalk per busy slot ({utilization.get_average_link_crosstalk(busiest):.4f})\n"
+        return stats
+
     def finish(self) -> None:
         MyStatistics.singleton_object = None
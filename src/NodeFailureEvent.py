@@ -0,0 +1,15 @@
+from .Event import Event
+
+
+class NodeFailureEvent(Event):
+    kind = Event.NODE_FAILURE
+
+    def __init__(self, time: float, node: int):
+        super().__init__(time)
+        self.node = node
+
+    def get_node(self) -> int:
+        return self.node
+
+    def __str__(self):
+        return f"Node failure: {self.node}"
@@ -1,4 +1,6 @@
-from src.graphs import Graph
+import os
+
+from src.graphs import Graph, Summary
 import xml.etree.ElementTree as ET
 
 
@@ -12,12 +14,29 @@ class OutputManager:
         for graph in self.graphs:
             graph.write_dots_to_file()
 
+    def get_dots_directory(self) -> str:
+        """Directory of the dots files, where the other outputs of a simulation go"""
+        if not self.graphs:
+            return ""
+        return os.path.dirname(self.graphs[0].dots_file_name)
+
+    def merge(self, other: "OutputManager") -> None:
+        """Combines the graphs of another replica or process into this one"""
+        for graph in other.graphs:
+            self.get_graph(graph.get_name()).merge(graph)
+
     def add_dot_to_graph(self, graph_name: str, value1: float, value2: float) -> None:
         try:
             self.get_graph(graph_name).get_data_set().add_dot(value1, value2)
         except Exception as e:
             pass
 
+    def add_summary_to_graph(self, graph_name: str, x: float, summary: Summary) -> None:
+        try:
+            self.get_graph(graph_name).get_data_set().add_summary(x, summary)
+        except Exception as e:
+            pass
+
     def get_graph(self, graph_name: str) -> Graph:
         for g in self.graphs:
             if g.get_name() == graph_name:
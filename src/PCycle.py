@@ -10,6 +10,7 @@ class PCycle:
         :param protected_lightpaths: List of protected lightpaths
         :param reserved_slots: Set of reserved spectrum slots
         """
+        self.id = -1
         self.cycle_links = cycle_links
         self.nodes = nodes
         self.protected_lightpaths = protected_lightpaths if protected_lightpaths else []
@@ -17,6 +18,12 @@ class PCycle:
         self.reserved_slots = reserved_slots
         self.slot_list = slot_list
 
+    def get_id(self) -> int:
+        return self.id
+
+    def set_id(self, id: int) -> None:
+        self.id = id
+
     def add_protected_lightpath(self, lightpath):
         self.protected_lightpaths.append(lightpath)
 
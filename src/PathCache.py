@@ -0,0 +1,100 @@
+import math
+from typing import Dict, List, Tuple
+
+import networkx as nx
+
+from src.CSRGraph import CSRGraph
+from src.Modulations import Modulations
+from src.PhysicalTopology import PhysicalTopology
+
+
+class PathCache:
+    """
+    The k shortest paths of each s-d pair, computed the first time the pair
+    is requested, together with their link ids, their length and a table of
+    (modulation level, required slots) per traffic rate.
+
+    With modulation="fixed" every path uses modulation 0 and
+    ceil(rate / slot capacity) slots. With modulation="distance-adaptive"
+    the modulation follows the path length and a slot carries
+    get_bandwidth(modulation) / get_bandwidth(0) times the slot capacity.
+    """
+
+    FIXED = "fixed"
+    DISTANCE_ADAPTIVE = "distance-adaptive"
+
+    def __init__(self, pt: PhysicalTopology, graph: nx.DiGraph, k: int = 5, weight: str = None,
+                 modulation: str = FIXED, rates: List[int] = ()):
+        if modulation not in (PathCache.FIXED, PathCache.DISTANCE_ADAPTIVE):
+            raise ValueError("Unknown modulation mode " + modulation + "!")
+        self.pt = pt
+        self.graph = graph
+        self.csr = CSRGraph(graph, weight)
+        self.k = k
+        self.weight = weight
+        self.modulation = modulation
+        self.rates = list(rates)
+
+        self.paths: Dict[Tuple[int, int], List[List[int]]] = {}
+        self.links: Dict[Tuple[int, int], List[List[int]]] = {}
+        self.lengths: Dict[Tuple[int, int], List[int]] = {}
+        # (src, dst) -> rate -> [(modulation, slots) of each path]
+        self.demands: Dict[Tuple[int, int], Dict[int, List[Tuple[int, int]]]] = {}
+
+        # Candidate paths whose spectrum the RSA evaluated, over all arrivals
+        self.arrivals = 0
+        self.candidates_evaluated = 0
+
+    def load_pair(self, src: int, dst: int) -> None:
+        pair = (src, dst)
+        paths = self.csr.k_shortest_paths(src, dst, self.k)
+        self.paths[pair] = paths
+        self.links[pair] = [[self.pt.get_link_id(path[i], path[i + 1]) for i in range(len(path) - 1)]
+                            for path in paths]
+        self.lengths[pair] = [self.pt.get_path_length(path) for path in paths]
+        self.demands[pair] = {}
+        for rate in self.rates:
+            self.get_demands(src, dst, rate)
+
+    def get_paths(self, src: int, dst: int) -> List[List[int]]:
+        if (src, dst) not in self.paths:
+            self.load_pair(src, dst)
+        return self.paths[(src, dst)]
+
+    def get_links(self, src: int, dst: int) -> List[List[int]]:
+        if (src, dst) not in self.links:
+            self.load_pair(src, dst)
+        return self.links[(src, dst)]
+
+    def get_lengths(self, src: int, dst: int) -> List[int]:
+        if (src, dst) not in self.lengths:
+            self.load_pair(src, dst)
+        return self.lengths[(src, dst)]
+
+    def get_demands(self, src: int, dst: int, rate: int) -> List[Tuple[int, int]]:
+        """(modulation, slots) needed by `rate` on each cached path of (src, dst)"""
+        if (src, dst) not in self.demands:
+            self.load_pair(src, dst)
+        table = self.demands[(src, dst)]
+        if rate not in table:
+            table[rate] = [self.get_demand(length, rate) for length in self.lengths[(src, dst)]]
+        return table[rate]
+
+    def get_demand(self, length: int, rate: int) -> Tuple[int, int]:
+        modulation = 0
+        if self.modulation == PathCache.DISTANCE_ADAPTIVE:
+            modulation = Modulations.get_modulation_by_distance(length)
+        capacity = self.pt.get_slot_capacity() * (Modulations.get_bandwidth(modulation) / Modulations.get_bandwidth(0))
+        return modulation, math.ceil(rate / capacity)
+
+    def add_candidates_evaluated(self, candidates: int) -> None:
+        """Records one arrival for which `candidates` paths had their spectrum evaluated"""
+        self.arrivals += 1
+        self.candidates_evaluated += candidates
+
+    def get_average_candidates_evaluated(self) -> float:
+        return self.candidates_evaluated / self.arrivals if self.arrivals else 0.0
+
+    def __str__(self):
+        return (f"Path cache: {len(self.paths)} pairs, {self.arrivals} arrivals, "
+                f"{self.get_average_candidates_evaluated()} candidates evaluated per arrival")
@@ -0,0 +1,47 @@
+from typing import Dict, List, Set, Tuple
+
+from src.PathCache import PathCache
+from src.PhysicalTopology import PhysicalTopology
+
+
+class PathOrdering:
+    """
+    Ranks the cached candidate paths of each s-d pair by their bottleneck,
+    the free slots of their fullest link, so the paths most likely to fit
+    are tried first. Ties keep the k-shortest order.
+
+    Rankings are kept per pair and only recomputed after a link of one of
+    the pair's paths changed, which the PhysicalTopology reports through
+    its link listeners.
+    """
+
+    def __init__(self, pt: PhysicalTopology, paths: PathCache):
+        self.pt = pt
+        self.paths = paths
+        self.orders: Dict[Tuple[int, int], List[int]] = {}
+        self.pairs_of_link: Dict[int, Set[Tuple[int, int]]] = {}
+        self.dirty: Set[Tuple[int, int]] = set()
+        pt.add_link_listener(self.link_changed)
+
+    def link_changed(self, link_id: int) -> None:
+        pairs = self.pairs_of_link.get(link_id)
+        if pairs:
+            self.dirty.update(pairs)
+
+    def get_order(self, src: int, dst: int) -> List[int]:
+        """Indices of the cached paths of (src, dst), most free bottleneck first"""
+        pair = (src, dst)
+        order = self.orders.get(pair)
+        if order is not None and pair not in self.dirty:
+            return order
+
+        k_links = self.paths.get_links(src, dst)
+        if order is None:
+            for links in k_links:
+                for link in links:
+                    self.pairs_of_link.setdefault(link, set()).add(pair)
+        bottlenecks = [self.pt.get_min_free_slots(links) for links in k_links]
+        order = sorted(range(len(k_links)), key=lambda k: -bottlenecks[k])
+        self.orders[pair] = order
+        self.dirty.discard(pair)
+        return order
@@ -1,17 +1,36 @@
+import gc
 import xml.etree.ElementTree as ET
 import networkx as nx
+import numpy as np
 from typing import List
 from src.Slot import Slot
 from src.TrafficInfo import TrafficInfo
+from src.TopologyLoader import TopologyLoader
 
 class PhysicalTopology:
     def __init__(self, xml: ET.Element, verbose: bool):
-        assert len(xml) == 2, "Only two elements are allowed in the physical topology"
+        assert len(xml) == 2 or "file" in xml.attrib and len(xml) == 0, \
+            "Only two elements are allowed in the physical topology"
         self.verbose = verbose
         self.cores = 0
         self.slots = 0
         self.slot_bw = 0.0
         self.graph = nx.DiGraph()
+        # Link id -> (src, dst), and a counter per link bumped on every reserve or release
+        self.link_index = {}
+        self.link_versions = {}
+        # Bumped when the whole graph is replaced
+        self.epoch = 0
+        # Per link: free slots, free slots per core, occupancy of each core and its largest free run
+        # (None until asked for again after a change)
+        self.free_slots = {}
+        self.core_free_slots = {}
+        self.occupancy = {}
+        self.largest_free_run = {}
+        # Called with the link id after every change of a link's reserved slots
+        self.link_listeners = []
+        # Time-weighted utilization counters, updated with the reserved slots when set
+        self.utilization = None
         self.load_topology(xml)
 
     def load_topology(self, xml: ET.Element):
@@ -19,6 +38,21 @@ class PhysicalTopology:
         try:
             if self.verbose:
                 print(xml.attrib["name"])
+            if "file" in xml.attrib:
+                # Nodes and links come from an edge list, NumPy arrays, GraphML or a (large) XML file
+                arrays = TopologyLoader.read(xml.attrib["file"])
+                self.cores = int(xml.attrib.get("cores", arrays.get("cores", 0)))
+                self.slots = int(xml.attrib.get("slots", arrays.get("slots", 0)))
+                self.slot_bw = float(xml.attrib.get("slotsBandwidth", arrays.get("slot_bandwidth", 0.0)))
+                assert self.cores > 0, "cores attribute is missing!"
+                assert self.slots > 0, "slots attribute is missing!"
+                assert self.slot_bw > 0, "slotsBandwidth attribute is missing!"
+                self.load_arrays(arrays["nodes"], arrays["id"], arrays["source"], arrays["destination"],
+                                 arrays["delay"], arrays["weight"], arrays["distance"])
+                if self.verbose:
+                    print(self.graph.number_of_nodes(), " nodes\n", self.graph.number_of_edges(), " links", sep="")
+                return
+
             self.cores = int(xml.attrib.get("cores"))
             self.slots = int(xml.attrib.get("slots"))
             self.slot_bw = float(xml.attrib.get("slotsBandwidth"))
@@ -45,7 +79,11 @@ class PhysicalTopology:
                         bandwidth = float(link.attrib["bandwidth"])
                         weight = float(link.attrib["weight"])
                         distance = int(link.attrib["distance"])
-                        self.graph.add_edge(src, dst, id=id, delay=delay, slot=self.slots, weight=weight, reserved_slots=set())
+                        self.graph.add_edge(src, dst, id=id, delay=delay, slot=self.slots, weight=weight, distance=distance,
+                                            reserved_slots=set())
+                        self.link_index[id] = (src, dst)
+                        self.link_versions[id] = 0
+                        self.reset_link_state(id)
                 else:
                     raise ValueError("Unknown element " + child.tag + " in the physical topology file!")
 
@@ -54,6 +92,36 @@ class PhysicalTopology:
         except Exception as e:
             raise e
 
+    def load_arrays(self, nodes: np.ndarray, ids: np.ndarray, sources: np.ndarray, destinations: np.ndarray,
+                    delays: np.ndarray, weights: np.ndarray, distances: np.ndarray) -> None:
+        """Adds nodes and free links in bulk, one entry of each array per link"""
+        # Hundreds of thousands of containers are created at once: the collector would rescan them again and again
+        enabled = gc.isenabled()
+        gc.disable()
+        try:
+            ids = ids.tolist()
+            sources = sources.tolist()
+            destinations = destinations.tolist()
+            assert len(set(ids)) == len(ids), "Duplicate link ids!"
+            self.graph.add_nodes_from(nodes.tolist())
+            slots = self.slots
+            self.graph.add_edges_from(
+                [(src, dst, {"id": id, "delay": delay, "slot": slots, "weight": weight, "distance": distance,
+                             "reserved_slots": set()})
+                 for id, src, dst, delay, weight, distance in zip(ids, sources, destinations, delays.tolist(),
+                                                                  weights.tolist(), distances.tolist())])
+            self.link_index.update(zip(ids, zip(sources, destinations)))
+            self.link_versions.update(dict.fromkeys(ids, 0))
+            # Free links: the state reset_link_state would build, without scanning their empty occupancy
+            cores = self.cores
+            self.occupancy.update({id: [bytearray(slots) for _ in range(cores)] for id in ids})
+            self.core_free_slots.update({id: [slots] * cores for id in ids})
+            self.free_slots.update(dict.fromkeys(ids, slots * cores))
+            self.largest_free_run.update({id: [None] * cores for id in ids})
+        finally:
+            if enabled:
+                gc.enable()
+
     def get_num_nodes(self) -> int:
         return self.graph.number_of_nodes()
 
@@ -69,6 +137,9 @@ class PhysicalTopology:
     def get_num_slots(self) -> int:
         return self.slots
 
+    def get_link_ids(self) -> List[int]:
+        return list(self.link_index)
+
     def get_node(self, id: int):
         return id if id in self.graph.nodes else None
 
@@ -77,17 +148,82 @@ class PhysicalTopology:
 
     def set_graph(self, graph):
         self.graph = graph
+        self.epoch += 1
+        for link_id in self.link_index:
+            self.reset_link_state(link_id)
+            for listener in self.link_listeners:
+                listener(link_id)
+
+    def add_link_listener(self, listener) -> None:
+        self.link_listeners.append(listener)
+
+    def set_utilization(self, utilization) -> None:
+        self.utilization = utilization
+
+    def get_utilization(self):
+        return self.utilization
+
+    def reset_link_state(self, link_id: int) -> None:
+        """Rebuilds the free-slot counters of a link from its reserved slots"""
+        src, dst = self.link_index[link_id]
+        occupancy = [bytearray(self.slots) for _ in range(self.cores)]
+        for core, slot in self.graph[src][dst]["reserved_slots"]:
+            occupancy[core][slot] = 1
+        self.occupancy[link_id] = occupancy
+        self.core_free_slots[link_id] = [self.slots - sum(occupancy[core]) for core in range(self.cores)]
+        self.free_slots[link_id] = sum(self.core_free_slots[link_id])
+        self.largest_free_run[link_id] = [None] * self.cores
+        if self.utilization is not None:
+            self.utilization.reset_link(link_id)
+
+    def get_occupancy(self, link_id: int) -> List[bytearray]:
+        """Occupancy of each core of a link, 1 for a reserved slot"""
+        return self.occupancy[link_id]
+
+    def get_link_free_slots(self, link_id: int) -> int:
+        return self.free_slots[link_id]
+
+    def get_core_free_slots(self, link_id: int, core: int) -> int:
+        return self.core_free_slots[link_id][core]
+
+    def get_largest_free_run(self, link_id: int, core: int) -> int:
+        """Longest run of contiguous free slots on one core of a link"""
+        runs = self.largest_free_run[link_id]
+        if runs[core] is None:
+            runs[core] = max(map(len, bytes(self.occupancy[link_id][core]).split(b"\x01")))
+        return runs[core]
+
+    def get_min_free_slots(self, links: List[int]) -> int:
+        """
+        Upper bound of the size of any free region along `links`. Regions may
+        span several cores, so this (not the per-core runs) is what tells that
+        a path cannot fit a demand.
+        """
+        free_slots = self.free_slots
+        return min(free_slots[link] for link in links)
 
     def get_link(self, link_id: int):
-        for edge in self.graph.edges(data=True):
-            if edge[2].get("id") == link_id:  # Check if the edge has the requested ID
-                return edge  # Return the full edge as a tuple (src, dst, data)
+        """Returns the edge with the requested ID as a tuple (src, dst, data)"""
+        if link_id not in self.link_index:
+            return None
+        src, dst = self.link_index[link_id]
+        return src, dst, self.graph[src][dst]
 
     def get_src_link(self, link_index: int):
-        return self.get_link(link_index)[0] if self.get_link(link_index) else None
+        return self.link_index[link_index][0] if link_index in self.link_index else None
 
     def get_dst_link(self, link_index: int):
-        return self.get_link(link_index)[1] if self.get_link(link_index) else None
+        return self.link_index[link_index][1] if link_index in self.link_index else None
+
+    def get_epoch(self) -> int:
+        return self.epoch
+
+    def get_link_version(self, link_id: int) -> int:
+        return self.link_versions[link_id]
+
+    def get_link_versions(self, links: List[int]) -> tuple:
+        """Versions of `links` plus the graph epoch, equal only if none of them changed"""
+        return (self.epoch, *[self.link_versions[link] for link in links])
 
     def get_link_dst(self, src: int, dst: int):
         return self.graph[src][dst] if self.graph.has_edge(src, dst) else None
@@ -101,6 +237,13 @@ class PhysicalTopology:
     def get_link_id(self, src: int, dst: int) -> int:
         return self.graph[src][dst]["id"]
     
+    def get_distance(self, src: int, dst: int) -> int:
+        return self.graph[src][dst]["distance"]
+
+    def get_path_length(self, path: List[int]) -> int:
+        """Total distance of the links along the node list `path`"""
+        return sum(self.graph[path[i]][path[i + 1]]["distance"] for i in range(len(path) - 1))
+
     def get_weighted_graph(self):
         weighted_graph = nx.DiGraph()
 
@@ -164,11 +307,7 @@ class PhysicalTopology:
         """Returns the number of free slots on the edge between `src` and `dst`"""
         assert self.graph.has_edge(src, dst), "Edge does not exist"
 
-        edge_data = self.graph[src][dst]
-        total_slots = self.slots * self.cores
-        reserved_slots = edge_data["reserved_slots"]
-
-        return total_slots - len(reserved_slots)
+        return self.free_slots[self.graph[src][dst]["id"]]
 
     def reserve_slots(self, src: int, dst: int, slot_list: List[Slot]) -> bool:
         try:
@@ -178,9 +317,27 @@ class PhysicalTopology:
                 assert 0 <= slot_list[i].core < self.cores, "Illegal argument exception"
                 assert 0 <= slot_list[i].slot < self.slots, "Illegal argument exception"
             
+            link_id = edge_data["id"]
+            reserved_slots = edge_data["reserved_slots"]
+            occupancy = self.occupancy[link_id]
+            core_free_slots = self.core_free_slots[link_id]
+            runs = self.largest_free_run[link_id]
+            utilization = self.utilization
+            if utilization is not None:
+                utilization.update_link(link_id)
             for s in slot_list:
                 # Add the new slot to the reserved_slots set
-                edge_data["reserved_slots"].add((s.core, s.slot))
+                if (s.core, s.slot) not in reserved_slots:
+                    if utilization is not None:
+                        utilization.reserve_slot(link_id, occupancy, s.core, s.slot)
+                    reserved_slots.add((s.core, s.slot))
+                    occupancy[s.core][s.slot] = 1
+                    core_free_slots[s.core] -= 1
+                    self.free_slots[link_id] -= 1
+                    runs[s.core] = None
+            self.link_versions[link_id] += 1
+            for listener in self.link_listeners:
+                listener(link_id)
             return True
         except Exception as e:
             raise e
@@ -212,9 +369,26 @@ class PhysicalTopology:
                 assert 0 <= slot_list[i].core < self.cores, "Illegal argument exception"
                 assert 0 <= slot_list[i].slot < self.slots, "Illegal argument exception"
             reserved_slots = edge_data["reserved_slots"]
+            link_id = edge_data["id"]
+            occupancy = self.occupancy[link_id]
+            core_free_slots = self.core_free_slots[link_id]
+            runs = self.largest_free_run[link_id]
+            utilization = self.utilization
+            if utilization is not None:
+                utilization.update_link(link_id)
             for s in slot_list:
-                reserved_slots.discard((s.core, s.slot))
+                if (s.core, s.slot) in reserved_slots:
+                    if utilization is not None:
+                        utilization.release_slot(link_id, occupancy, s.core, s.slot)
+                    reserved_slots.discard((s.core, s.slot))
+                    occupancy[s.core][s.slot] = 0
+                    core_free_slots[s.core] += 1
+                    self.free_slots[link_id] += 1
+                    runs[s.core] = None
             self.graph[src][dst]["reserved_slots"] = reserved_slots
+            self.link_versions[link_id] += 1
+            for listener in self.link_listeners:
+                listener(link_id)
         except Exception as e:
             raise e
         
@@ -0,0 +1,161 @@
+import cProfile
+import json
+import time
+from typing import Dict, List
+
+
+class Profiler:
+    """
+    Time and call counts per phase of the simulation.
+
+    instrument() replaces the methods of each phase on the simulation
+    objects of a run with timed wrappers, which only happens while profiling
+    is enabled: a disabled profiler leaves every object untouched and costs
+    nothing. end_run() puts the methods back, so objects that outlive a run
+    are not wrapped twice by the next one. Phases nest, so besides the total time of a phase the time
+    spent in it outside of the other phases is kept as its self time.
+    """
+
+    TRACER = "tracer"
+    STATISTICS = "statistics"
+    CONTROL_PLANE = "control-plane"
+    RSA = "rsa"
+    SPECTRUM = "spectrum"
+    RESERVE_RELEASE = "reserve-release"
+    P_CYCLE = "p-cycle"
+    PHASES = [TRACER, STATISTICS, CONTROL_PLANE, RSA, SPECTRUM, RESERVE_RELEASE, P_CYCLE]
+
+    singleton_object = None
+
+    def __init__(self):
+        self.enabled = False
+        self.calls: Dict[str, int] = {}
+        self.totals: Dict[str, int] = {}
+        self.own: Dict[str, int] = {}
+        # Time spent in nested phases, one entry per phase being timed
+        self.stack: List[int] = []
+        self.profile = None
+        self.runs = []
+        # (object, method name, its previous instance attribute or None) of every wrapper in place
+        self.wrapped = []
+
+    @staticmethod
+    def get_profiler_object():
+        if Profiler.singleton_object is None:
+            Profiler.singleton_object = Profiler()
+        return Profiler.singleton_object
+
+    def __copy__(self):
+        raise Exception("CloneNotSupportedException")
+
+    def toogle_profiling(self, enabled: bool) -> None:
+        self.enabled = enabled
+
+    def is_enabled(self) -> bool:
+        return self.enabled
+
+    def wrap(self, obj: object, method_name: str, phase: str) -> None:
+        """Times every call of obj.method_name as `phase`, if profiling is enabled"""
+        if not self.enabled or not hasattr(obj, method_name):
+            return
+        method = getattr(obj, method_name)
+        self.wrapped.append((obj, method_name, obj.__dict__.get(method_name)))
+        clock = time.perf_counter_ns
+        stack = self.stack
+        calls = self.calls
+        totals = self.totals
+        own = self.own
+        for counters in (calls, totals, own):
+            counters.setdefault(phase, 0)
+
+        def timed(*args, **kwargs):
+            stack.append(0)
+            start = clock()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                elapsed = clock() - start
+                nested = stack.pop()
+                calls[phase] += 1
+                totals[phase] += elapsed
+                own[phase] += elapsed - nested
+                if stack:
+                    stack[-1] += elapsed
+
+        setattr(obj, method_name, timed)
+
+    def instrument(self, cp, pt, vt, tr, st) -> None:
+        """Wraps the phases of a run: its control plane, RSA, topologies, tracer and statistics"""
+        if not self.enabled:
+            return
+        # Before the run subscribes them to its events, so the wrappers are the handlers
+        for handler in ("flow_arrived", "flow_departed"):
+            self.wrap(tr, handler, Profiler.TRACER)
+            self.wrap(st, handler, Profiler.STATISTICS)
+            self.wrap(cp, handler, Profiler.CONTROL_PLANE)
+            # In columnar mode the statistics subscribe the handlers of their event log instead
+            if st.get_event_log() is not None:
+                self.wrap(st.get_event_log(), handler, Profiler.STATISTICS)
+        self.wrap(st, "add_latency", Profiler.STATISTICS)
+
+        rsa = cp.get_rsa()
+        self.wrap(rsa, "flow_arrival", Profiler.RSA)
+        self.wrap(rsa, "flow_departure", Profiler.RSA)
+        self.wrap(rsa, "create_p_cycle_from_paths", Profiler.P_CYCLE)
+        self.wrap(rsa, "find_backup_paths", Profiler.P_CYCLE)
+        if hasattr(rsa, "get_spectrum_cache"):
+            self.wrap(rsa.get_spectrum_cache(), "find", Profiler.SPECTRUM)
+
+        self.wrap(pt, "get_min_free_slots", Profiler.SPECTRUM)
+        self.wrap(pt, "reserve_slots", Profiler.RESERVE_RELEASE)
+        self.wrap(pt, "release_slots", Profiler.RESERVE_RELEASE)
+
+        self.wrap(vt, "add_p_cycles", Profiler.P_CYCLE)
+        self.wrap(vt, "remove_lp_p_cycle", Profiler.P_CYCLE)
+
+    def unwrap(self) -> None:
+        """Puts back the methods replaced by wrap(), the last wrapped first"""
+        for obj, method_name, previous in reversed(self.wrapped):
+            if previous is None:
+                delattr(obj, method_name)
+            else:
+                setattr(obj, method_name, previous)
+        self.wrapped.clear()
+
+    def start_run(self, cprofile: bool = False) -> None:
+        for counters in (self.calls, self.totals, self.own):
+            for phase in counters:
+                counters[phase] = 0
+        self.stack.clear()
+        if self.enabled and cprofile:
+            self.profile = cProfile.Profile()
+            self.profile.enable()
+
+    def end_run(self, seed: int, cprofile_file: str = None) -> None:
+        """Keeps the phases of the run for the summary and writes its cProfile statistics, if any"""
+        if not self.enabled:
+            return
+        self.unwrap()
+        if self.profile is not None:
+            self.profile.disable()
+            if cprofile_file is not None:
+                self.profile.dump_stats(cprofile_file)
+            self.profile = None
+        self.runs.append({"seed": seed, "phases": self.get_phases()})
+
+    def get_phases(self) -> Dict[str, Dict[str, float]]:
+        return {phase: {"calls": self.calls[phase], "total": self.totals[phase] * 1e-9, "self": self.own[phase] * 1e-9}
+                for phase in Profiler.PHASES if phase in self.calls}
+
+    def write_summary(self, file_name: str) -> None:
+        with open(file_name, "w") as f:
+            json.dump({"runs": self.runs}, f, indent=2)
+
+    def finish(self) -> None:
+        Profiler.singleton_object = None
+
+    def __str__(self):
+        profile = "Phase\tCalls\tTotal (s)\tSelf (s)\n"
+        for phase, values in self.get_phases().items():
+            profile += f"{phase}\t{values['calls']}\t{round(values['total'], 3)}\t{round(values['self'], 3)}\n"
+        return profile
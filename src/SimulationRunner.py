@@ -1,19 +1,38 @@
+from typing import List
+
 from src.ControlPlane import ControlPlane
+from src.Event import Event
+from src.EventDispatcher import EventDispatcher
 from src.EventScheduler import EventScheduler
 from src.Tracer import Tracer
 from src.MyStatistics import MyStatistics
 
 
 class SimulationRunner:
-    def __init__(self, cp: ControlPlane, events: EventScheduler):
+    def __init__(self, cp: ControlPlane, events: EventScheduler, subscribers: List = ()):
         tr = Tracer.get_tracer_object()
         st = MyStatistics.get_my_statistics()
 
+        # Tracer, statistics (or the event log in columnar mode), anything else handling events (such as the
+        # failures and their switchover, or the utilization following the time) and control plane, in this order
+        dispatcher = EventDispatcher()
+        tr.subscribe(dispatcher)
+        st.subscribe(dispatcher)
+        for subscriber in subscribers:
+            subscriber.subscribe(dispatcher)
+        cp.subscribe(dispatcher)
+        handlers = [dispatcher.get_handlers(kind) for kind in Event.KINDS]
+
+        if not tr.write_trace:
+            # The departures of blocked flows are skipped, the trace being the only one to need them all
+            cp.toogle_departure_cancelling(True)
+            events.add_cancel_listener(st.departure_cancelled)
+
         event = events.pop_event()
         while event is not None:
-            tr.add(event)
-            st.add_event(event)
-            cp.new_event(event)
+            for handler in handlers[event.kind]:
+                handler(event)
             event = events.pop_event()
-
-
+        if st.get_event_log() is not None:
+            # Columnar mode: statistics are computed from the log afterwards
+            st.checkpoint()
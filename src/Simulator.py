@@ -1,3 +1,5 @@
+import json
+import os
 import xml.etree.ElementTree as ET
 import time
 
@@ -10,6 +12,13 @@ from src.OutputManager import OutputManager
 from src.Tracer import Tracer
 from src.ControlPlane import ControlPlane
 from src.SimulationRunner import SimulationRunner
+from src.EventLog import EventLog
+from src.TraceReplay import TraceReplay
+from src.TraceIndex import TraceIndex
+from src.Profiler import Profiler
+from src.FailureGenerator import FailureGenerator
+from src.SwitchoverEngine import SwitchoverEngine
+from src.LinkUtilization import LinkUtilization
 
 
 class Simulator:
@@ -18,9 +27,12 @@ class Simulator:
     verbose = False
     trace = False
 
-    def __init__(self, sim_config_file: str, trace: bool, verbose: bool, forced_load: float, num_simulations: int):
+    def __init__(self, sim_config_file: str, trace: bool, verbose: bool, forced_load: float, num_simulations: int,
+                 event_log: bool = False, replay_file: str = None, profile: bool = False, cprofile: bool = False):
         Simulator.trace = trace
         Simulator.verbose = verbose
+        profiler = Profiler.get_profiler_object()
+        profiler.toogle_profiling(profile)
 
         if Simulator.verbose:
             print("#################################")
@@ -47,6 +59,10 @@ class Simulator:
                     self.physical_topology = child
                 elif child.tag == "graphs":
                     self.graphs = child
+                elif child.tag == "failures":
+                    self.failures = child
+                elif child.tag == "utilization":
+                    self.utilization = child
                 else:
                     assert False, "Unknown element " + child.tag + " in the simulation file!"
             assert hasattr(self, "rsa"), "rsa element is missing!"
@@ -56,7 +72,14 @@ class Simulator:
             assert hasattr(self, "physical_topology"), "physical-topology element is missing!"
             assert hasattr(self, "graphs"), "graphs element is missing!"
 
+            if forced_load == 0:
+                output_prefix = sim_config_file[4:-4]
+            else:
+                output_prefix = sim_config_file[4:-4] + "_Load_" + str(forced_load)
+
             gp = OutputManager(self.graphs)
+            # Profiles go next to the dots files
+            profile_prefix = os.path.join(gp.get_dots_directory(), os.path.basename(output_prefix))
             for seed in range(1, num_simulations + 1, 1):
                 begin_s = time.time_ns()
                 begin = time.time_ns()
@@ -85,7 +108,19 @@ class Simulator:
                     print("(3) Loading traffic information...")
                 events = EventScheduler()
                 traffic = TrafficGenerator(self.traffic, forced_load, verbose)
-                traffic.generate_traffic(pt, events, seed)
+                subscribers = []
+                switchover = None
+                if replay_file is None:
+                    traffic.generate_traffic(pt, events, seed)
+                    if hasattr(self, "failures"):
+                        failures = FailureGenerator(self.failures, pt, seed)
+                        failures.generate_failures(events)
+                        switchover = SwitchoverEngine(pt, vt, failures.get_workers())
+                        subscribers = [switchover, failures]
+                    if hasattr(self, "utilization"):
+                        utilization = LinkUtilization(self.utilization, pt, gp, forced_load)
+                        pt.set_utilization(utilization)
+                        subscribers.append(utilization)
                 print("traffic: ", traffic)
                 if Simulator.verbose:
                     print("(3) Done. (", round((time.time_ns() - begin) * 1e-9, 3), " sec)")
@@ -102,14 +137,26 @@ class Simulator:
 
                 st = MyStatistics.get_my_statistics()
                 st.statistics_setup(gp, pt, traffic, pt.get_num_nodes(), 3, 0, forced_load, Simulator.verbose)
+                if event_log:
+                    # One arrival, one departure and one accept or block record per call; the log grows
+                    # past this when a load profile leaves the number of calls open
+                    st.set_event_log(EventLog(3 * min(traffic.calls, 1 << 20)))
+                events.add_chunk_listener(st.add_arrivals)
 
                 tr = Tracer.get_tracer_object()
 
+                trace_index = None
                 if Simulator.trace:
-                    if forced_load == 0:
-                        tr.set_trace_file(sim_config_file[4:-4] + ".trace")
+                    if self.trace.get("format", "text") == "binary":
+                        compression = self.trace.get("compression")
+                        extension = {"gzip": ".gz", "lzma": ".xz"}.get(compression, "")
+                        tr.set_binary_trace_file(output_prefix + ".btrace" + extension, compression)
                     else:
-                        tr.set_trace_file(sim_config_file[4:-4] + "_Load_" + str(forced_load) + ".trace")
+                        tr.set_trace_file(output_prefix + ".trace")
+                        if self.trace.get("index", "false") == "true":
+                            # Index the trace on a background thread while it is being written
+                            trace_index = TraceIndex(output_prefix + ".trace", float(self.trace.get("bucket", "1.0")))
+                            trace_index.follow()
                 tr.toogle_trace_writing(Simulator.trace)
 
                 assert "module" in self.rsa.attrib, "RSA module is missing!"
@@ -118,6 +165,7 @@ class Simulator:
                     print("RSA module: " + rsa_module)
 
                 cp = ControlPlane(self.rsa, events, rsa_module, pt, vt, traffic)
+                profiler.instrument(cp, pt, vt, tr, st)
                 if Simulator.verbose:
                     print("(4) Done. (", round((time.time_ns() - begin) * 1e-9, 3), " sec)")
 
@@ -128,7 +176,14 @@ class Simulator:
 
                 # with open("/Users/nhungtrinh/Documents/ISIMA/networkx-flexgrid/stats.txt", "a") as f:
                 #     f.write(f"{sim_config_file} -> Load {forced_load}: Running the simulation number {seed} \n")
-                SimulationRunner(cp, events)
+                profiler.start_run(cprofile)
+                if replay_file is None:
+                    SimulationRunner(cp, events, subscribers)
+                else:
+                    replay = TraceReplay(replay_file).run(cp)
+                    if Simulator.verbose and replay["unmatched-departures"]:
+                        print("Departures without their arrival in the trace:", replay["unmatched-departures"])
+                profiler.end_run(seed, profile_prefix + "_seed_" + str(seed) + ".pstats" if cprofile else None)
                 if Simulator.verbose:
                     print("(5) Done. (", round((time.time_ns() - begin) * 1e-9, 3), " sec)")
 
@@ -141,12 +196,35 @@ class Simulator:
                     else:
                         print(f"Statistics for {forced_load} erlangs ({sim_config_file}):")
                     print(st.fancy_statistics())
+                    print(st.latency_statistics())
+                    if switchover is not None:
+                        print(st.failure_statistics())
+                    if pt.get_utilization() is not None:
+                        print(st.utilization_statistics())
+                    if hasattr(cp.rsa, "get_path_cache"):
+                        print(cp.rsa.get_path_cache())
+                    if hasattr(cp.rsa, "get_spectrum_cache"):
+                        print(cp.rsa.get_spectrum_cache())
+                    if profile:
+                        print(profiler)
                 else:
                     st.calculate_last_statistics()
 
+                if event_log:
+                    st.get_event_log().save(output_prefix + "_seed_" + str(seed))
+                if switchover is not None and switchover.get_sweeps():
+                    with open(profile_prefix + "_seed_" + str(seed) + "_sweep.json", "w") as f:
+                        json.dump({"sweeps": switchover.get_sweeps()}, f, indent=2)
+
                 st.finish()
 
                 if Simulator.trace:
                     tr.finish()
+                    if trace_index is not None:
+                        trace_index.stop()
+                        trace_index.save()
 
             gp.write_all_to_files()
+            if profile:
+                profiler.write_summary(profile_prefix + "_profile.json")
+            profiler.finish()
@@ -0,0 +1,87 @@
+from collections import OrderedDict
+from typing import Dict, List, Tuple
+
+from src.PhysicalTopology import PhysicalTopology
+from src.Slot import Slot
+from src.util.ConnectedComponent import ConnectedComponent
+
+
+class SpectrumCache:
+    """
+    Bounded LRU cache of the free spectrum of a path, or of any list of
+    links (the AND of the spectra of its links), and of the free regions
+    found in it, keyed by the tuple of link ids. An entry is only used while
+    the versions of its links in the PhysicalTopology are unchanged.
+
+    get() hands out new objects which callers may modify, lookup() the
+    cached ones, which must be treated as read-only.
+    """
+
+    def __init__(self, pt: PhysicalTopology, max_size: int = 1024):
+        self.pt = pt
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, links: List[int]) -> Tuple[List[List[bool]], Dict[int, List[Tuple[int, int]]]]:
+        """Cached spectrum of the path and its regions as (core, slot) tuples, shared and read-only"""
+        entry = self.find(links)
+        return entry[0], entry[1]
+
+    def find(self, links: List[int]):
+        """(spectrum, regions as tuples, regions as new Slot lists or None when the entry was cached)"""
+        key = tuple(links)
+        versions = self.pt.get_link_versions(links)
+        entry = self.entries.get(key)
+        if entry is not None and entry[0] == versions:
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return entry[1], entry[2], None
+
+        self.misses += 1
+        spectrum = self.path_spectrum(links)
+        slot_regions = ConnectedComponent().list_of_regions(spectrum)
+        # Plain tuples rather than Slot objects, so cached entries do not weigh on the garbage collector
+        regions = {label: [(s.core, s.slot) for s in region] for label, region in slot_regions.items()}
+        if self.max_size > 0:
+            self.entries[key] = (versions, spectrum, regions)
+            self.entries.move_to_end(key)
+            if len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+        return spectrum, regions, slot_regions
+
+    def get(self, links: List[int]) -> Tuple[List[List[bool]], Dict[int, List[Slot]]]:
+        """Spectrum and free regions of the path, as new objects the caller may modify"""
+        spectrum, regions, slot_regions = self.find(links)
+        return [row[:] for row in spectrum], slot_regions if slot_regions is not None else SpectrumCache.to_slots(regions)
+
+    def get_regions(self, links: List[int]) -> Dict[int, List[Slot]]:
+        spectrum, regions, slot_regions = self.find(links)
+        return slot_regions if slot_regions is not None else SpectrumCache.to_slots(regions)
+
+    @staticmethod
+    def to_slots(regions: Dict[int, List[Tuple[int, int]]]) -> Dict[int, List[Slot]]:
+        return {label: [Slot(core, slot) for core, slot in region] for label, region in regions.items()}
+
+    def path_spectrum(self, links: List[int]) -> List[List[bool]]:
+        spectrum = [[True for _ in range(self.pt.get_num_slots())] for _ in range(self.pt.get_cores())]
+        for link in links:
+            image = self.pt.get_spectrum(self.pt.get_src_link(link), self.pt.get_dst_link(link))
+            for i in range(len(spectrum)):
+                row = spectrum[i]
+                other = image[i]
+                for j in range(len(row)):
+                    row[j] = row[j] and other[j]
+        return spectrum
+
+    def get_hits(self) -> int:
+        return self.hits
+
+    def get_misses(self) -> int:
+        return self.misses
+
+    def __str__(self):
+        total = self.hits + self.misses
+        ratio = (self.hits * 100.0 / total) if total else 0.0
+        return f"Spectrum cache: {len(self.entries)} paths, {self.hits} hits, {self.misses} misses ({ratio}% hits)"
@@ -0,0 +1,237 @@
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, List, Set, Tuple
+
+from src.Event import Event
+from src.EventDispatcher import EventDispatcher
+from src.LightPath import LightPath
+from src.LinkFailureEvent import LinkFailureEvent
+from src.NodeFailureEvent import NodeFailureEvent
+from src.FailureSweepEvent import FailureSweepEvent
+from src.PCycle import PCycle
+from src.PhysicalTopology import PhysicalTopology
+from src.VirtualTopology import VirtualTopology
+from src.MyStatistics import MyStatistics
+
+
+class SwitchoverEngine:
+    """
+    Impact of link and node failures on the established light paths, and
+    switchover of the ones hit to the p-cycles protecting them.
+
+    A failed link takes its reverse link down with it, as a fiber cut does,
+    and a failed node every link from or to it. The light paths using a
+    failed link come from the link index of the VirtualTopology. One of them
+    is restored if its end nodes are up and one of its p-cycles, the one it
+    was assigned and then the ones it is listed as protected by, still joins
+    them over links that are up, has the slots it needs and is not already
+    restoring another light path hit by the same failure.
+
+    Failures are evaluated on the state of the network when they happen and
+    are taken to be repaired before the next one, so they leave it as it is.
+    sweep() evaluates every single-link failure on a snapshot of the state,
+    in parallel processes.
+    """
+
+    # Fewer links than this per process are evaluated in this process
+    MIN_SWEEP_LINKS = 16
+
+    # Snapshot of the network state, in the processes of a sweep
+    worker_snapshot = None
+
+    def __init__(self, pt: PhysicalTopology, vt: VirtualTopology, workers: int = 0):
+        self.pt = pt
+        self.vt = vt
+        self.st = MyStatistics.get_my_statistics()
+        self.workers = workers if workers > 0 else (os.cpu_count() or 1)
+        self.sweeps = []
+
+    def subscribe(self, dispatcher: EventDispatcher) -> None:
+        dispatcher.subscribe(Event.LINK_FAILURE, self.link_failed)
+        dispatcher.subscribe(Event.NODE_FAILURE, self.node_failed)
+        dispatcher.subscribe(Event.FAILURE_SWEEP, self.sweep_requested)
+
+    def link_failed(self, event: LinkFailureEvent) -> None:
+        self.st.add_failure("link", self.evaluate(self.get_fiber_links(event.get_link())))
+
+    def node_failed(self, event: NodeFailureEvent) -> None:
+        self.st.add_failure("node", self.evaluate(self.get_node_links(event.get_node()), {event.get_node()}))
+
+    def sweep_requested(self, event: FailureSweepEvent) -> None:
+        results = self.sweep()
+        self.sweeps.append({"time": event.get_time(), "summary": SwitchoverEngine.summarize(results),
+                            "links": results})
+
+    def get_sweeps(self) -> List[dict]:
+        return self.sweeps
+
+    def get_fiber_links(self, link: int) -> Set[int]:
+        """`link` and its reverse link, if any"""
+        src, dst = self.pt.get_src_link(link), self.pt.get_dst_link(link)
+        links = {link}
+        if self.pt.has_link(dst, src):
+            links.add(self.pt.get_link_id(dst, src))
+        return links
+
+    def get_node_links(self, node: int) -> Set[int]:
+        graph = self.pt.get_graph()
+        links = {data["id"] for _, _, data in graph.out_edges(node, data=True)}
+        links.update(data["id"] for _, _, data in graph.in_edges(node, data=True))
+        return links
+
+    def evaluate(self, failed_links: Set[int], failed_nodes: Set[int] = frozenset()) -> Dict[str, int]:
+        """Light paths hit by the failure of `failed_links` and `failed_nodes`, and how many are restored"""
+        light_paths = sorted(self.vt.get_light_paths_on_links(failed_links), key=LightPath.get_id)
+        described = []
+        p_cycles = {}
+        for lp in light_paths:
+            candidates = self.get_candidates(lp)
+            for p_cycle in candidates:
+                if p_cycle.get_id() not in p_cycles:
+                    p_cycles[p_cycle.get_id()] = self.describe_p_cycle(p_cycle)
+            described.append(SwitchoverEngine.describe_light_path(lp, candidates))
+        return SwitchoverEngine.restore(described, p_cycles, failed_links, failed_nodes)
+
+    def get_candidates(self, lp: LightPath) -> List[PCycle]:
+        """P-cycles that may restore `lp`, in the order they are tried"""
+        candidates = [lp.get_p_cycle()] + list(lp.get_list_be_protected())
+        seen = set()
+        usable = []
+        for p_cycle in candidates:
+            # Released p-cycles are no longer in the virtual topology
+            if p_cycle is None or p_cycle.get_id() in seen or self.vt.get_p_cycle(p_cycle.get_id()) is not p_cycle:
+                continue
+            seen.add(p_cycle.get_id())
+            usable.append(p_cycle)
+        return usable
+
+    @staticmethod
+    def describe_light_path(lp: LightPath, candidates: List[PCycle]) -> tuple:
+        return (lp.get_id(), lp.get_source(), lp.get_destination(), len(lp.get_slot_list()),
+                tuple(p_cycle.get_id() for p_cycle in candidates))
+
+    def describe_p_cycle(self, p_cycle: PCycle) -> tuple:
+        edges = tuple((self.pt.get_src_link(link), self.pt.get_dst_link(link), link)
+                      for link in p_cycle.get_cycle_links())
+        return edges, p_cycle.reserved_slots
+
+    @staticmethod
+    def restore(light_paths: List[tuple], p_cycles: Dict[int, tuple], failed_links: Set[int],
+                failed_nodes: Iterable[int] = ()) -> Dict[str, int]:
+        """
+        Switches the described light paths over to their p-cycles, each
+        p-cycle restoring a single light path.
+        :param light_paths: (id, source, destination, slots, p-cycle ids) of the light paths hit
+        :param p_cycles: (edges as (source, destination, link), reserved slots) of the p-cycles, by id
+        """
+        used = set()
+        impact = {"affected": len(light_paths), "restored": 0, "lost": 0, "affected-slots": 0, "restored-slots": 0}
+        for id, src, dst, slots, candidates in light_paths:
+            impact["affected-slots"] += slots
+            restored = False
+            if src not in failed_nodes and dst not in failed_nodes:
+                for p_cycle in candidates:
+                    if p_cycle in used:
+                        continue
+                    edges, reserved_slots = p_cycles[p_cycle]
+                    if reserved_slots >= slots and SwitchoverEngine.joins(edges, src, dst, failed_links):
+                        used.add(p_cycle)
+                        restored = True
+                        break
+            if restored:
+                impact["restored"] += 1
+                impact["restored-slots"] += slots
+            else:
+                impact["lost"] += 1
+        return impact
+
+    @staticmethod
+    def joins(edges: Tuple[Tuple[int, int, int], ...], src: int, dst: int, failed_links: Set[int]) -> bool:
+        """Whether the links of `edges` that are up join src and dst, in either direction"""
+        adjacency = {}
+        for u, v, link in edges:
+            if link not in failed_links:
+                adjacency.setdefault(u, []).append(v)
+                adjacency.setdefault(v, []).append(u)
+        if src not in adjacency:
+            return False
+        seen = {src}
+        fringe = deque([src])
+        while fringe:
+            node = fringe.popleft()
+            if node == dst:
+                return True
+            for neighbour in adjacency[node]:
+                if neighbour not in seen:
+                    seen.add(neighbour)
+                    fringe.append(neighbour)
+        return False
+
+    def snapshot(self) -> dict:
+        """Picklable copy of what the evaluation of a failure needs from the current state"""
+        light_paths = {}
+        link_light_paths = {}
+        p_cycles = {}
+        for lp in self.vt.get_light_paths():
+            candidates = self.get_candidates(lp)
+            for p_cycle in candidates:
+                if p_cycle.get_id() not in p_cycles:
+                    p_cycles[p_cycle.get_id()] = self.describe_p_cycle(p_cycle)
+            light_paths[lp.get_id()] = SwitchoverEngine.describe_light_path(lp, candidates)
+            for link in lp.get_links():
+                link_light_paths.setdefault(link, []).append(lp.get_id())
+        fibers = {link: self.get_fiber_links(link) for link in self.pt.get_link_ids()}
+        return {"light-paths": light_paths, "link-light-paths": link_light_paths, "p-cycles": p_cycles,
+                "fibers": fibers}
+
+    def sweep(self, links: List[int] = None) -> Dict[int, Dict[str, int]]:
+        """
+        Impact of the failure of each of `links` on its own, by link. Both
+        links of a fiber fail together, so by default one link per fiber is
+        failed: the one with the lower id.
+        """
+        snapshot = self.snapshot()
+        if links is None:
+            links = [link for link, fiber in snapshot["fibers"].items() if link == min(fiber)]
+        workers = min(self.workers, len(links) // SwitchoverEngine.MIN_SWEEP_LINKS)
+        if workers <= 1:
+            return dict(SwitchoverEngine.evaluate_links(links, snapshot))
+
+        chunks = [links[i::4 * workers] for i in range(4 * workers)]
+        results = {}
+        with ProcessPoolExecutor(max_workers=workers, initializer=SwitchoverEngine.init_worker,
+                                 initargs=(snapshot,)) as executor:
+            for chunk_results in executor.map(SwitchoverEngine.evaluate_links, chunks):
+                results.update(chunk_results)
+        return {link: results[link] for link in links}
+
+    @staticmethod
+    def init_worker(snapshot: dict) -> None:
+        SwitchoverEngine.worker_snapshot = snapshot
+
+    @staticmethod
+    def evaluate_links(links: List[int], snapshot: dict = None) -> List[Tuple[int, Dict[str, int]]]:
+        snapshot = snapshot if snapshot is not None else SwitchoverEngine.worker_snapshot
+        light_paths = snapshot["light-paths"]
+        link_light_paths = snapshot["link-light-paths"]
+        results = []
+        for link in links:
+            failed_links = snapshot["fibers"][link]
+            hit = set()
+            for failed_link in failed_links:
+                hit.update(link_light_paths.get(failed_link, ()))
+            described = [light_paths[id] for id in sorted(hit)]
+            results.append((link, SwitchoverEngine.restore(described, snapshot["p-cycles"], failed_links)))
+        return results
+
+    @staticmethod
+    def summarize(results: Dict[int, Dict[str, int]]) -> Dict[str, float]:
+        summary = {"failures": len(results), "affected": 0, "restored": 0, "lost": 0}
+        for impact in results.values():
+            for name in ("affected", "restored", "lost"):
+                summary[name] += impact[name]
+        summary["restorability"] = summary["restored"] / summary["affected"] if summary["affected"] else 1.0
+        worst = max(results, key=lambda link: results[link]["lost"], default=None)
+        summary["worst-link"] = worst
+        return summary
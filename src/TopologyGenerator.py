@@ -0,0 +1,173 @@
+import math
+import random
+import xml.etree.ElementTree as ET
+from typing import Dict, List, Tuple
+
+import networkx as nx
+import numpy as np
+
+
+class TopologyGenerator:
+    """
+    Synthetic physical topologies for scale testing.
+
+    Nodes are placed on a plane of `width` x `height` km (by default about
+    the size of the USA network) and every link gets the Euclidean length
+    of its ends as distance and weight, and distance / 200 as delay, as in
+    xml/ccl.xml. Models:
+    - "waxman": random geometric graph, a link between u and v with
+      probability beta * exp(-d(u, v) / (alpha * L));
+    - "grid": rows x columns mesh;
+    - "ring-of-rings": rings of `ring_size` nodes around a core ring;
+    - "barabasi-albert": preferential attachment of `m` links per node.
+    Disconnected graphs are joined by their shortest possible links.
+    """
+
+    MODELS = ["waxman", "grid", "ring-of-rings", "barabasi-albert"]
+
+    def __init__(self, seed: int = 1, width: float = 4500.0, height: float = 2500.0):
+        self.seed = seed
+        self.width = width
+        self.height = height
+        self.rng = random.Random(seed)
+
+    def generate(self, model: str, nodes: int, **kwargs) -> nx.Graph:
+        if model == "waxman":
+            graph = self.waxman(nodes, **kwargs)
+        elif model == "grid":
+            graph = self.grid(nodes, **kwargs)
+        elif model == "ring-of-rings":
+            graph = self.ring_of_rings(nodes, **kwargs)
+        elif model == "barabasi-albert":
+            graph = self.barabasi_albert(nodes, **kwargs)
+        else:
+            raise ValueError("Unknown topology model " + model + "!")
+        self.connect(graph)
+        self.set_distances(graph)
+        return graph
+
+    def random_positions(self, nodes: int) -> Dict[int, Tuple[float, float]]:
+        return {node: (self.rng.uniform(0, self.width), self.rng.uniform(0, self.height)) for node in range(nodes)}
+
+    def waxman(self, nodes: int, alpha: float = 0.15, beta: float = 0.4, degree: float = 3.0) -> nx.Graph:
+        """
+        Waxman graph, L being the diagonal of the plane. When `degree` is
+        given, beta is scaled so that the expected average degree is about
+        `degree` whatever the number of nodes.
+        """
+        positions = self.random_positions(nodes)
+        points = np.array([positions[node] for node in range(nodes)])
+        scale = alpha * math.hypot(self.width, self.height)
+        generator = np.random.default_rng(self.rng.randrange(1 << 30))
+        if degree:
+            # Expected degree of a node is (nodes - 1) * beta * E[exp(-d / (alpha L))]
+            pairs = generator.integers(0, nodes, size=(4000, 2))
+            mean = np.exp(-np.hypot(*(points[pairs[:, 0]] - points[pairs[:, 1]]).T) / scale).mean()
+            beta = min(1.0, degree / ((nodes - 1) * mean))
+
+        graph = nx.Graph()
+        for node in range(nodes):
+            graph.add_node(node, pos=positions[node])
+        for node in range(nodes - 1):
+            distances = np.hypot(*(points[node + 1:] - points[node]).T)
+            linked = np.nonzero(generator.random(len(distances)) < beta * np.exp(-distances / scale))[0]
+            graph.add_edges_from((node, node + 1 + int(other)) for other in linked)
+        return graph
+
+    def grid(self, nodes: int, columns: int = 0) -> nx.Graph:
+        columns = columns or max(1, int(round(math.sqrt(nodes))))
+        rows = max(1, math.ceil(nodes / columns))
+        graph = nx.Graph()
+        for node in range(nodes):
+            row, column = divmod(node, columns)
+            graph.add_node(node, pos=((column + 0.5) * self.width / columns, (row + 0.5) * self.height / rows))
+            if column > 0:
+                graph.add_edge(node - 1, node)
+            if row > 0:
+                graph.add_edge(node - columns, node)
+        return graph
+
+    def ring_of_rings(self, nodes: int, ring_size: int = 10) -> nx.Graph:
+        """Rings of `ring_size` nodes, each one attached to the core ring, made of the first node of every ring"""
+        rings = max(1, math.ceil(nodes / ring_size))
+        graph = nx.Graph()
+        center = (self.width / 2, self.height / 2)
+        for ring in range(rings):
+            members = list(range(ring * ring_size, min(nodes, (ring + 1) * ring_size)))
+            angle = 2 * math.pi * ring / rings
+            ring_center = (center[0] + 0.35 * self.width * math.cos(angle),
+                           center[1] + 0.35 * self.height * math.sin(angle))
+            radius = min(self.width, self.height) * min(0.3, 1.5 / rings)
+            for i, node in enumerate(members):
+                # The first node of a ring faces the center, where the core ring runs
+                theta = angle + math.pi + 2 * math.pi * i / len(members)
+                graph.add_node(node, pos=(ring_center[0] + radius * math.cos(theta),
+                                          ring_center[1] + radius * math.sin(theta)))
+            for i in range(len(members)):
+                if len(members) > 2 or i == 0 and len(members) == 2:
+                    graph.add_edge(members[i], members[(i + 1) % len(members)])
+        if rings > 1:
+            core = [ring * ring_size for ring in range(rings)]
+            for i in range(len(core)):
+                if len(core) > 2 or i == 0:
+                    graph.add_edge(core[i], core[(i + 1) % len(core)])
+        return graph
+
+    def barabasi_albert(self, nodes: int, m: int = 2) -> nx.Graph:
+        graph = nx.barabasi_albert_graph(nodes, min(m, nodes - 1), seed=self.rng.randrange(1 << 30))
+        nx.set_node_attributes(graph, self.random_positions(nodes), "pos")
+        return graph
+
+    def connect(self, graph: nx.Graph) -> None:
+        """Joins the components of `graph` with the shortest link between each one and the largest"""
+        components = sorted(nx.connected_components(graph), key=len, reverse=True)
+        if len(components) < 2:
+            return
+        main = list(components[0])
+        main_positions = np.array([graph.nodes[node]["pos"] for node in main])
+        for component in components[1:]:
+            best = None
+            for node in component:
+                distances = np.hypot(*(main_positions - np.array(graph.nodes[node]["pos"])).T)
+                i = int(distances.argmin())
+                if best is None or distances[i] < best[0]:
+                    best = (distances[i], node, main[i])
+            graph.add_edge(best[1], best[2])
+
+    def set_distances(self, graph: nx.Graph) -> None:
+        for u, v, data in graph.edges(data=True):
+            data["distance"] = max(1, int(round(math.dist(graph.nodes[u]["pos"], graph.nodes[v]["pos"]))))
+
+    @staticmethod
+    def get_links(graph: nx.Graph) -> List[Tuple[int, int, int]]:
+        """(source, destination, distance) of every link, both directions of an edge with consecutive ids"""
+        links = []
+        for u, v, data in sorted(graph.edges(data=True)):
+            links.append((u, v, data["distance"]))
+            links.append((v, u, data["distance"]))
+        return links
+
+    @staticmethod
+    def to_xml(graph: nx.Graph, name: str, cores: int = 7, slots: int = 320, slot_bandwidth: float = 12.5) -> ET.Element:
+        """<physical-topology> element of `graph`, in the format read by PhysicalTopology"""
+        pt = ET.Element("physical-topology", {"name": name, "cores": str(cores), "slots": str(slots),
+                                              "slotsBandwidth": str(slot_bandwidth)})
+        nodes = ET.SubElement(pt, "nodes")
+        for node in sorted(graph.nodes):
+            ET.SubElement(nodes, "node", {"id": str(node)})
+        links = ET.SubElement(pt, "links")
+        for id, (src, dst, distance) in enumerate(TopologyGenerator.get_links(graph)):
+            ET.SubElement(links, "link", {"id": str(id), "source": str(src), "destination": str(dst),
+                                          "delay": str(distance / 200), "bandwidth": "192",
+                                          "weight": str(distance), "distance": str(distance)})
+        return pt
+
+    @staticmethod
+    def save_npz(graph: nx.Graph, file_name: str, cores: int = 7, slots: int = 320, slot_bandwidth: float = 12.5) -> None:
+        """Writes the topology as NumPy arrays: one entry per link, link ids being the array indices"""
+        links = np.array(TopologyGenerator.get_links(graph), dtype=np.int64).reshape(-1, 3)
+        np.savez_compressed(file_name, nodes=np.array(sorted(graph.nodes), dtype=np.int64),
+                            source=links[:, 0], destination=links[:, 1], distance=links[:, 2],
+                            weight=links[:, 2].astype(np.float64), delay=links[:, 2] / 200,
+                            bandwidth=np.full(len(links), 192.0), cores=cores, slots=slots,
+                            slot_bandwidth=slot_bandwidth)
@@ -0,0 +1,152 @@
+import csv
+import xml.etree.ElementTree as ET
+from typing import Dict
+
+import numpy as np
+
+
+class TopologyLoader:
+    """
+    Reads physical topologies from files into NumPy arrays, one entry per
+    link, for PhysicalTopology.load_arrays:
+    - .npz: the arrays written by TopologyGenerator.save_npz;
+    - .csv: an edge list with a header naming its columns, among id,
+      source, destination, delay, bandwidth, weight and distance (source
+      and destination are required, lines starting with # are skipped);
+    - .graphml: nodes and edges with the same attributes, both directions
+      of every edge of an undirected graph;
+    - anything else: the XML of a <physical-topology> element or of a
+      simulation file, streamed with iterparse so very large files are
+      never held in memory as a whole.
+
+    Missing ids are the link positions, a missing distance is the weight
+    and missing weights, delays and bandwidths are those of distance.
+    """
+
+    COLUMNS = ["id", "source", "destination", "delay", "bandwidth", "weight", "distance"]
+
+    @staticmethod
+    def read(file_name: str) -> Dict[str, np.ndarray]:
+        if file_name.endswith(".npz"):
+            return TopologyLoader.read_npz(file_name)
+        if file_name.endswith(".csv"):
+            return TopologyLoader.read_csv(file_name)
+        if file_name.endswith(".graphml"):
+            return TopologyLoader.read_graphml(file_name)
+        return TopologyLoader.read_xml(file_name)
+
+    @staticmethod
+    def complete(arrays: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+        """Fills in the optional link columns and the nodes"""
+        assert "source" in arrays, "source column is missing!"
+        assert "destination" in arrays, "destination column is missing!"
+        source = np.asarray(arrays["source"], dtype=np.int64)
+        destination = np.asarray(arrays["destination"], dtype=np.int64)
+        links = {"source": source, "destination": destination}
+        links["id"] = np.asarray(arrays["id"], dtype=np.int64) if "id" in arrays else np.arange(len(source))
+        if "distance" in arrays:
+            links["distance"] = np.asarray(arrays["distance"]).astype(np.int64)
+        elif "weight" in arrays:
+            links["distance"] = np.asarray(arrays["weight"]).astype(np.int64)
+        else:
+            links["distance"] = np.ones(len(source), dtype=np.int64)
+        links["weight"] = np.asarray(arrays.get("weight", links["distance"]), dtype=np.float64)
+        links["delay"] = np.asarray(arrays.get("delay", links["distance"] / 200), dtype=np.float64)
+        links["bandwidth"] = np.asarray(arrays.get("bandwidth", np.full(len(source), 192.0)), dtype=np.float64)
+        if "nodes" in arrays:
+            links["nodes"] = np.asarray(arrays["nodes"], dtype=np.int64)
+        else:
+            links["nodes"] = np.unique(np.concatenate([source, destination]))
+        for name in ("cores", "slots", "slot_bandwidth"):
+            if name in arrays:
+                links[name] = arrays[name]
+        return links
+
+    @staticmethod
+    def read_npz(file_name: str) -> Dict[str, np.ndarray]:
+        with np.load(file_name) as data:
+            arrays = {name: data[name] for name in data.files}
+        for name in ("cores", "slots", "slot_bandwidth"):
+            if name in arrays:
+                arrays[name] = arrays[name].item()
+        return TopologyLoader.complete(arrays)
+
+    @staticmethod
+    def read_csv(file_name: str) -> Dict[str, np.ndarray]:
+        with open(file_name, newline="") as f:
+            lines = [line for line in f if line.strip() and not line.lstrip().startswith("#")]
+        header = [name.strip() for name in next(csv.reader(lines[:1]))]
+        for name in header:
+            if name not in TopologyLoader.COLUMNS:
+                raise ValueError("Unknown column " + name + " in " + file_name + "!")
+        values = np.loadtxt(lines[1:], delimiter=",", ndmin=2, dtype=np.float64)
+        return TopologyLoader.complete({name: values[:, i] for i, name in enumerate(header)})
+
+    @staticmethod
+    def read_graphml(file_name: str) -> Dict[str, np.ndarray]:
+        namespace = "{http://graphml.graphdrawing.org/xmlns}"
+        keys = {}
+        nodes = []
+        columns = {name: [] for name in TopologyLoader.COLUMNS}
+        directed = True
+        for _, element in ET.iterparse(file_name):
+            tag = element.tag.replace(namespace, "")
+            if tag == "key":
+                keys[element.attrib["id"]] = element.attrib.get("attr.name", element.attrib["id"])
+            elif tag == "node":
+                nodes.append(int(element.attrib["id"]))
+                element.clear()
+            elif tag == "edge":
+                data = {keys.get(d.attrib["key"], d.attrib["key"]): d.text for d in element}
+                columns["source"].append(int(element.attrib["source"]))
+                columns["destination"].append(int(element.attrib["target"]))
+                for name in ("id", "delay", "bandwidth", "weight", "distance"):
+                    columns[name].append(data.get(name))
+                element.clear()
+            elif tag == "graph":
+                directed = element.attrib.get("edgedefault", "directed") == "directed"
+
+        arrays = {"nodes": np.array(nodes, dtype=np.int64),
+                  "source": np.array(columns["source"], dtype=np.int64),
+                  "destination": np.array(columns["destination"], dtype=np.int64)}
+        for name in ("delay", "bandwidth", "weight", "distance"):
+            if columns[name] and all(value is not None for value in columns[name]):
+                arrays[name] = np.array(columns[name], dtype=np.float64)
+        if not directed:
+            # Both directions of every edge, with consecutive link ids
+            for name in list(arrays):
+                if name != "nodes":
+                    arrays[name] = np.repeat(arrays[name], 2)
+            arrays["source"][1::2], arrays["destination"][1::2] = arrays["destination"][::2], arrays["source"][::2]
+        elif columns["id"] and all(value is not None for value in columns["id"]):
+            arrays["id"] = np.array(columns["id"], dtype=np.int64)
+        return TopologyLoader.complete(arrays)
+
+    @staticmethod
+    def read_xml(file_name: str) -> Dict[str, np.ndarray]:
+        attributes = {}
+        nodes = []
+        columns = {name: [] for name in TopologyLoader.COLUMNS}
+        for event, element in ET.iterparse(file_name, events=("start", "end")):
+            if event == "start":
+                if element.tag == "physical-topology":
+                    attributes = element.attrib
+                continue
+            if element.tag == "node" and "id" in element.attrib:
+                nodes.append(int(element.attrib["id"]))
+                element.clear()
+            elif element.tag == "link":
+                for name in TopologyLoader.COLUMNS:
+                    assert name in element.attrib, "Invalid link element " + name
+                    columns[name].append(element.attrib[name])
+                element.clear()
+        arrays = {"nodes": np.array(nodes, dtype=np.int64)}
+        for name in TopologyLoader.COLUMNS:
+            arrays[name] = np.array(columns[name], dtype=np.float64)
+        if "cores" in attributes:
+            arrays["cores"] = int(attributes["cores"])
+        if "slots" in attributes:
+            arrays["slots"] = int(attributes["slots"])
+        if "slotsBandwidth" in attributes:
+            arrays["slot_bandwidth"] = float(attributes["slotsBandwidth"])
+        return TopologyLoader.complete(arrays)
@@ -0,0 +1,267 @@
+import json
+import mmap
+import os
+import threading
+from array import array
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from src.TraceWriter import TraceWriter
+
+
+class TraceIndex:
+    """
+    Sidecar offset indexes over a text trace written by the Tracer.
+
+    Three indexes are kept: flow id -> line offsets, s-d pair -> (time, kind,
+    line offset) and time bucket -> first line offset. They are saved next to
+    the trace as .npy files and opened memory-mapped, and the trace itself is
+    read through mmap, so answering a query only touches the matching lines.
+    update() indexes whatever complete lines were appended since the last
+    call, which lets the index be built while the simulation is still writing.
+    Queries sort only the entries indexed since the last save, merge them
+    into the saved ones and keep the result until the next update().
+    """
+
+    FLOW_DTYPE = np.dtype([("id", np.int64), ("offset", np.int64)])
+    PAIR_DTYPE = np.dtype([("pair", np.int64), ("time", np.float64), ("kind", np.int8), ("offset", np.int64)])
+    KINDS = {
+        b"flow-arrived": TraceWriter.FLOW_ARRIVED,
+        b"flow-departed": TraceWriter.FLOW_DEPARTED,
+        b"flow-accepted": TraceWriter.FLOW_ACCEPTED,
+        b"flow-blocked": TraceWriter.FLOW_BLOCKED,
+        b"lightpath-created": TraceWriter.LIGHTPATH_CREATED,
+        b"lightpath-removed": TraceWriter.LIGHTPATH_REMOVED,
+    }
+
+    def __init__(self, trace_file_name: str, bucket_width: float = 1.0, max_nodes: int = 1 << 16):
+        self.trace_file_name = trace_file_name
+        self.bucket_width = bucket_width
+        self.max_nodes = max_nodes
+        self.position = 0
+        self.time = 0.0
+        self.flow_pairs: Dict[int, Tuple[int, int]] = {}
+
+        # Entries indexed since the last save, appended in trace order
+        self.flow_ids = array("q")
+        self.flow_offsets = array("q")
+        self.pair_keys = array("q")
+        self.pair_times = array("d")
+        self.pair_kinds = array("b")
+        self.pair_offsets = array("q")
+        self.buckets = array("q")
+
+        # Entries loaded from the sidecar files (memory-mapped)
+        self.saved_flows = np.empty(0, dtype=TraceIndex.FLOW_DTYPE)
+        self.saved_pairs = np.empty(0, dtype=TraceIndex.PAIR_DTYPE)
+        # Saved and pending entries sorted for the queries, None once new entries were indexed
+        self.sorted_flows = None
+        self.sorted_pairs = None
+
+        self.lock = threading.Lock()
+        self.follower = None
+        self.stop_following = threading.Event()
+
+    def pair_key(self, src: int, dst: int) -> int:
+        return src * self.max_nodes + dst
+
+    def update(self) -> int:
+        """Indexes the complete lines appended to the trace since the last update"""
+        with self.lock:
+            size = os.path.getsize(self.trace_file_name)
+            if size <= self.position:
+                return 0
+            with open(self.trace_file_name, "rb") as f:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    end = mm.rfind(b"\n", self.position, size)
+                    if end < 0:
+                        return 0
+                    lines = 0
+                    offset = self.position
+                    while offset <= end:
+                        newline = mm.find(b"\n", offset, end + 1)
+                        self.index_line(mm[offset:newline], offset)
+                        offset = newline + 1
+                        lines += 1
+                    self.position = end + 1
+            self.sorted_flows = None
+            self.sorted_pairs = None
+            return lines
+
+    def index_line(self, line: bytes, offset: int) -> None:
+        fields = line.split()
+        if not fields:
+            return
+        kind = TraceIndex.KINDS.get(fields[0])
+        if kind is None or kind >= TraceWriter.LIGHTPATH_CREATED:
+            return
+
+        if kind == TraceWriter.FLOW_ARRIVED or kind == TraceWriter.FLOW_DEPARTED:
+            self.time = float(fields[1])
+            bucket = int(self.time // self.bucket_width)
+            while len(self.buckets) <= bucket:
+                self.buckets.append(offset)
+
+        id = int(fields[2])
+        if kind == TraceWriter.FLOW_DEPARTED:
+            src, dst = self.flow_pairs.pop(id, (-1, -1))
+        else:
+            src, dst = int(fields[3]), int(fields[4])
+            if kind == TraceWriter.FLOW_ARRIVED:
+                self.flow_pairs[id] = (src, dst)
+
+        self.flow_ids.append(id)
+        self.flow_offsets.append(offset)
+        if src >= 0:
+            self.pair_keys.append(self.pair_key(src, dst))
+            self.pair_times.append(self.time)
+            self.pair_kinds.append(kind)
+            self.pair_offsets.append(offset)
+
+    def follow(self, interval: float = 1.0) -> None:
+        """Keeps updating the index on a background thread until stop() is called"""
+        def run():
+            while not self.stop_following.wait(interval):
+                self.update()
+
+        self.stop_following.clear()
+        self.follower = threading.Thread(target=run, name="trace-index", daemon=True)
+        self.follower.start()
+
+    def stop(self) -> None:
+        if self.follower is not None:
+            self.stop_following.set()
+            self.follower.join()
+            self.follower = None
+        self.update()
+
+    def flows(self) -> np.ndarray:
+        """Flow index sorted by flow id, entries of one flow in trace order"""
+        with self.lock:
+            return self.get_sorted_flows()
+
+    def pairs(self) -> np.ndarray:
+        """Pair index sorted by pair, entries of one pair in trace order"""
+        with self.lock:
+            return self.get_sorted_pairs()
+
+    def get_sorted_flows(self) -> np.ndarray:
+        # With the lock held: the pending arrays are copied before the follower appends to them again
+        if self.sorted_flows is None:
+            pending = np.empty(len(self.flow_ids), dtype=TraceIndex.FLOW_DTYPE)
+            pending["id"] = np.frombuffer(self.flow_ids, dtype=np.int64)
+            pending["offset"] = np.frombuffer(self.flow_offsets, dtype=np.int64)
+            self.sorted_flows = TraceIndex.merge(self.saved_flows, pending, "id")
+        return self.sorted_flows
+
+    def get_sorted_pairs(self) -> np.ndarray:
+        if self.sorted_pairs is None:
+            pending = np.empty(len(self.pair_keys), dtype=TraceIndex.PAIR_DTYPE)
+            pending["pair"] = np.frombuffer(self.pair_keys, dtype=np.int64)
+            pending["time"] = np.frombuffer(self.pair_times, dtype=np.float64)
+            pending["kind"] = np.frombuffer(self.pair_kinds, dtype=np.int8)
+            pending["offset"] = np.frombuffer(self.pair_offsets, dtype=np.int64)
+            self.sorted_pairs = TraceIndex.merge(self.saved_pairs, pending, "pair")
+        return self.sorted_pairs
+
+    @staticmethod
+    def merge(saved: np.ndarray, pending: np.ndarray, key: str) -> np.ndarray:
+        """Merges pending entries, in trace order, into saved ones sorted on `key`, after the saved ones of equal key"""
+        if len(pending) == 0:
+            return saved
+        pending = pending[np.argsort(pending[key], kind="stable")]
+        positions = np.searchsorted(saved[key], pending[key], side="right") + np.arange(len(pending))
+        merged = np.empty(len(saved) + len(pending), dtype=saved.dtype)
+        is_saved = np.ones(len(merged), dtype=bool)
+        is_saved[positions] = False
+        merged[positions] = pending
+        merged[is_saved] = saved
+        return merged
+
+    def save(self) -> None:
+        with self.lock:
+            flows = self.get_sorted_flows()
+            pairs = self.get_sorted_pairs()
+            np.save(self.trace_file_name + ".flows.npy", flows)
+            np.save(self.trace_file_name + ".pairs.npy", pairs)
+            np.save(self.trace_file_name + ".buckets.npy", np.frombuffer(self.buckets, dtype=np.int64))
+            with open(self.trace_file_name + ".index.json", "w") as f:
+                json.dump({"position": self.position, "time": self.time, "bucket_width": self.bucket_width,
+                           "max_nodes": self.max_nodes,
+                           "flow_pairs": [[id, src, dst] for id, (src, dst) in self.flow_pairs.items()]}, f)
+            self.saved_flows = flows
+            self.saved_pairs = pairs
+            self.sorted_flows = flows
+            self.sorted_pairs = pairs
+            self.flow_ids, self.flow_offsets = array("q"), array("q")
+            self.pair_keys, self.pair_times = array("q"), array("d")
+            self.pair_kinds, self.pair_offsets = array("b"), array("q")
+
+    @staticmethod
+    def load(trace_file_name: str) -> "TraceIndex":
+        """Opens the sidecar indexes of `trace_file_name`, memory-mapped"""
+        with open(trace_file_name + ".index.json") as f:
+            meta = json.load(f)
+        index = TraceIndex(trace_file_name, meta["bucket_width"], meta["max_nodes"])
+        index.position = meta["position"]
+        index.time = meta["time"]
+        index.flow_pairs = {id: (src, dst) for id, src, dst in meta["flow_pairs"]}
+        index.saved_flows = np.load(trace_file_name + ".flows.npy", mmap_mode="r")
+        index.saved_pairs = np.load(trace_file_name + ".pairs.npy", mmap_mode="r")
+        index.buckets = array("q", np.load(trace_file_name + ".buckets.npy").tobytes())
+        return index
+
+    def read_lines(self, offsets) -> List[str]:
+        if len(offsets) == 0:
+            return []
+        with open(self.trace_file_name, "rb") as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                lines = []
+                for offset in offsets:
+                    offset = int(offset)
+                    lines.append(mm[offset:mm.find(b"\n", offset)].decode())
+                return lines
+
+    def flow(self, flow_id: int) -> List[str]:
+        """Every trace line of flow `flow_id`, in trace order"""
+        flows = self.flows()
+        first = np.searchsorted(flows["id"], flow_id, side="left")
+        last = np.searchsorted(flows["id"], flow_id, side="right")
+        return self.read_lines(np.sort(flows["offset"][first:last]))
+
+    def pair(self, src: int, dst: int, t1: float = float("-inf"), t2: float = float("inf"), kind: int = None) -> List[str]:
+        """Trace lines of the s-d pair (src, dst) between t1 and t2, optionally of one kind only"""
+        pairs = self.pairs()
+        key = self.pair_key(src, dst)
+        first = np.searchsorted(pairs["pair"], key, side="left")
+        last = np.searchsorted(pairs["pair"], key, side="right")
+        entries = pairs[first:last]
+        # Entries of one pair are in trace order, hence sorted by time
+        entries = entries[np.searchsorted(entries["time"], t1, side="left"):np.searchsorted(entries["time"], t2, side="right")]
+        if kind is not None:
+            entries = entries[entries["kind"] == kind]
+        return self.read_lines(entries["offset"])
+
+    def blocks(self, src: int, dst: int, t1: float = float("-inf"), t2: float = float("inf")) -> List[str]:
+        return self.pair(src, dst, t1, t2, TraceWriter.FLOW_BLOCKED)
+
+    def between(self, t1: float, t2: float) -> List[str]:
+        """Every trace line written between the events at times t1 and t2"""
+        first_bucket = max(int(t1 // self.bucket_width), 0)
+        if first_bucket >= len(self.buckets):
+            return []
+        start = self.buckets[first_bucket]
+        last_bucket = int(t2 // self.bucket_width) + 1
+        end = self.buckets[last_bucket] if last_bucket < len(self.buckets) else self.position
+        with open(self.trace_file_name, "rb") as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                lines = []
+                time = t1
+                for line in mm[start:end].decode().splitlines():
+                    fields = line.split(" ", 2)
+                    if fields[0] == "flow-arrived" or fields[0] == "flow-departed":
+                        time = float(fields[1])
+                    if t1 <= time <= t2:
+                        lines.append(line)
+                return lines
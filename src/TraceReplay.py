@@ -0,0 +1,113 @@
+import time
+from typing import Dict, Iterator
+
+from src.Event import Event
+from src.Flow import Flow
+from src.FlowArrivalEvent import FlowArrivalEvent
+from src.FlowDepartureEvent import FlowDepartureEvent
+from src.ControlPlane import ControlPlane
+from src.EventDispatcher import EventDispatcher
+from src.Tracer import Tracer
+from src.MyStatistics import MyStatistics
+from src.TraceWriter import TraceWriter
+
+
+class TraceReplay:
+    """
+    Feeds the flow-arrived and flow-departed records of a recorded trace to
+    the control plane instead of the TrafficGenerator.
+
+    The trace is streamed from disk in time order, so only the flows that are
+    still active are held in memory. Text traces (optionally .gz or .xz) and
+    binary .btrace files written by the TraceWriter are both accepted.
+    Departures of flows whose arrival is not in the trace, as in a truncated
+    or sliced trace, are skipped and counted.
+    """
+
+    def __init__(self, file_name: str):
+        self.file_name = file_name
+        self.compression = None
+        if file_name.endswith(".gz"):
+            self.compression = "gzip"
+        elif file_name.endswith(".xz"):
+            self.compression = "lzma"
+        self.binary = ".btrace" in file_name
+        self.active_flows: Dict[int, Flow] = {}
+        self.unmatched_departures = 0
+
+    @staticmethod
+    def new_flow(id: int, src: int, dst: int, time: float, rate: int, duration: float, cos: int) -> Flow:
+        return Flow(id, src, dst, time, rate, duration, cos, time + (duration * 0.5))
+
+    def events(self) -> Iterator[Event]:
+        if self.binary:
+            return self.binary_events()
+        return self.text_events()
+
+    def text_events(self) -> Iterator[Event]:
+        with TraceWriter.open_file(self.file_name, "rt", self.compression) as f:
+            for line in f:
+                if line.startswith("flow-arrived"):
+                    fields = line.split()
+                    t = float(fields[1])
+                    flow = TraceReplay.new_flow(int(fields[2]), int(fields[3]), int(fields[4]), t, int(fields[5]),
+                                                float(fields[6]), int(fields[7]))
+                    self.active_flows[flow.get_id()] = flow
+                    yield FlowArrivalEvent(t, flow)
+                elif line.startswith("flow-departed"):
+                    fields = line.split()
+                    id = int(fields[2])
+                    flow = self.active_flows.pop(id, None)
+                    if flow is None:
+                        self.unmatched_departures += 1
+                        continue
+                    yield FlowDepartureEvent(float(fields[1]), id, flow)
+
+    def binary_events(self) -> Iterator[Event]:
+        for record, links in TraceWriter.read_records(self.file_name, self.compression):
+            kind = record[0]
+            if kind == TraceWriter.FLOW_ARRIVED:
+                flow = TraceReplay.new_flow(record[2], record[3], record[4], record[1], record[5], record[6], record[7])
+                self.active_flows[flow.get_id()] = flow
+                yield FlowArrivalEvent(record[1], flow)
+            elif kind == TraceWriter.FLOW_DEPARTED:
+                flow = self.active_flows.pop(record[2], None)
+                if flow is None:
+                    self.unmatched_departures += 1
+                    continue
+                yield FlowDepartureEvent(record[1], record[2], flow)
+
+    def run(self, cp: ControlPlane, statistics: bool = True) -> Dict[str, float]:
+        """
+        Replays the whole trace through `cp`. With statistics disabled the
+        tracer and MyStatistics are skipped, so only the RSA work is timed.
+        """
+        tr = Tracer.get_tracer_object()
+        st = MyStatistics.get_my_statistics()
+        trace = tr.write_trace
+        if not statistics:
+            st.toogle_statistics(False)
+            tr.toogle_trace_writing(False)
+
+        # Disabled above, the tracer and the statistics do not subscribe
+        dispatcher = EventDispatcher()
+        tr.subscribe(dispatcher)
+        st.subscribe(dispatcher)
+        cp.subscribe(dispatcher, latency=False)
+        handlers = [dispatcher.get_handlers(kind) for kind in Event.KINDS]
+
+        num_events = 0
+        begin = time.perf_counter()
+        for event in self.events():
+            for handler in handlers[event.kind]:
+                handler(event)
+            num_events += 1
+        elapsed = time.perf_counter() - begin
+
+        if not statistics:
+            st.toogle_statistics(True)
+            tr.toogle_trace_writing(trace)
+        return {"events": num_events, "seconds": elapsed, "unmatched-departures": self.unmatched_departures}
+
+    def get_unmatched_departures(self) -> int:
+        return self.unmatched_departures
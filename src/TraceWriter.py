@@ -0,0 +1,143 @@
+import gzip
+import lzma
+import queue
+import struct
+import threading
+from typing import BinaryIO, Iterator, List, Tuple
+
+
+class TraceWriter:
+    """
+    Binary trace backend for the Tracer.
+
+    Every trace line becomes one fixed-size record, packed with `RECORD` and
+    buffered in memory. Full buffers are handed through a bounded queue to a
+    writer thread, which does the (optionally gzip or lzma compressed) file
+    I/O off the simulation loop. Lightpath records are followed by their link
+    ids as `num_links` unsigned 32-bit integers.
+    """
+
+    FLOW_ARRIVED = 0
+    FLOW_DEPARTED = 1
+    FLOW_ACCEPTED = 2
+    FLOW_BLOCKED = 3
+    LIGHTPATH_CREATED = 4
+    LIGHTPATH_REMOVED = 5
+
+    # kind, time, id, src, dst, rate, duration, cos, lightpath id, number of links
+    RECORD = struct.Struct("<Bdqiiqdiqi")
+    MAGIC = b"EONTRC01"
+
+    def __init__(self, file_name: str, compression: str = None, batch_size: int = 1 << 20, queue_size: int = 8):
+        self.file = TraceWriter.open_file(file_name, "wb", compression)
+        self.file.write(TraceWriter.MAGIC)
+        self.batch_size = batch_size
+        self.buffer = []
+        self.buffered = 0
+        self.error = None
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.thread = threading.Thread(target=self.write_batches, name="trace-writer", daemon=True)
+        self.thread.start()
+
+    @staticmethod
+    def open_file(file_name: str, mode: str, compression: str = None) -> BinaryIO:
+        if compression is None or compression == "none":
+            return open(file_name, mode)
+        elif compression == "gzip":
+            return gzip.open(file_name, mode, compresslevel=6)
+        elif compression == "lzma":
+            return lzma.open(file_name, mode)
+        raise ValueError("Unknown trace compression " + compression)
+
+    def write_batches(self) -> None:
+        while True:
+            batch = self.queue.get()
+            if batch is None:
+                return
+            try:
+                self.file.write(batch)
+            except Exception as e:
+                self.error = e
+
+    def add_record(self, record: bytes) -> None:
+        self.buffer.append(record)
+        self.buffered += len(record)
+        if self.buffered >= self.batch_size:
+            self.flush()
+
+    def flush(self) -> None:
+        if self.error is not None:
+            raise self.error
+        if self.buffer:
+            self.queue.put(b"".join(self.buffer))
+            self.buffer = []
+            self.buffered = 0
+
+    def flow_arrived(self, time: float, flow) -> None:
+        self.add_record(TraceWriter.RECORD.pack(TraceWriter.FLOW_ARRIVED, time, flow.id, flow.src, flow.dst, flow.bw,
+                                                flow.duration, flow.cos, -1, 0))
+
+    def flow_departed(self, time: float, id: int) -> None:
+        self.add_record(TraceWriter.RECORD.pack(TraceWriter.FLOW_DEPARTED, time, id, -1, -1, -1, 0.0, -1, -1, 0))
+
+    def flow_accepted(self, flow, lightpath_id: int) -> None:
+        self.add_record(TraceWriter.RECORD.pack(TraceWriter.FLOW_ACCEPTED, 0.0, flow.id, flow.src, flow.dst, flow.bw,
+                                                flow.duration, flow.cos, lightpath_id, 0))
+
+    def flow_blocked(self, flow) -> None:
+        self.add_record(TraceWriter.RECORD.pack(TraceWriter.FLOW_BLOCKED, 0.0, flow.id, flow.src, flow.dst, flow.bw,
+                                                flow.duration, flow.cos, -1, 0))
+
+    def lightpath(self, kind: int, lp) -> None:
+        links = lp.get_links()
+        self.add_record(TraceWriter.RECORD.pack(kind, 0.0, -1, lp.get_source(), lp.get_destination(), -1, 0.0, -1,
+                                                lp.get_id(), len(links)) + struct.pack(f"<{len(links)}I", *links))
+
+    def close(self) -> None:
+        """Flushes the last batch, stops the writer thread and closes the file"""
+        self.flush()
+        self.queue.put(None)
+        self.thread.join()
+        self.file.close()
+        if self.error is not None:
+            raise self.error
+
+    @staticmethod
+    def read_records(file_name: str, compression: str = None) -> Iterator[Tuple[tuple, List[int]]]:
+        """Streams (record, links) pairs back from a binary trace file"""
+        size = TraceWriter.RECORD.size
+        with TraceWriter.open_file(file_name, "rb", compression) as f:
+            assert f.read(len(TraceWriter.MAGIC)) == TraceWriter.MAGIC, "Not a binary trace file!"
+            while True:
+                data = f.read(size)
+                if len(data) < size:
+                    return
+                record = TraceWriter.RECORD.unpack(data)
+                links = []
+                if record[9] > 0:
+                    links = list(struct.unpack(f"<{record[9]}I", f.read(4 * record[9])))
+                yield record, links
+
+    @staticmethod
+    def format_record(record: tuple, links: List[int]) -> str:
+        """Renders a record in the text format written by the Tracer"""
+        kind, time, id, src, dst, rate, duration, cos, lightpath_id, num_links = record
+        if kind == TraceWriter.FLOW_ARRIVED:
+            return f"flow-arrived {time} {id} {src} {dst} {rate} {duration} {cos}"
+        elif kind == TraceWriter.FLOW_DEPARTED:
+            return f"flow-departed {time} {id} - - - - -"
+        elif kind == TraceWriter.FLOW_ACCEPTED:
+            return f"flow-accepted - {id} {src} {dst} {rate} {duration} {cos} {lightpath_id}"
+        elif kind == TraceWriter.FLOW_BLOCKED:
+            return f"flow-blocked - {id} {src} {dst} {rate} {duration} {cos}"
+        elif kind == TraceWriter.LIGHTPATH_CREATED or kind == TraceWriter.LIGHTPATH_REMOVED:
+            name = "lightpath-created" if kind == TraceWriter.LIGHTPATH_CREATED else "lightpath-removed"
+            return f"{name} {lightpath_id} {src} {dst} " + "".join(f"{link}-" for link in links)
+        raise ValueError("Unknown trace record kind " + str(kind))
+
+    @staticmethod
+    def to_text(binary_file_name: str, text_file_name: str, compression: str = None) -> None:
+        """Converts a binary trace into the text trace format"""
+        with open(text_file_name, "w") as f:
+            for record, links in TraceWriter.read_records(binary_file_name, compression):
+                f.write(TraceWriter.format_record(record, links) + "\n")
@@ -3,6 +3,8 @@ from src.Flow import Flow
 from src.LightPath import LightPath
 from src.FlowArrivalEvent import FlowArrivalEvent
 from src.FlowDepartureEvent import FlowDepartureEvent
+from src.TraceWriter import TraceWriter
+from src.EventDispatcher import EventDispatcher
 
 
 class Tracer:
@@ -11,6 +13,7 @@ class Tracer:
     def __init__(self):
         self.write_trace = True
         self.trace = None
+        self.writer = None
 
     @staticmethod
     def get_tracer_object():
@@ -28,11 +31,17 @@ class Tracer:
             print(f"Error: Could not open file {IOError}")
             exit(1)
 
+    def set_binary_trace_file(self, file_name: str, compression: str = None) -> None:
+        """Writes the trace as binary records on a background thread instead of text lines"""
+        self.writer = TraceWriter(file_name, compression)
+
     def toogle_trace_writing(self, write: bool) -> None:
         self.write_trace = write
 
     def add(self, obj: object) -> None:
         try:
+            if not self.write_trace:
+                return
             if isinstance(obj, str):
                 self.trace.write(obj + "\n")
             elif isinstance(obj, Event):
@@ -41,36 +50,72 @@ class Tracer:
             print(e)
 
     def accept_flow(self, flow: Flow, lightpaths: LightPath) -> None:
-        str_ = f"flow-accepted - {flow.to_trace()} {lightpaths.get_id()}"
         if self.write_trace:
-            self.trace.write(str_ + '\n')
+            if self.writer is not None:
+                self.writer.flow_accepted(flow, lightpaths.get_id())
+            else:
+                self.trace.write(f"flow-accepted - {flow.to_trace()} {lightpaths.get_id()}\n")
 
     def block_flow(self, flow: Flow) -> None:
         if self.write_trace:
-            self.trace.write(f"flow-blocked - {flow.to_trace()}\n")
+            if self.writer is not None:
+                self.writer.flow_blocked(flow)
+            else:
+                self.trace.write(f"flow-blocked - {flow.to_trace()}\n")
 
     def create_lightpath(self, lp: LightPath) -> None:
         if self.write_trace:
-            self.trace.write(f"lightpath-created {lp.to_trace()}\n")
+            if self.writer is not None:
+                self.writer.lightpath(TraceWriter.LIGHTPATH_CREATED, lp)
+            else:
+                self.trace.write(f"lightpath-created {lp.to_trace()}\n")
 
     def remove_lightpath(self, lp: LightPath) -> None:
         if self.write_trace:
-            self.trace.write(f"lightpath-removed {lp.to_trace()}\n")
+            if self.writer is not None:
+                self.writer.lightpath(TraceWriter.LIGHTPATH_REMOVED, lp)
+            else:
+                self.trace.write(f"lightpath-removed {lp.to_trace()}\n")
 
     def add_event(self, event: Event) -> None:
+        if not self.write_trace:
+            return
+        if event.kind == Event.ARRIVAL:
+            self.flow_arrived(event)
+        elif event.kind == Event.DEPARTURE:
+            self.flow_departed(event)
+
+    def subscribe(self, dispatcher: EventDispatcher) -> None:
+        """Traces the events of `dispatcher`, if trace writing is on"""
+        if self.write_trace:
+            dispatcher.subscribe(Event.ARRIVAL, self.flow_arrived)
+            dispatcher.subscribe(Event.DEPARTURE, self.flow_departed)
+
+    def flow_arrived(self, event: FlowArrivalEvent) -> None:
+        try:
+            if self.writer is not None:
+                self.writer.flow_arrived(event.get_time(), event.get_flow())
+            else:
+                self.trace.write(f"flow-arrived {event.get_time()} {event.get_flow().to_trace()}\n")
+        except Exception as e:
+            print(e)
+
+    def flow_departed(self, event: FlowDepartureEvent) -> None:
         try:
-            if isinstance(event, FlowArrivalEvent):
-                if self.write_trace:
-                    self.trace.write(f"flow-arrived {event.get_time()} {event.get_flow().to_trace()}\n")
-            elif isinstance(event, FlowDepartureEvent):
-                if self.write_trace:
-                    self.trace.write(f"flow-departed {event.get_time()} {event.get_id()} - - - - -\n")
+            if self.writer is not None:
+                self.writer.flow_departed(event.get_time(), event.get_id())
+            else:
+                self.trace.write(f"flow-departed {event.get_time()} {event.get_id()} - - - - -\n")
         except Exception as e:
             print(e)
 
     def finish(self) -> None:
         """Finalizes the tracing actions and closes the trace file"""
+        if self.writer:
+            self.writer.close()
+            self.writer = None
         if self.trace:
             self.trace.flush()
             self.trace.close()
-        Tracer._singleton_object = None
+            self.trace = None
+        Tracer.singleton_object = None
@@ -0,0 +1,33 @@
+from typing import List
+
+import numpy as np
+
+
+class TrafficArrays:
+    """
+    Columnar description of a run of calls (or of one chunk of it), as
+    produced by TrafficGenerator.iter_traffic. Entry j is call id[j], arriving
+    at time[j] and departing at departure_time[j].
+    """
+
+    COLUMNS = ["id", "time", "holding_time", "departure_time", "deadline", "src", "dst", "rate", "cos"]
+
+    def __init__(self, id: np.ndarray, time: np.ndarray, holding_time: np.ndarray, departure_time: np.ndarray,
+                 deadline: np.ndarray, src: np.ndarray, dst: np.ndarray, rate: np.ndarray, cos: np.ndarray):
+        self.id = id
+        self.time = time
+        self.holding_time = holding_time
+        self.departure_time = departure_time
+        self.deadline = deadline
+        self.src = src
+        self.dst = dst
+        self.rate = rate
+        self.cos = cos
+
+    def __len__(self) -> int:
+        return len(self.id)
+
+    @staticmethod
+    def concatenate(chunks: List["TrafficArrays"]) -> "TrafficArrays":
+        return TrafficArrays(*[np.concatenate([getattr(chunk, name) for chunk in chunks])
+                               for name in TrafficArrays.COLUMNS])
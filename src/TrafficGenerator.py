@@ -1,13 +1,16 @@
+import sys
 import xml.etree.ElementTree as ET
-from typing import List, Type
+from typing import Iterator, List, Tuple, Type
 
+import numpy as np
+
+from src.util.AliasTable import AliasTable
 from src.util.Distribution import Distribution
+from src.LoadProfile import LoadProfile
+from src.TrafficArrays import TrafficArrays
 from src.TrafficInfo import TrafficInfo
 from src.PhysicalTopology import PhysicalTopology
 from src.EventScheduler import EventScheduler
-from src.Flow import Flow
-from src.FlowArrivalEvent import FlowArrivalEvent
-from src.FlowDepartureEvent import FlowDepartureEvent
 
 
 class TrafficGenerator:
@@ -22,8 +25,13 @@ class TrafficGenerator:
         self.min_size = []
         self.max_size = []
 
-        assert "calls" in xml.attrib, "calls attribute is missing!"
-        self.calls = int(xml.attrib["calls"])
+        if "calls" in xml.attrib:
+            self.calls = int(xml.attrib["calls"])
+        else:
+            # A load profile with a duration may leave the number of calls open
+            profile = xml.find("profile")
+            assert profile is not None and "duration" in profile.attrib, "calls attribute is missing!"
+            self.calls = sys.maxsize
         self.load = int(forced_load)
 
         if self.load == 0:
@@ -34,9 +42,11 @@ class TrafficGenerator:
         self.max_rate = int(xml.attrib["max-rate"])
 
         if verbose:
-            print(f'{xml.attrib["calls"]} calls, {xml.attrib["load"]} erlangs.')
+            print(f'{xml.attrib.get("calls")} calls, {xml.attrib["load"]} erlangs.')
 
         call_list = []
+        matrix = None
+        self.profile = None
         for child in xml:
             if child.tag == "calls":
                 assert "rate" in child.attrib, "rate attribute is missing!"
@@ -44,6 +54,10 @@ class TrafficGenerator:
                 assert "weight" in child.attrib, "weight attribute is missing!"
                 assert "holding-time" in child.attrib, "holding-time attribute is missing!"
                 call_list.append(child.attrib)
+            elif child.tag == "matrix":
+                matrix = child
+            elif child.tag == "profile":
+                self.profile = LoadProfile(child)
             else:
                 raise Exception("Unknown element " + child.tag + " in the traffic generator file!")
         self.number_calls_type = len(call_list)
@@ -73,8 +87,112 @@ class TrafficGenerator:
                 print(f'Rate: {rate} Mbps.')
                 print(f'Mean holding time: {holding_time} seconds.')
 
+        # Traffic matrix: None keeps the uniform s-d pairs
+        self.pair_src = None
+        self.pair_dst = None
+        self.pair_table = None
+        self.class_prob = None
+        self.class_alias = None
+        if matrix is not None:
+            self.set_traffic_matrix(*TrafficGenerator.read_traffic_matrix(matrix))
+
+    @staticmethod
+    def read_traffic_matrix(xml: ET.Element) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Reads a <matrix> element, either inline <pair src dst weight [classes]>
+        children or a `file` attribute: a CSV of src,dst,weight[,class weights]
+        rows or an .npy array of N x N pair weights (N x N x C for per-class
+        weights). Returns src, dst, weight and the class weights of each pair
+        (an empty second dimension when no pair has a class mix).
+        """
+        rows = []
+        if "file" in xml.attrib:
+            file_name = xml.attrib["file"]
+            if file_name.endswith(".npy"):
+                weights = np.load(file_name)
+                assert weights.ndim in (2, 3) and weights.shape[0] == weights.shape[1], \
+                    "traffic matrix must be N x N or N x N x C!"
+                if weights.ndim == 2:
+                    src, dst = np.nonzero(weights)
+                    return src, dst, weights[src, dst].astype(np.float64), np.empty((len(src), 0))
+                classes = weights.reshape(-1, weights.shape[2]).astype(np.float64)
+                pair = np.flatnonzero(classes.sum(axis=1))
+                return (pair // weights.shape[0], pair % weights.shape[0], classes[pair].sum(axis=1),
+                        classes[pair])
+            with open(file_name) as f:
+                for line in f:
+                    line = line.strip()
+                    if line and not line.startswith("#"):
+                        rows.append([float(x) for x in line.split(",")])
+        else:
+            for child in xml:
+                if child.tag != "pair":
+                    raise Exception("Unknown element " + child.tag + " in the traffic matrix!")
+                assert "src" in child.attrib, "src attribute is missing!"
+                assert "dst" in child.attrib, "dst attribute is missing!"
+                assert "weight" in child.attrib, "weight attribute is missing!"
+                row = [float(child.attrib["src"]), float(child.attrib["dst"]), float(child.attrib["weight"])]
+                if "classes" in child.attrib:
+                    row += [float(x) for x in child.attrib["classes"].split(",")]
+                rows.append(row)
+
+        assert rows, "traffic matrix is empty!"
+        num_classes = max(len(row) for row in rows) - 3
+        # Pairs without a class mix get NaN weights, i.e. the <calls> weights
+        table = np.full((len(rows), 3 + num_classes), np.nan)
+        for i, row in enumerate(rows):
+            assert len(row) >= 3, "traffic matrix rows need src, dst and weight!"
+            table[i, :len(row)] = row
+        return table[:, 0].astype(np.int64), table[:, 1].astype(np.int64), table[:, 2], table[:, 3:]
+
+    def set_traffic_matrix(self, src: np.ndarray, dst: np.ndarray, weight: np.ndarray, classes: np.ndarray) -> None:
+        """
+        Builds the alias table over the s-d pairs and, when some pair has its
+        own class mix, one alias table per pair over the call types. The mean
+        rate and holding time are recomputed for the resulting class mix.
+        """
+        keep = (src != dst) & (weight > 0)
+        src, dst, weight, classes = src[keep], dst[keep], weight[keep], classes[keep]
+        assert len(src) > 0, "traffic matrix has no pair with positive weight!"
+        self.pair_src = src.astype(np.int64)
+        self.pair_dst = dst.astype(np.int64)
+        self.pair_table = AliasTable(weight)
+
+        if classes.shape[1] == 0:
+            return
+        assert classes.shape[1] == self.number_calls_type, \
+            "traffic matrix class weights must match the number of call types!"
+        default = np.array([info.get_weight() for info in self.calls_types_info], dtype=np.float64)
+        classes = np.where(np.isnan(classes).any(axis=1, keepdims=True), default, classes)
+        self.class_prob, self.class_alias = AliasTable.stack([AliasTable(mix) for mix in classes])
+
+        mix = (classes / classes.sum(axis=1, keepdims=True)) * (weight / weight.sum())[:, None]
+        mix = mix.sum(axis=0)
+        self.mean_rate = sum(mix[i] * info.get_rate() for i, info in enumerate(self.calls_types_info))
+        self.mean_holding_time = sum(mix[i] * info.get_holding_time() for i, info in enumerate(self.calls_types_info))
+
     def generate_traffic(self, pt: PhysicalTopology, events: EventScheduler, seed: int) -> None:
-        weight_vector = [int] * self.total_weight
+        """Hands the calls of this run to `events` as lazily generated columnar chunks"""
+        print("SELF.CALLS: ", self.calls)
+        events.add_arrivals(self.iter_traffic(pt.get_num_nodes(), seed))
+
+    def generate_traffic_arrays(self, num_nodes: int, seed: int) -> TrafficArrays:
+        """All calls of the run as one set of arrays"""
+        return TrafficArrays.concatenate(list(self.iter_traffic(num_nodes, seed)))
+
+    def iter_traffic(self, num_nodes: int, seed: int, chunk_size: int = 1 << 16) -> Iterator[TrafficArrays]:
+        """
+        Generates the calls in chunks of `chunk_size`. Each random stream is
+        drawn in batches, so the values are the same as drawing them one call
+        at a time: dist1 picks the call type, dist2 the s-d pair, dist3 the
+        inter-arrival time and dist4 the holding time. With a load profile the
+        arrivals are a time-varying Poisson process obtained by thinning: dist3
+        draws candidates at the peak rate and dist5 keeps each candidate with
+        probability multiplier(t) / peak. With a traffic matrix
+        dist2 (and dist1 for per-pair class mixes) is one next_double per call
+        looked up in an alias table.
+        """
+        weight_vector = np.empty(self.total_weight, dtype=np.int64)
         aux = 0
 
         for i in range(0, self.number_calls_type, 1):
@@ -82,14 +200,14 @@ class TrafficGenerator:
                 weight_vector[aux] = i
                 aux += 1
 
+        holding_times = np.array([info.get_holding_time() for info in self.calls_types_info], dtype=np.float64)
+        rates = np.array([info.get_rate() for info in self.calls_types_info], dtype=np.int64)
+        coses = np.array([info.get_cos() for info in self.calls_types_info], dtype=np.int64)
+
         mean_arrival_time = (self.mean_holding_time * (self.mean_rate * 1.0 / self.max_rate)) / self.load
 
-        type = 0
-        src = 0
-        dst = 0
         time = 0.0
         id = 0
-        num_nodes = pt.get_num_nodes()
         dist1 = Distribution(1, seed)
         dist2 = Distribution(2, seed)
         dist3 = Distribution(3, seed)
@@ -97,35 +215,120 @@ class TrafficGenerator:
 
         if "fileSizeValues" in self.xml.attrib:
             assert False, "Not implemented yet!"
+        if self.pair_table is not None:
+            assert max(self.pair_src.max(), self.pair_dst.max()) < num_nodes, \
+                "traffic matrix refers to a node outside the topology!"
 
-        print("SELF.CALLS: ", self.calls)
-        for j in range(0, self.calls, 1):
-            type = weight_vector[dist1.next_int(self.total_weight)]
-            # type = weight_vector[0]
-            src = dst = dist2.next_int(num_nodes)
-            # src = dst = 18
-            while src == dst:
-                dst = dist2.next_int(num_nodes)
-                # dst = 1
-            holding_time = 0.0
-            if "fileSizeValues" in self.xml.attrib:
-                file_size = 0.0
-                rate_in_gbps = self.oc_in_gigabits(self.calls_types_info[type].get_rate())
-                holding_time = ((file_size / rate_in_gbps) * 8)
-                # holding_time = 0.4190175227589326
+        profile = self.profile
+        if profile is not None:
+            dist5 = Distribution(5, seed)
+            peak = profile.get_max_multiplier()
+
+        while id < self.calls:
+            m = min(chunk_size, self.calls - id)
+
+            # Sequential running sum, as in `time += dist3.next_exponential(...)`
+            times = np.empty(m + 1, dtype=np.float64)
+            times[0] = time
+            if profile is None:
+                times[1:] = dist3.next_exponentials(mean_arrival_time, m)
+            else:
+                times[1:] = dist3.next_exponentials(mean_arrival_time / peak, m)
+            times = np.cumsum(times)
+            time = float(times[-1])
+
+            if profile is None:
+                arrival, following = times[:m], times[1:]
+            else:
+                keep = dist5.next_doubles(m) * peak < profile.get_multipliers(times[:m])
+                finished = times[m - 1] >= profile.get_duration()
+                if finished:
+                    keep &= times[:m] < profile.get_duration()
+                arrival, following = times[:m][keep], times[1:][keep]
+                m = len(arrival)
+                if m == 0:
+                    if finished:
+                        break
+                    continue
+
+            if self.pair_table is None:
+                type = weight_vector[dist1.next_ints(self.total_weight, m)]
+                src, dst = TrafficGenerator.draw_pairs(dist2, num_nodes, m)
             else:
-                holding_time = dist4.next_exponential(self.calls_types_info[type].get_holding_time())
-                # holding_time = 0.4190175227589326
-
-            new_flow = Flow(id, src, dst, time, self.calls_types_info[type].get_rate(), holding_time,
-                            self.calls_types_info[type].get_cos(), time + (holding_time * 0.5))
-            event = FlowArrivalEvent(time, new_flow)
-            time += dist3.next_exponential(mean_arrival_time)
-            # time += 0.09715752559779525
-            events.add_event(event)
-            event = FlowDepartureEvent(time + holding_time, id, new_flow)
-            events.add_event(event)
-            id += 1
+                pair = self.pair_table.samples(dist2.next_doubles(m))
+                src, dst = self.pair_src[pair], self.pair_dst[pair]
+                if self.class_prob is None:
+                    type = weight_vector[dist1.next_ints(self.total_weight, m)]
+                else:
+                    x = dist1.next_doubles(m) * self.number_calls_type
+                    column = np.minimum(x.astype(np.int64), self.number_calls_type - 1)
+                    type = np.where(x - column < self.class_prob[pair, column], column,
+                                    self.class_alias[pair, column])
+            holding_time = dist4.next_exponentials(holding_times[type], m)
+
+            yield TrafficArrays(np.arange(id, id + m, dtype=np.int64), arrival, holding_time,
+                                following + holding_time, arrival + (holding_time * 0.5), src, dst, rates[type],
+                                coses[type])
+            id += m
+            if profile is not None and finished:
+                break
+
+    @staticmethod
+    def draw_pairs(dist: Distribution, num_nodes: int, m: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Draws `m` (src, dst) pairs the way the scalar loop does: src is one
+        next_int(num_nodes) and dst is the next draw that differs from src.
+        Draws are made in one batch and then split into pairs; a pair only
+        deviates from "src at even offset, dst right after it" when a draw
+        repeats, so only those repeats are walked in Python.
+        """
+        state = dist.get_state()
+        size = 2 * m + m // 8 + 64
+        while True:
+            dist.set_state(state)
+            v = dist.next_ints(num_nodes, size)
+            # repeat[p]: v[p + 1] == v[p]; change: indices k with v[k] != v[k - 1]
+            repeat = np.flatnonzero(v[1:] == v[:-1])
+            repeats = [repeat[repeat % 2 == 0], repeat[repeat % 2 == 1]]
+            change = np.flatnonzero(v[1:] != v[:-1]) + 1
+
+            src_pos = []
+            dst_pos = []
+            count = 0
+            s = 0
+            while count < m:
+                candidates = repeats[s % 2]
+                k = np.searchsorted(candidates, s)
+                p = int(candidates[k]) if k < len(candidates) else size
+                take = min((p - s) // 2, m - count)
+                src_pos.append(np.arange(s, s + 2 * take, 2))
+                dst_pos.append(np.arange(s + 1, s + 2 * take + 1, 2))
+                count += take
+                s += 2 * take
+                if count == m or p >= size:
+                    break
+                # v[p] is repeated: dst is the first later draw that differs
+                k = np.searchsorted(change, p, side="right")
+                if k == len(change):
+                    break
+                src_pos.append(np.array([p]))
+                dst_pos.append(change[k:k + 1])
+                count += 1
+                s = int(change[k]) + 1
+
+            if count == m:
+                break
+            size *= 2
+
+        # Leave the stream right after the last draw that was used
+        dist.set_state(state)
+        dist.next_ints(num_nodes, s)
+        src_pos = np.concatenate(src_pos)
+        dst_pos = np.concatenate(dst_pos)
+        return v[src_pos], v[dst_pos]
+
+    def get_profile(self) -> LoadProfile:
+        return self.profile
 
     def get_calls_types_info(self) -> List[Type[TrafficInfo]]:
         return self.calls_types_info
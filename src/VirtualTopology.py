@@ -1,6 +1,6 @@
 import networkx as nx
 import xml.etree.ElementTree as ET
-from typing import List
+from typing import Dict, Iterable, List
 from src.LightPath import LightPath
 from src.PhysicalTopology import PhysicalTopology
 from src.Slot import Slot
@@ -9,6 +9,14 @@ from src.PCycle import PCycle
 
 
 class VirtualTopology:
+    """
+    Light paths and p-cycles established on the physical topology.
+
+    Both are indexed by id and by the links they use, so the light paths or
+    p-cycles on a link, or on a slot range of it, are found without walking
+    all of them. P-cycles leave the topology once their slots are released.
+    """
+
     def __init__(self, xml: ET.Element, pt: PhysicalTopology, verbose: bool = False):
         self.verbose = verbose
         self.next_lightpath_id = 0
@@ -17,7 +25,12 @@ class VirtualTopology:
 
         self.g_lightpath = nx.MultiDiGraph()
 
-        self.p_cycles: List[PCycle] = []
+        # Light paths and p-cycles by id, and by id on each of their links
+        self.light_paths: Dict[int, LightPath] = {}
+        self.link_light_paths: Dict[int, Dict[int, LightPath]] = {}
+        self.p_cycles: Dict[int, PCycle] = {}
+        self.link_p_cycles: Dict[int, Dict[int, PCycle]] = {}
+        self.next_p_cycle_id = 0
 
         num_nodes = self.pt.get_num_nodes()
         for i in range(num_nodes):
@@ -37,16 +50,47 @@ class VirtualTopology:
         id = self.next_lightpath_id
 
         lp = LightPath(id, src, dst, links, slot_list, modulation_level, p_cycle)
-        self.g_lightpath.add_edge(src, dst, lightpath=lp)
+        self.g_lightpath.add_edge(src, dst, key=id, lightpath=lp)
+        self.light_paths[id] = lp
+        for link in links:
+            self.link_light_paths.setdefault(link, {})[id] = lp
         self.tr.create_lightpath(lp)
         self.next_lightpath_id += 1
         return id
 
     def get_light_path(self, id: float) -> LightPath:
-        for src, dst, data in self.g_lightpath.edges(data=True):
-            if "lightpath" in data and data["lightpath"].get_id() == id:
-                return data["lightpath"]
-        return None
+        return self.light_paths.get(id)
+
+    def get_light_paths(self) -> List[LightPath]:
+        return list(self.light_paths.values())
+
+    def get_light_paths_on_link(self, link: int, first_slot: int = None, last_slot: int = None,
+                                core: int = None) -> List[LightPath]:
+        """Light paths using `link`, only those with a slot in [first_slot, last_slot] (of `core`) if given"""
+        light_paths = self.link_light_paths.get(link)
+        if not light_paths:
+            return []
+        if first_slot is None and core is None:
+            return list(light_paths.values())
+        return [lp for lp in light_paths.values()
+                if VirtualTopology.uses_slots(lp.get_slot_list(), first_slot, last_slot, core)]
+
+    def get_light_paths_on_links(self, links: Iterable[int]) -> List[LightPath]:
+        """Light paths using any of `links`, each one once"""
+        light_paths = {}
+        for link in links:
+            light_paths.update(self.link_light_paths.get(link, {}))
+        return list(light_paths.values())
+
+    @staticmethod
+    def uses_slots(slot_list: List[Slot], first_slot: int = None, last_slot: int = None, core: int = None) -> bool:
+        """Whether a slot of `slot_list` is in [first_slot, last_slot] (either end open if None) on `core`"""
+        for s in slot_list:
+            if core is not None and s.core != core:
+                continue
+            if (first_slot is None or s.slot >= first_slot) and (last_slot is None or s.slot <= last_slot):
+                return True
+        return False
 
     def can_create_light_path(self, links: List[int], slot_list: List[Slot]) -> bool:
         try:
@@ -67,19 +111,15 @@ class VirtualTopology:
         """Remove a light path by ID from the virtual topology."""
         if id < 0:
             raise ValueError("Invalid ID")
-        else:
-            # Find the light path in the graph
-            for src, dst, data in list(self.g_lightpath.edges(data=True)):  # Iterate over edges
-                if "lightpath" in data and data["lightpath"].get_id() == id:
-                    lp = data["lightpath"]
-                    self.remove_light_path_from_pt(lp.get_links(), lp.get_slot_list())  # Release slots
-                    self.g_lightpath.remove_edge(src, dst)  # Remove the edge from the graph
-                    # self.list_nodes.remove((src, dst))
-                    # self.light_path.pop(id, None)  # Remove from dictionary if it exists
-                    self.tr.remove_lightpath(lp)
-                    return True  # Successfully removed
-
-        return False  # Light path not found
+        lp = self.light_paths.pop(id, None)
+        if lp is None:
+            return False  # Light path not found
+        self.remove_light_path_from_pt(lp.get_links(), lp.get_slot_list())  # Release slots
+        self.g_lightpath.remove_edge(lp.get_source(), lp.get_destination(), key=id)
+        for link in lp.get_links():
+            self.link_light_paths[link].pop(id, None)
+        self.tr.remove_lightpath(lp)
+        return True
 
     def remove_light_path_from_pt(self, links: List[int], slot_list: List[Slot]) -> None:
         """Release the reserved slots in the physical topology."""
@@ -89,19 +129,54 @@ class VirtualTopology:
             self.pt.release_slots(src, dst, slot_list)
 
     def get_p_cycles(self) -> List[PCycle]:
-        return self.p_cycles
-    
+        return list(self.p_cycles.values())
+
+    def get_p_cycle(self, id: int) -> PCycle:
+        return self.p_cycles.get(id)
+
+    def get_p_cycles_on_link(self, link: int, first_slot: int = None, last_slot: int = None,
+                             core: int = None) -> List[PCycle]:
+        """P-cycles using `link`, only those with a slot in [first_slot, last_slot] (of `core`) if given"""
+        p_cycles = self.link_p_cycles.get(link)
+        if not p_cycles:
+            return []
+        if first_slot is None and core is None:
+            return list(p_cycles.values())
+        return [p_cycle for p_cycle in p_cycles.values()
+                if VirtualTopology.uses_slots(p_cycle.get_slot_list(), first_slot, last_slot, core)]
+
+    def get_p_cycles_on_links(self, links: Iterable[int]) -> List[PCycle]:
+        """P-cycles using any of `links`, each one once"""
+        p_cycles = {}
+        for link in links:
+            p_cycles.update(self.link_p_cycles.get(link, {}))
+        return list(p_cycles.values())
+
     def add_p_cycles(self, cycle: PCycle):
-        self.p_cycles.append(cycle)
+        cycle.set_id(self.next_p_cycle_id)
+        self.next_p_cycle_id += 1
+        self.p_cycles[cycle.get_id()] = cycle
+        for link in cycle.get_cycle_links():
+            self.link_p_cycles.setdefault(link, {})[cycle.get_id()] = cycle
+
+    def remove_p_cycle(self, cycle: PCycle) -> None:
+        if self.p_cycles.pop(cycle.get_id(), None) is None:
+            return
+        for link in cycle.get_cycle_links():
+            self.link_p_cycles[link].pop(cycle.get_id(), None)
 
     def remove_lp_p_cycle(self, lp: LightPath):
         p_cycle_protect = lp.get_p_cycle()
+        if p_cycle_protect is None:
+            return
         p_cycle_protect.remove_protected_lightpath(lp)
         if not p_cycle_protect.get_all_lp():
             for i in range(0, len(p_cycle_protect.get_cycle_links()), 1):
                 self.pt.release_slots(self.pt.get_src_link(p_cycle_protect.get_cycle_links()[i]),
                                       self.pt.get_dst_link(p_cycle_protect.get_cycle_links()[i]),
                                       p_cycle_protect.get_slot_list())
+            # Its slots are gone, nothing can be protected by it any more
+            self.remove_p_cycle(p_cycle_protect)
         list_protect = lp.get_list_be_protected()
         for lp in list_protect:
             lp.remove_be_protected_lightpath(lp)
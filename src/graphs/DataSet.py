@@ -1,75 +1,141 @@
-import math
-from typing import List
+import random
+from typing import Dict, List
+
+from src.graphs.Summary import Summary
 
 
 class DataSet:
-    def __init__(self, dimension: int):
-        self.dots = list()
+    """
+    Dots of a graph, kept as one streaming Summary per x-value (the first
+    value of every dot). Raw dots are only stored when a reservoir size is
+    given, in which case a uniform sample of at most that many dots is kept.
+    """
+
+    def __init__(self, dimension: int, reservoir_size: int = 0, seed: int = 0):
         self.dimension = dimension
+        self.summaries: Dict[float, Summary] = {}
+        self.number_of_dots = 0
+        self.reservoir_size = reservoir_size
+        self.dots = list()
+        self.random = random.Random(seed)
 
     def get_number_of_dots(self) -> int:
-        return len(self.dots)
+        return self.number_of_dots
 
     def get_dot_value(self, dot_index: int, value_index: int) -> float:
+        """Value of a sampled dot, only available when a reservoir is kept"""
         try:
             dot = self.dots[dot_index]
         except IndexError:
             return float('nan')
         return dot[value_index]
 
+    def get_x_values(self) -> List[float]:
+        return sorted(self.summaries.keys())
+
+    def get_summary(self, x: float) -> Summary:
+        return self.summaries.get(x)
+
     def dot_to_string(self) -> str:
-        mean = self.dots_mean()
-        confidence_interval = self.dots_confidence_interval()
-        dot_string = str(self.get_dot_value(0, 0))
-        for i in range(1, len(mean), 1):
-            dot_string += f"\t{mean[i]}\t{confidence_interval[i]:}"
-        return dot_string
+        lines = []
+        for x in self.get_x_values():
+            summary = self.summaries[x]
+            mean = summary.get_mean()
+            confidence_interval = summary.get_confidence_interval()
+            dot_string = str(x)
+            for i in range(1, len(mean), 1):
+                dot_string += f"\t{mean[i]}\t{confidence_interval[i]:}"
+            lines.append(dot_string)
+        return "\n".join(lines)
 
     def add_dot(self, *values: float):
         assert len(values) == self.dimension, "Invalid dimension"
-        self.dots.append(list(values))
+        summary = self.summaries.get(values[0])
+        if summary is None:
+            summary = Summary(self.dimension)
+            self.summaries[values[0]] = summary
+        summary.add(values)
+        self.number_of_dots += 1
+        if self.reservoir_size > 0:
+            self.sample_dot(list(values))
+
+    def add_summary(self, x: float, summary: Summary) -> None:
+        """Merges a pre-aggregated batch of dots sharing the x-value `x`"""
+        assert summary.dimension == self.dimension, "Invalid dimension"
+        if x not in self.summaries:
+            self.summaries[x] = Summary(self.dimension)
+        self.summaries[x].merge(summary)
+        self.number_of_dots += summary.get_count()
+
+    def sample_dot(self, dot: List[float]) -> None:
+        """Reservoir sampling (algorithm R) over every dot added so far"""
+        if len(self.dots) < self.reservoir_size:
+            self.dots.append(dot)
+        else:
+            index = self.random.randrange(self.number_of_dots)
+            if index < self.reservoir_size:
+                self.dots[index] = dot
+
+    def merge(self, other: "DataSet") -> None:
+        """Combines the dots of another replica or process into this data set"""
+        assert other.dimension == self.dimension, "Invalid dimension"
+        own_dots = self.number_of_dots
+        for x, summary in other.summaries.items():
+            if x not in self.summaries:
+                self.summaries[x] = Summary(self.dimension)
+            self.summaries[x].merge(summary)
+        self.number_of_dots += other.number_of_dots
+
+        if self.reservoir_size > 0 and other.dots:
+            # Draw from both samples in proportion to the dots they stand for
+            mine = list(self.dots)
+            theirs = list(other.dots)
+            weight_mine = own_dots
+            weight_theirs = other.number_of_dots
+            merged = []
+            while len(merged) < self.reservoir_size and (mine or theirs):
+                if theirs and (not mine or self.random.random() * (weight_mine + weight_theirs) >= weight_mine):
+                    merged.append(theirs.pop(self.random.randrange(len(theirs))))
+                    weight_theirs -= 1
+                else:
+                    merged.append(mine.pop(self.random.randrange(len(mine))))
+                    weight_mine -= 1
+            self.dots = merged
+
+    def total_summary(self) -> Summary:
+        total = Summary(self.dimension)
+        for summary in self.summaries.values():
+            total.merge(summary)
+        return total
 
     def dots_sum(self) -> List[float]:
-        sum = [0.0] * self.dimension
-        for dot in self.dots:
-            for i in range(0, self.dimension, 1):
-                if dot[i] is not float('nan'):
-                    sum[i] += dot[i]
-        return sum
+        return self.total_summary().get_sum()
 
     def dots_square_sum(self) -> List[float]:
-        sum2 = [0.0] * self.dimension
-        for dot in self.dots:
-            for i in range(0, self.dimension, 1):
-                if dot[i] is not float('nan'):
-                    sum2[i] += dot[i] * dot[i]
-        return sum2
+        return self.total_summary().get_square_sum()
 
     def dots_mean(self) -> List[float]:
-        mean = self.dots_sum()
-        for i in range(0, len(mean), 1):
-            if len(self.dots) == 0:
-                mean[i] = float('nan')
-            else:
-                mean[i] = mean[i] / len(self.dots)
-        return mean
+        return self.total_summary().get_mean()
 
     def dots_standard_deviation(self) -> List[float]:
-        n = len(self.dots)
-        mean = self.dots_mean()
-        sum2 = self.dots_square_sum()
-        std_var = [0.0] * self.dimension
-        for i in range(0, self.dimension, 1):
-            std_var[i] = math.sqrt((sum2[i] - n * (mean[i] * mean[i])) / (n - 1))
-        return std_var
+        return self.total_summary().get_standard_deviation()
 
     def dots_confidence_interval(self) -> List[float]:
-        n = len(self.dots)
-        std_var = self.dots_standard_deviation()
-        confidence_interval = [0.0] * self.dimension
-        for i in range(0, len(confidence_interval), 1):
-            if n <= 0:
-                confidence_interval[i] = float('nan')
-            else:
-                confidence_interval[i] = 1.96 * (std_var[i] / math.sqrt(n - 1))
-        return confidence_interval
+        return self.total_summary().get_confidence_interval()
+
+    def to_dict(self) -> dict:
+        return {
+            "dimension": self.dimension,
+            "number_of_dots": self.number_of_dots,
+            "summaries": [[x, summary.to_dict()] for x, summary in self.summaries.items()],
+            "dots": list(self.dots),
+        }
+
+    @staticmethod
+    def from_dict(data: dict, reservoir_size: int = 0) -> "DataSet":
+        data_set = DataSet(data["dimension"], reservoir_size)
+        for x, summary in data["summaries"]:
+            data_set.summaries[x] = Summary.from_dict(summary)
+        data_set.number_of_dots = data["number_of_dots"]
+        data_set.dots = list(data["dots"])[:reservoir_size]
+        return data_set
@@ -2,10 +2,10 @@ from src.graphs.DataSet import DataSet
 
 
 class Graph:
-    def __init__(self, name: str, dots_file_name: str, data_set_dimension: int):
+    def __init__(self, name: str, dots_file_name: str, data_set_dimension: int, reservoir_size: int = 0):
         self.name = name
         self.dots_file_name = dots_file_name
-        self.data_set = DataSet(data_set_dimension)
+        self.data_set = DataSet(data_set_dimension, reservoir_size)
 
     def get_name(self) -> str:
         return self.name
@@ -13,6 +13,10 @@ class Graph:
     def get_data_set(self) -> DataSet:
         return self.data_set
 
+    def merge(self, other: "Graph") -> None:
+        assert other.get_name() == self.name, "Cannot merge different graphs"
+        self.data_set.merge(other.get_data_set())
+
     def write_dots_to_file(self):
         try:
             with open(self.dots_file_name, 'w') as f:
@@ -0,0 +1,96 @@
+import math
+from typing import List
+
+
+class Summary:
+    """
+    Streaming summary of the dots that share one x-value.
+
+    Keeps the number of dots, and a count, a running mean and the sum of
+    squared deviations (Welford) for every dimension, whose counts leave out
+    the NaN values, so a data set no longer has to store the dots
+    themselves. Two summaries can be merged exactly, which lets replicas and
+    worker processes be combined afterwards.
+    """
+
+    def __init__(self, dimension: int):
+        self.dimension = dimension
+        self.dots = 0
+        self.count = [0] * dimension
+        self.mean = [0.0] * dimension
+        self.m2 = [0.0] * dimension
+
+    @staticmethod
+    def from_moments(dots: int, count: List[int], mean: List[float], m2: List[float]) -> "Summary":
+        assert len(count) == len(mean) == len(m2), "Invalid dimension"
+        summary = Summary(len(count))
+        summary.dots = dots
+        summary.count = list(count)
+        summary.mean = list(mean)
+        summary.m2 = list(m2)
+        return summary
+
+    def add(self, values) -> None:
+        self.dots += 1
+        for i in range(0, self.dimension, 1):
+            value = values[i]
+            if math.isnan(value):
+                continue
+            self.count[i] += 1
+            delta = value - self.mean[i]
+            self.mean[i] += delta / self.count[i]
+            self.m2[i] += delta * (value - self.mean[i])
+
+    def merge(self, other: "Summary") -> None:
+        """Chan et al. parallel combination of two Welford summaries"""
+        assert other.dimension == self.dimension, "Invalid dimension"
+        self.dots += other.dots
+        for i in range(0, self.dimension, 1):
+            n_a = self.count[i]
+            n_b = other.count[i]
+            if n_b == 0:
+                continue
+            if n_a == 0:
+                self.count[i] = n_b
+                self.mean[i] = other.mean[i]
+                self.m2[i] = other.m2[i]
+                continue
+            n = n_a + n_b
+            delta = other.mean[i] - self.mean[i]
+            self.mean[i] += delta * n_b / n
+            self.m2[i] += other.m2[i] + delta * delta * n_a * n_b / n
+            self.count[i] = n
+
+    def get_count(self) -> int:
+        return self.dots
+
+    def get_sum(self) -> List[float]:
+        return [self.mean[i] * self.count[i] for i in range(0, self.dimension, 1)]
+
+    def get_square_sum(self) -> List[float]:
+        return [self.m2[i] + self.count[i] * self.mean[i] * self.mean[i] for i in range(0, self.dimension, 1)]
+
+    def get_mean(self) -> List[float]:
+        return [self.mean[i] if self.count[i] > 0 else float('nan') for i in range(0, self.dimension, 1)]
+
+    def get_standard_deviation(self) -> List[float]:
+        std_var = [float('nan')] * self.dimension
+        for i in range(0, self.dimension, 1):
+            if self.count[i] > 1:
+                std_var[i] = math.sqrt(max(self.m2[i], 0.0) / (self.count[i] - 1))
+        return std_var
+
+    def get_confidence_interval(self) -> List[float]:
+        std_var = self.get_standard_deviation()
+        confidence_interval = [float('nan')] * self.dimension
+        for i in range(0, self.dimension, 1):
+            if self.count[i] > 1:
+                confidence_interval[i] = 1.96 * (std_var[i] / math.sqrt(self.count[i] - 1))
+        return confidence_interval
+
+    def to_dict(self) -> dict:
+        return {"dots": self.dots, "count": list(self.count), "mean": list(self.mean), "m2": list(self.m2)}
+
+    @staticmethod
+    def from_dict(data: dict) -> "Summary":
+        return Summary.from_moments(data["dots"], data["count"], data["mean"], data["m2"])
@@ -1,4 +1,5 @@
 from .DataSet import DataSet
 from .Graph import Graph
+from .Summary import Summary
 
-__all__ = ['DataSet', 'Graph']
\ No newline at end of file
+__all__ = ['DataSet', 'Graph', 'Summary']
\ No newline at end of file
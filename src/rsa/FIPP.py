@@ -1,8 +1,5 @@
 import xml.etree.ElementTree as ET
 from typing import List, Dict, Optional, Tuple
-import math
-import networkx as nx
-from itertools import islice
 
 from src.rsa.RSA import RSA
 from src.util.ConnectedComponent import ConnectedComponent
@@ -14,6 +11,10 @@ from src.Flow import Flow
 from src.Slot import Slot
 from src.PCycle import PCycle
 from src.ProtectingLightPath import ProtectingLightPath
+from src.PathCache import PathCache
+from src.SpectrumCache import SpectrumCache
+from src.PathOrdering import PathOrdering
+from src.CSRGraph import CSRGraph
 
 
 class FIPP(RSA):
@@ -22,6 +23,11 @@ class FIPP(RSA):
         self.vt = None
         self.cp = None
         self.graph = None
+        self.paths = None
+        self.spectrum_cache = None
+        self.ordering = None
+        self.backup_graph = None
+        self.backup_graph_epoch = None
 
     def simulation_interface(self, xml: ET.Element, pt: PhysicalTopology, vt: VirtualTopology, cp: ControlPlaneForRSA,
                              traffic: TrafficGenerator):
@@ -29,56 +35,74 @@ class FIPP(RSA):
         self.vt = vt
         self.cp = cp
         self.graph = pt.get_weighted_graph()
-
-    def find_working_path(self, flow: Flow, demand_in_slots: int):
+        rates = [info.get_rate() for info in traffic.get_calls_types_info()]
+        self.paths = PathCache(pt, self.graph, 5, "weight", xml.attrib.get("modulation", PathCache.FIXED), rates)
+        self.spectrum_cache = SpectrumCache(pt, int(xml.attrib.get("spectrum-cache", "1024")))
+        if xml.attrib.get("path-ordering", "fixed") == "bottleneck":
+            self.ordering = PathOrdering(pt, self.paths)
+        self.set_budget(xml)
+
+    def find_working_path(self, flow: Flow):
         """
         Find a working path for the flow
         :param flow: Flow object
-        :return: working path
+        :return: working path, its links, modulation and demand in slots, spectrum and fitted slots
         """
-        k_paths = list(islice(nx.shortest_simple_paths(self.graph, flow.get_source(), flow.get_destination(), weight="weight"), 5))
-
-        spectrum = [[True for _ in range(self.pt.get_num_slots())] for _ in range(self.pt.get_cores())]
-        sharing_spectrum = [[True for _ in range(self.pt.get_num_slots())] for _ in range(self.pt.get_cores())]
+        k_paths = self.paths.get_paths(flow.get_source(), flow.get_destination())
+        k_links = self.paths.get_links(flow.get_source(), flow.get_destination())
+        demands = self.paths.get_demands(flow.get_source(), flow.get_destination(), flow.get_rate())
 
+        spectrum = None
         primary_path = None
-        regions = {}
+        links = None
+        modulation, demand_in_slots = 0, 0
         fitted_slot_list = []
-        for k in range(0, len(k_paths), 1):
-            for i in range(0, len(k_paths[k]) - 1, 1):
-                spectrum = self.image_and(self.pt.get_spectrum(k_paths[k][i], k_paths[k][i + 1]),
-                                          spectrum, spectrum)
-
-            cc = ConnectedComponent()
-            list_of_regions = cc.list_of_regions(spectrum)
+        order = range(0, len(k_paths), 1)
+        if self.ordering is not None:
+            order = self.ordering.get_order(flow.get_source(), flow.get_destination())
+
+        evaluated = 0
+        # Each candidate is checked against the spectrum of the ones before it too: the AND of their
+        # spectra is the spectrum of all their links, which the cache keeps like that of a path
+        tried_links = []
+        for k in order:
+            # Out of budget: give up on the remaining candidates once one was tried
+            if evaluated and self.over_budget():
+                break
+            modulation, demand_in_slots = demands[k]
+            tried_links.extend(link for link in k_links[k] if link not in tried_links)
+            # No free-slot pre-check as in ImageRCSA: list_of_regions also lists occupied components, which
+            # can_fit_connection may pick on a path without enough free slots, and FIPP commits to that path
+            # Recomputed only when one of the links changed
+            spectrum, list_of_regions = self.spectrum_cache.get(tried_links)
+            evaluated += 1
 
             if list_of_regions == {}:
                 continue
             fitted_slot_list = self.can_fit_connection(list_of_regions, demand_in_slots)
             if list_of_regions and fitted_slot_list:
                 primary_path = k_paths[k]
+                links = k_links[k]
                 for s in fitted_slot_list:
                     spectrum[s.core][s.slot] = False
                 break
-        return primary_path, spectrum, fitted_slot_list
+        self.paths.add_candidates_evaluated(evaluated)
+        return primary_path, links, modulation, demand_in_slots, spectrum, fitted_slot_list
 
     def flow_arrival(self, flow: Flow) -> None:
-
-        demand_in_slots = math.ceil(flow.get_rate() / self.pt.get_slot_capacity())
-
+        self.start_arrival()
         # find working path
-        primary_path, spectrum, fitted_slot_list = self.find_working_path(flow, demand_in_slots)
+        primary_path, links, modulation, demand_in_slots, spectrum, fitted_slot_list = self.find_working_path(flow)
         if not primary_path:
             self.cp.block_flow(flow.get_id())
+            self.last_outcome = RSA.BLOCKED
             return
+        flow.set_modulation_level(modulation)
 
         cc = ConnectedComponent()
         list_of_regions = cc.list_of_regions(spectrum)
 
         # find protecting path
-        links = [0 for _ in range(len(primary_path) - 1)]
-        for j in range(0, len(primary_path) - 1, 1):
-            links[j] = self.pt.get_link_id(primary_path[j], primary_path[j + 1])
 
         p_cycles = self.vt.get_p_cycles()
         if primary_path:
@@ -100,7 +124,8 @@ class FIPP(RSA):
                     for i in range(1, len(p_cycles_can_protect)):
                         p_cycles_can_protect[i].add_lp_to_be_protected(protected_lp)
                     self.vt.get_light_path(lp_id).set_list_be_protected(p_cycles_can_protect)
-            elif p_cycles_not_enough_slots and p_cycles_can_protect == []:
+                    self.last_outcome = RSA.EXISTING_P_CYCLE
+            elif p_cycles_not_enough_slots and p_cycles_can_protect == [] and not self.over_budget():
                 for p_cycle in p_cycles_not_enough_slots:
                     cycles_links = p_cycle.get_cycle_links()
                     graph_copy = self.pt.get_graph().copy()
@@ -122,25 +147,28 @@ class FIPP(RSA):
                                 p_cycle.set_reversed_slots(demand_in_slots)
                                 for i in range(1, len(p_cycles_can_protect)):
                                     p_cycles_can_protect[i].add_lp_to_be_protected(protected_lp)
+                                self.last_outcome = RSA.EXISTING_P_CYCLE
                             return
                         else:
                             self.pt.set_graph(graph_copy)
             else:
-                # remove links on path s1 and remove links that connect with the nodes on path s1
-                g_backup = self.remove_edges(primary_path)
-                if nx.has_path(g_backup, flow.get_source(), flow.get_destination()):
-                    k_paths_protection = list(islice(nx.shortest_simple_paths(g_backup, flow.get_source(), flow.get_destination(), weight="weight"), 5))
-                    if k_paths_protection:
-                        for i in range(len (k_paths_protection)):
-                            res_p_cycle, p_cycle = self.create_p_cycle_from_paths(primary_path, k_paths_protection[i], demand_in_slots, spectrum)
-                            res_connect, lp_id = self.fit_connection(links=links, flow=flow, fitted_slot_list=fitted_slot_list, p_cycle=p_cycle)
-                            if res_p_cycle & res_connect:
-                                protected_lp = ProtectingLightPath(id=lp_id, src=primary_path[0], dst=primary_path[-1], links_id=links, fss=demand_in_slots)
-                                p_cycle.set_slot_list(fitted_slot_list)
-                                p_cycle.add_protected_lightpath(protected_lp)
-                                return
+                # backup paths avoid the links of path s1 and the nodes inside it
+                # Out of budget: growing existing p-cycles is skipped and a single backup path is tried
+                k_backup = 1 if self.over_budget() else 5
+                k_paths_protection = self.find_backup_paths(primary_path, k_backup)
+                if k_paths_protection:
+                    for i in range(len (k_paths_protection)):
+                        res_p_cycle, p_cycle = self.create_p_cycle_from_paths(primary_path, k_paths_protection[i], demand_in_slots, spectrum)
+                        res_connect, lp_id = self.fit_connection(links=links, flow=flow, fitted_slot_list=fitted_slot_list, p_cycle=p_cycle)
+                        if res_p_cycle & res_connect:
+                            protected_lp = ProtectingLightPath(id=lp_id, src=primary_path[0], dst=primary_path[-1], links_id=links, fss=demand_in_slots)
+                            p_cycle.set_slot_list(fitted_slot_list)
+                            p_cycle.add_protected_lightpath(protected_lp)
+                            self.last_outcome = RSA.NEW_P_CYCLE
+                            return
 
-        self.cp.block_flow(flow.get_id())
+        if self.cp.block_flow(flow.get_id()):
+            self.last_outcome = RSA.BLOCKED
         return
 
     def can_fit_connection(self, list_of_regions: Dict[int, List[Slot]], demand_in_slots: int) -> List[Slot]:
@@ -154,13 +182,13 @@ class FIPP(RSA):
         return fitted_slot_list
 
     def fit_connection(self, links: List[int], flow: Flow, fitted_slot_list: List[Slot], p_cycle: PCycle) -> Tuple[bool, Optional[int]]:
-        success, lp_id = self.establish_connection(links, fitted_slot_list, 0, flow, p_cycle)
+        success, lp_id = self.establish_connection(links, fitted_slot_list, flow.get_modulation_level(), flow, p_cycle)
         if success:
             return True, lp_id
         return False, None
 
     def establish_connection(self, links: List[int], slot_list: List[Slot], modulation: int, flow: Flow, p_cycle: PCycle) -> Tuple[bool, Optional[int]]:
-        id = self.vt.create_light_path(links, slot_list, 0, p_cycle)
+        id = self.vt.create_light_path(links, slot_list, modulation, p_cycle)
         if id >= 0:
             lps = self.vt.get_light_path(id)
             flow.set_links(links)
@@ -176,6 +204,12 @@ class FIPP(RSA):
                 res[i][j] = image1[i][j] and image2[i][j]
         return res
 
+    def get_path_cache(self) -> PathCache:
+        return self.paths
+
+    def get_spectrum_cache(self) -> SpectrumCache:
+        return self.spectrum_cache
+
     def flow_departure(self, flow):
         pass
 
@@ -191,15 +225,6 @@ class FIPP(RSA):
         p_cycle_edges = set(zip(primary_path, primary_path[1:])) | set(zip(backup_path, backup_path[1:]))
         p_cycle_nodes = list(set(primary_path) | set(backup_path))
 
-        for i in range(0, len(primary_path) - 1, 1):
-            spectrum = self.image_and(self.pt.get_spectrum(primary_path[i], primary_path[i + 1]),
-                                                spectrum, spectrum)
-
-        for i in range(0, len(backup_path) - 1, 1):
-            spectrum = self.image_and(self.pt.get_spectrum(backup_path[i], backup_path[i + 1]),
-                                                spectrum, spectrum)
-        cc = ConnectedComponent()
-        list_of_regions = cc.list_of_regions(spectrum)
         fitted_slot_list = []
         total_links = (len(primary_path) - 1) + (len(backup_path) - 1)
         links = [0] * total_links
@@ -213,6 +238,11 @@ class FIPP(RSA):
         for j in range(len(backup_path) - 1):
             links[offset + j] = self.pt.get_link_id(backup_path[j], backup_path[j + 1])
 
+        spectrum = self.image_and(self.spectrum_cache.lookup(links[:offset])[0], spectrum, spectrum)
+        spectrum = self.image_and(self.spectrum_cache.lookup(links[offset:])[0], spectrum, spectrum)
+        cc = ConnectedComponent()
+        list_of_regions = cc.list_of_regions(spectrum)
+
         for key, region in list_of_regions.items():
             if len(region) >= demand_in_slots:
                 for i in range(demand_in_slots):
@@ -226,14 +256,23 @@ class FIPP(RSA):
             return True, new_p_cycle
         return False, None
 
-    def remove_edges(self, path):
-        G_modified = self.pt.get_graph().copy()
-        sp1_edges = [(path[i], path[i + 1]) for i in range(len(path) - 1)]
-        G_modified.remove_edges_from(sp1_edges)
-
-        inner_nodes = set(path[1:-1])
-        remove_edges = [(u, v) for u, v in G_modified.edges if u in inner_nodes or v in inner_nodes]
-        G_modified.remove_edges_from(remove_edges)
-        return G_modified
-
+    def get_backup_graph(self) -> CSRGraph:
+        """CSR copy of the physical topology, rebuilt only when the graph was replaced"""
+        if self.backup_graph_epoch != self.pt.get_epoch():
+            self.backup_graph = CSRGraph(self.pt.get_graph(), "weight")
+            self.backup_graph_epoch = self.pt.get_epoch()
+        return self.backup_graph
 
+    def find_backup_paths(self, path: List[int], k: int) -> List[List[int]]:
+        """
+        The k shortest paths between the ends of `path` that use neither its links nor its inner nodes
+        :param path: working path
+        :param k: number of backup paths
+        :return: backup paths, shortest first
+        """
+        graph = self.get_backup_graph()
+        excluded_nodes = graph.node_indices(path[1:-1])
+        excluded_edges = graph.edge_positions(zip(path, path[1:]))
+        if not graph.has_path(path[0], path[-1], excluded_nodes, excluded_edges):
+            return []
+        return graph.k_shortest_paths(path[0], path[-1], k, excluded_nodes, excluded_edges)
@@ -1,17 +1,16 @@
 import xml.etree.ElementTree as ET
 from typing import List, Dict
-import math
-import networkx as nx
-from itertools import islice
 
 from src.rsa.RSA import RSA
-from src.util.ConnectedComponent import ConnectedComponent
 from src.PhysicalTopology import PhysicalTopology
 from src.VirtualTopology import VirtualTopology
 from src.ControlPlaneForRSA import ControlPlaneForRSA
 from src.TrafficGenerator import TrafficGenerator
 from src.Flow import Flow
 from src.Slot import Slot
+from src.PathCache import PathCache
+from src.SpectrumCache import SpectrumCache
+from src.PathOrdering import PathOrdering
 
 
 class ImageRCSA(RSA):
@@ -20,6 +19,9 @@ class ImageRCSA(RSA):
         self.vt = None
         self.cp = None
         self.graph = None
+        self.paths = None
+        self.spectrum_cache = None
+        self.ordering = None
 
     def simulation_interface(self, xml: ET.Element, pt: PhysicalTopology, vt: VirtualTopology, cp: ControlPlaneForRSA,
                              traffic: TrafficGenerator):
@@ -27,55 +29,66 @@ class ImageRCSA(RSA):
         self.vt = vt
         self.cp = cp
         self.graph = pt.get_weighted_graph()
+        rates = [info.get_rate() for info in traffic.get_calls_types_info()]
+        self.paths = PathCache(pt, self.graph, 5, None, xml.attrib.get("modulation", PathCache.FIXED), rates)
+        self.spectrum_cache = SpectrumCache(pt, int(xml.attrib.get("spectrum-cache", "1024")))
+        if xml.attrib.get("path-ordering", "fixed") == "bottleneck":
+            self.ordering = PathOrdering(pt, self.paths)
+        self.set_budget(xml)
 
     def flow_arrival(self, flow: Flow) -> None:
-        demand_in_slots = math.ceil(flow.get_rate() / self.pt.get_slot_capacity())
-        # print("flow", flow)
-        # k_path = nx.shortest_path(self.graph, flow.get_source(), flow.get_destination())
-        # print("k_path: ", k_path)
-        k_paths = list(islice(nx.shortest_simple_paths(self.graph, flow.get_source(), flow.get_destination()), 5))
-        # print("k_paths: ", k_paths)
-        # # k_paths = KShortestPaths().dijkstra_k_shortest_paths(self.graph, flow.get_source(), flow.get_destination(), 5)
-        spectrum = [[True for _ in range(self.pt.get_num_slots())] for _ in range(self.pt.get_cores())]
+        self.start_arrival()
+        # Hop-count k shortest paths and their (modulation, slots) demand, computed once per pair
+        k_paths = self.paths.get_paths(flow.get_source(), flow.get_destination())
+        k_links = self.paths.get_links(flow.get_source(), flow.get_destination())
+        demands = self.paths.get_demands(flow.get_source(), flow.get_destination(), flow.get_rate())
 
-        for k in range(0, len(k_paths), 1):
-            for i in range(0, len(spectrum), 1):
-                for j in range(0, len(spectrum[i]), 1):
-                    spectrum[i][j] = True
-            for i in range(0, len(k_paths[k]) - 1, 1):
-                spectrum = self.image_and(self.pt.get_spectrum(k_paths[k][i], k_paths[k][i + 1]),
-                                          spectrum, spectrum)
+        order = range(0, len(k_paths), 1)
+        if self.ordering is not None:
+            order = self.ordering.get_order(flow.get_source(), flow.get_destination())
 
-            cc = ConnectedComponent()
-            list_of_regions = cc.list_of_regions(spectrum)
+        evaluated = 0
+        for k in order:
+            # Out of budget: give up on the remaining candidates once one was tried
+            if evaluated and self.over_budget():
+                break
+            modulation, demand_in_slots = demands[k]
+            # No region can be larger than the free slots of the fullest link
+            if self.pt.get_min_free_slots(k_links[k]) < demand_in_slots:
+                continue
+            # Free regions of the path, recomputed only when one of its links changed
+            list_of_regions = self.spectrum_cache.get_regions(k_links[k])
+            evaluated += 1
 
             if list_of_regions == {}:
                 continue
 
-            links = [0 for _ in range(len(k_paths[k]) - 1)]
-            for j in range(0, len(k_paths[k]) - 1, 1):
-                links[j] = self.pt.get_link_id(k_paths[k][j], k_paths[k][j + 1])
-            if self.fit_connection(list_of_regions, demand_in_slots, links, flow):
+            if self.fit_connection(list_of_regions, demand_in_slots, k_links[k], flow, modulation):
+                self.paths.add_candidates_evaluated(evaluated)
+                self.last_outcome = RSA.ACCEPTED
                 return
+        self.paths.add_candidates_evaluated(evaluated)
         self.cp.block_flow(flow.get_id())
+        self.last_outcome = RSA.BLOCKED
         return
 
     def fit_connection(self, list_of_regions: Dict[int, List[Slot]], demand_in_slots: int, links: List[int],
-                       flow: Flow) -> bool:
+                       flow: Flow, modulation: int = 0) -> bool:
         fitted_slot_list = []
         for key, region in list_of_regions.items():
             if len(region) >= demand_in_slots:
                 for i in range(demand_in_slots):
                     fitted_slot_list.append(region[i])
-                if self.establish_connection(links, fitted_slot_list, 0, flow):
+                if self.establish_connection(links, fitted_slot_list, modulation, flow):
                     return True
         return False
 
     def establish_connection(self, links: List[int], slot_list: List[Slot], modulation: int, flow: Flow):
-        id = self.vt.create_light_path(links, slot_list, 0)
+        id = self.vt.create_light_path(links, slot_list, modulation, None)
         if id >= 0:
             lps = self.vt.get_light_path(id)
             flow.set_links(links)
+            flow.set_modulation_level(modulation)
             flow.set_slot_list(slot_list)
             self.cp.accept_flow(flow.get_id(), lps)
             return True
@@ -88,5 +101,11 @@ class ImageRCSA(RSA):
                 res[i][j] = image1[i][j] and image2[i][j]
         return res
 
+    def get_path_cache(self) -> PathCache:
+        return self.paths
+
+    def get_spectrum_cache(self) -> SpectrumCache:
+        return self.spectrum_cache
+
     def flow_departure(self, flow):
         pass
\ No newline at end of file
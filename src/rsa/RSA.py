@@ -1,3 +1,4 @@
+import time
 from xml.etree.ElementTree import Element
 from abc import ABC, abstractmethod
 
@@ -8,6 +9,19 @@ from src.TrafficGenerator import TrafficGenerator
 
 
 class RSA(ABC):
+    # Outcomes of an arrival, left in last_outcome by flow_arrival
+    ACCEPTED = "accepted"
+    EXISTING_P_CYCLE = "existing-p-cycle"
+    NEW_P_CYCLE = "new-p-cycle"
+    BLOCKED = "blocked"
+    OUTCOMES = [ACCEPTED, EXISTING_P_CYCLE, NEW_P_CYCLE, BLOCKED]
+
+    last_outcome = None
+    # Per-arrival compute budget in nanoseconds, 0 for none
+    budget = 0
+    deadline = 0
+    over_budget_arrivals = 0
+    fell_back = False
 
     @abstractmethod
     def simulation_interface(self, xml: Element, pt: PhysicalTopology, vt: VirtualTopology, cp: ControlPlaneForRSA,
@@ -21,3 +35,28 @@ class RSA(ABC):
     @abstractmethod
     def flow_departure(self, flow) -> None:
         pass
+
+    def get_last_outcome(self) -> str:
+        return self.last_outcome
+
+    def set_budget(self, xml: Element) -> None:
+        """Reads the optional budget-ms attribute of the rsa element"""
+        self.budget = int(float(xml.attrib.get("budget-ms", "0")) * 1e6)
+
+    def start_arrival(self) -> None:
+        self.last_outcome = None
+        self.fell_back = False
+        if self.budget:
+            self.deadline = time.perf_counter_ns() + self.budget
+
+    def over_budget(self) -> bool:
+        """True once the current arrival used up its budget; the RSA then falls back to its cheap policy"""
+        if not self.budget or time.perf_counter_ns() < self.deadline:
+            return False
+        if not self.fell_back:
+            self.fell_back = True
+            self.over_budget_arrivals += 1
+        return True
+
+    def get_over_budget_arrivals(self) -> int:
+        return self.over_budget_arrivals
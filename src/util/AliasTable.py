@@ -0,0 +1,56 @@
+from typing import List
+
+import numpy as np
+
+
+class AliasTable:
+    """
+    Walker's alias method (Vose's construction) for sampling an index with
+    probability proportional to `weights` in O(1) per draw and without any
+    rejection loop. One uniform value in [0, 1) picks a column and decides
+    between the column and its alias.
+    """
+
+    def __init__(self, weights: List[float]):
+        weights = np.asarray(weights, dtype=np.float64)
+        assert weights.ndim == 1 and len(weights) > 0, "Alias table needs a non-empty weight vector"
+        assert np.all(weights >= 0) and weights.sum() > 0, "Alias table weights must be non-negative"
+        n = len(weights)
+        scaled = weights * (n / weights.sum())
+        self.prob = np.ones(n, dtype=np.float64)
+        self.alias = np.arange(n, dtype=np.int64)
+
+        small = [i for i in range(n) if scaled[i] < 1.0]
+        large = [i for i in range(n) if scaled[i] >= 1.0]
+        while small and large:
+            s = small.pop()
+            l = large.pop()
+            self.prob[s] = scaled[s]
+            self.alias[s] = l
+            scaled[l] = (scaled[l] + scaled[s]) - 1.0
+            if scaled[l] < 1.0:
+                small.append(l)
+            else:
+                large.append(l)
+        # Leftovers are 1 up to rounding errors
+        for i in small + large:
+            self.prob[i] = 1.0
+
+    def __len__(self) -> int:
+        return len(self.prob)
+
+    def sample(self, u: float) -> int:
+        x = u * len(self.prob)
+        i = min(int(x), len(self.prob) - 1)
+        return i if x - i < self.prob[i] else int(self.alias[i])
+
+    def samples(self, u: np.ndarray) -> np.ndarray:
+        """Vectorized `sample` for an array of uniform values"""
+        x = u * len(self.prob)
+        i = np.minimum(x.astype(np.int64), len(self.prob) - 1)
+        return np.where(x - i < self.prob[i], i, self.alias[i])
+
+    @staticmethod
+    def stack(tables: List["AliasTable"]):
+        """Rows of (prob, alias) for tables of equal size, to sample many tables at once"""
+        return np.stack([t.prob for t in tables]), np.stack([t.alias for t in tables])
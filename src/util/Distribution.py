@@ -1,30 +1,68 @@
 import math
 
+import numpy as np
+
 from src.util.JavaRandom import Random
 
 
 class Distribution(Random):
-    def __init__(self, seq_num=None, seed_num=None, seed=None):
+    """
+    Random stream number `seq_num` of replication `seed_num`.
+
+    Pairs covered by the original table (streams 1-4, replications 1-25)
+    start from the table seeds, so old results are reproduced. Every other
+    pair, or every pair when `substream` is set, gets its own substream of
+    the LCG: the state at SUBSTREAM_BASE + key * SUBSTREAM_SPACING draws from
+    state 0, reached by skip-ahead. Substreams never overlap as long as one
+    stream uses fewer than SUBSTREAM_SPACING draws, and they start far past
+    the table seeds (which are only 1.000.000 draws apart).
+    """
+
+    TABLE_STREAMS = 4
+    TABLE_REPLICATIONS = 25
+    SUBSTREAM_BASE = 1 << 47
+    SUBSTREAM_SPACING = 1 << 32
+    MAX_STREAMS = 8
+    MAX_REPLICATIONS = (1 << 47) // SUBSTREAM_SPACING // MAX_STREAMS
+
+    def __init__(self, seq_num=None, seed_num=None, seed=None, substream=False):
         super().__init__()
         # self.seed(seed)
-        if not (1 <= seq_num <= 4) or not (1 <= seed_num <= 25):
-            raise ValueError("seq_num must be between 1 and 4 and seed_num must be between 1 and 25")
+        if not (1 <= seq_num <= Distribution.MAX_STREAMS) or not (1 <= seed_num <= Distribution.MAX_REPLICATIONS):
+            raise ValueError(f"seq_num must be between 1 and {Distribution.MAX_STREAMS} and seed_num must be "
+                             f"between 1 and {Distribution.MAX_REPLICATIONS}")
 
         multiplier = 25214903917
-        seed = self.seeds[(seq_num - 1) * 25 + (seed_num - 1)]
+        if not substream and seq_num <= Distribution.TABLE_STREAMS and seed_num <= Distribution.TABLE_REPLICATIONS:
+            seed = self.seeds[(seq_num - 1) * 25 + (seed_num - 1)]
+        else:
+            seed = Distribution.substream_state(seed_num, seq_num)
+        # The seed setter scrambles with the multiplier again, so the internal state becomes `seed`
         seed = seed ^ multiplier
         super().__init__()
         self.set_seed(seed)
 
+    @staticmethod
+    def substream_state(replication, stream):
+        """Initial LCG state of the substream of (`replication`, `stream`)"""
+        key = (replication - 1) * Distribution.MAX_STREAMS + (stream - 1)
+        return Random.jump_state(0, Distribution.SUBSTREAM_BASE + key * Distribution.SUBSTREAM_SPACING)
+
     def next_exponential(self, b):
         randx = self.next_double()
         return -b * math.log(randx)
 
+    def next_exponentials(self, b, size):
+        """Array of `size` values equal to successive next_exponential(b) calls"""
+        # math.log rather than np.log, whose SIMD kernels may differ in the last bit
+        randx = self.next_doubles(size)
+        return -b * np.fromiter(map(math.log, randx.tolist()), dtype=np.float64, count=size)
+
     def next_double_in_the_interval(self, min, max):
         rand_val = 1
         return (max - min) * (rand_val - 0) / (0.999999 - 0) + min
 
-    # 100 seeds spaced by 1.000.000 values (from the original Java code)
+    # 100 seeds spaced by 1.000.000 values (from the original Java code), seeds[i] = jump_state(0, i * 1.000.000)
     seeds = [
         0,
         149054804787264,
@@ -1,6 +1,8 @@
 import time
 import math
 
+import numpy as np
+
 
 class Random(object):
     """
@@ -15,8 +17,19 @@ class Random(object):
 
     This class is not thread-safe. For deterministic behavior, lock or
     synchronize all accesses to this class per-instance.
+
+    The batch methods (`next_ints`, `next_doubles`) return NumPy arrays that
+    are bit-identical to repeated scalar calls and leave the generator in the
+    same state. They evaluate blocks of the LCG at once with precomputed jump
+    coefficients: after k steps the state is (A_k * seed + C_k) mod 2**48.
     """
 
+    MULTIPLIER = 0x5deece66d
+    ADDEND = 0xb
+    MASK = (1 << 48) - 1
+    BLOCK_SIZE = 1 << 16
+    jump_table = None
+
     def __init__(self, seed=None):
         """
         Create a new random number generator.
@@ -35,6 +48,17 @@ class Random(object):
 
         self.seed = seed
 
+    def get_state(self):
+        """
+        Return the internal 48-bit state, unlike `seed` it is not scrambled
+        again when set back with `set_state`.
+        """
+
+        return self._seed
+
+    def set_state(self, state):
+        self._seed = state & Random.MASK
+
     @property
     def seed(self):
         return self._seed
@@ -106,14 +130,120 @@ class Random(object):
         if not (n & (n - 1)):
             return (n * self.next(31)) >> 31
 
+        # Java rejects when `bits - val + (n - 1)` overflows a signed 32-bit int
         bits = self.next(31)
         val = bits % n
-        while (bits - val + n - 1) < 0:
+        while (bits - val + n - 1) >= (1 << 31):
             bits = self.next(31)
             val = bits % n
 
         return val
 
+    @staticmethod
+    def jump_state(seed, n):
+        """
+        Return the internal state reached from `seed` after `n` steps of the
+        LCG, in O(log n) by repeated squaring of the affine step map.
+        """
+
+        mask = Random.MASK
+        a_total, c_total = 1, 0
+        a_step, c_step = Random.MULTIPLIER, Random.ADDEND
+        while n > 0:
+            if n & 1:
+                a_total, c_total = (a_step * a_total) & mask, (a_step * c_total + c_step) & mask
+            a_step, c_step = (a_step * a_step) & mask, (a_step * c_step + c_step) & mask
+            n >>= 1
+        return (a_total * seed + c_total) & mask
+
+    def skip(self, n):
+        """
+        Advance the generator by `n` draws of `next` without generating them.
+        """
+
+        self._seed = Random.jump_state(self._seed, n)
+
+    @staticmethod
+    def get_jump_table():
+        """
+        Returns the arrays (A, C) with A[k - 1], C[k - 1] such that k steps of
+        the LCG map a state s to (A[k - 1] * s + C[k - 1]) mod 2**48, for
+        k = 1 .. BLOCK_SIZE. Built by doubling: A_{j+k} = A_j * A_k and
+        C_{j+k} = A_j * C_k + C_j.
+        """
+
+        if Random.jump_table is None:
+            mask = np.uint64(Random.MASK)
+            a = np.array([Random.MULTIPLIER], dtype=np.uint64)
+            c = np.array([Random.ADDEND], dtype=np.uint64)
+            while len(a) < Random.BLOCK_SIZE:
+                a_k = a[-1]
+                c_k = c[-1]
+                # uint64 arithmetic wraps modulo 2**64, which 2**48 divides
+                a = np.concatenate([a, (a * a_k) & mask])
+                c = np.concatenate([c, (a[:len(c)] * c_k + c) & mask])
+            Random.jump_table = (a, c)
+        return Random.jump_table
+
+    def peek_seeds(self, count):
+        """
+        Returns the next `count` internal states as a uint64 array without
+        advancing the generator.
+        """
+
+        a, c = Random.get_jump_table()
+        mask = np.uint64(Random.MASK)
+        seeds = np.empty(count, dtype=np.uint64)
+        seed = np.uint64(self._seed)
+        for start in range(0, count, Random.BLOCK_SIZE):
+            m = min(Random.BLOCK_SIZE, count - start)
+            seeds[start:start + m] = (a[:m] * seed + c[:m]) & mask
+            seed = seeds[start + m - 1]
+        return seeds
+
+    @staticmethod
+    def bits_of(seeds, bits):
+        """Vectorized counterpart of `next(bits)` for the given states"""
+
+        values = (seeds >> np.uint64(48 - bits)).astype(np.int64)
+        if bits == 32:
+            values[values >= (1 << 31)] -= (1 << 32)
+        return values
+
+    def next_ints(self, n, size):
+        """
+        Return an int64 array of `size` values, each equal to what
+        `next_int(n)` would have returned, in order.
+        """
+
+        if n <= 0:
+            raise ValueError("Argument must be positive!")
+        if size <= 0:
+            return np.empty(0, dtype=np.int64)
+
+        if not (n & (n - 1)):
+            seeds = self.peek_seeds(size)
+            self._seed = int(seeds[-1])
+            return (n * Random.bits_of(seeds, 31)) >> 31
+
+        # Rejected draws are simply skipped by the scalar loop, so the result
+        # is the first `size` accepted values of the stream of next(31) draws.
+        result = np.empty(size, dtype=np.int64)
+        filled = 0
+        while filled < size:
+            seeds = self.peek_seeds(size - filled + 64)
+            bits = Random.bits_of(seeds, 31)
+            val = bits % n
+            accepted = np.flatnonzero((bits - val + n - 1) < (1 << 31))
+            take = min(len(accepted), size - filled)
+            result[filled:filled + take] = val[accepted[:take]]
+            filled += take
+            if filled == size:
+                self._seed = int(seeds[accepted[take - 1]])
+            else:
+                self._seed = int(seeds[-1])
+        return result
+
     def next_long(self):
         """
         Return a random long.
@@ -149,6 +279,20 @@ class Random(object):
 
         return ((self.next(26) << 27) + self.next(27)) / float(1 << 53)
 
+    def next_doubles(self, size):
+        """
+        Return a float64 array of `size` values, each equal to what
+        `next_double()` would have returned, in order.
+        """
+
+        if size <= 0:
+            return np.empty(0, dtype=np.float64)
+        seeds = self.peek_seeds(2 * size)
+        self._seed = int(seeds[-1])
+        high = Random.bits_of(seeds[0::2], 26)
+        low = Random.bits_of(seeds[1::2], 27)
+        return ((high << 27) + low) / float(1 << 53)
+
     def next_gaussian(self):
         """
         Return a normally-distributed double with mean 0 and standard
@@ -0,0 +1,94 @@
+from typing import Dict, List
+
+
+class LatencyHistogram:
+    """
+    Log-linear histogram of non-negative integer values (nanoseconds), in
+    the style of HdrHistogram: every power of two is split into SUB_BUCKETS
+    linear buckets, so any recorded value is known within 1 / SUB_BUCKETS
+    of itself (about 6%) whatever its magnitude. Recording is a couple of
+    integer operations and the memory is fixed.
+    """
+
+    SUB_BITS = 4
+    SUB_BUCKETS = 1 << SUB_BITS
+    NUM_BUCKETS = SUB_BUCKETS * 61
+
+    def __init__(self):
+        self.counts: List[int] = [0] * LatencyHistogram.NUM_BUCKETS
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = 0
+
+    @staticmethod
+    def bucket_of(value: int) -> int:
+        if value < LatencyHistogram.SUB_BUCKETS:
+            return value
+        shift = value.bit_length() - LatencyHistogram.SUB_BITS - 1
+        return LatencyHistogram.SUB_BUCKETS * (shift + 1) + (value >> shift) - LatencyHistogram.SUB_BUCKETS
+
+    @staticmethod
+    def bucket_bounds(bucket: int) -> (int, int):
+        """Smallest and largest value that fall in `bucket`"""
+        if bucket < LatencyHistogram.SUB_BUCKETS:
+            return bucket, bucket
+        shift = bucket // LatencyHistogram.SUB_BUCKETS - 1
+        low = (bucket % LatencyHistogram.SUB_BUCKETS + LatencyHistogram.SUB_BUCKETS) << shift
+        return low, low + (1 << shift) - 1
+
+    def record(self, value: int) -> None:
+        value = max(int(value), 0)
+        self.counts[LatencyHistogram.bucket_of(value)] += 1
+        self.count += 1
+        self.total += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+
+    def merge(self, other: "LatencyHistogram") -> None:
+        for i, count in enumerate(other.counts):
+            if count:
+                self.counts[i] += count
+        self.count += other.count
+        self.total += other.total
+        if other.min is not None and (self.min is None or other.min < self.min):
+            self.min = other.min
+        self.max = max(self.max, other.max)
+
+    def get_count(self) -> int:
+        return self.count
+
+    def get_mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def get_max(self) -> int:
+        return self.max
+
+    def get_percentile(self, percentile: float) -> int:
+        """Largest value of the bucket holding the given percentile, capped by the exact maximum"""
+        if self.count == 0:
+            return 0
+        rank = max(1, int(round(percentile / 100.0 * self.count)))
+        seen = 0
+        for bucket, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return min(LatencyHistogram.bucket_bounds(bucket)[1], self.max)
+        return self.max
+
+    def to_dict(self) -> Dict:
+        return {"count": self.count, "total": self.total, "min": self.min, "max": self.max,
+                "buckets": {bucket: count for bucket, count in enumerate(self.counts) if count}}
+
+    @staticmethod
+    def from_dict(d: Dict) -> "LatencyHistogram":
+        histogram = LatencyHistogram()
+        histogram.count = d["count"]
+        histogram.total = d["total"]
+        histogram.min = d["min"]
+        histogram.max = d["max"]
+        for bucket, count in d["buckets"].items():
+            histogram.counts[int(bucket)] = count
+        return histogram